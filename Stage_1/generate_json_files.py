@@ -2,15 +2,21 @@
 # -*- coding: utf-8 -*-
 
 
+import argparse
+import hashlib
 import json
 import os
+import pickle
+import tempfile
+import unicodedata
 import logging
 import shutil
 from collections import defaultdict
-from typing import Dict, List, Any, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Set, Optional, Iterable, Iterator, Tuple
 import sys
-import io
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+# reconfigure instead of re-wrapping: a second wrapper closes the real stream when collected
+sys.stdout.reconfigure(encoding='utf-8')
 
 
 # Set up logging
@@ -24,10 +30,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger("json_generator")
 
+# master_reader.py (streaming reader for the master JSON) lives at the repository
+# root because Stage 1 and Stage 3 both use it; Stage 2 is only imported on demand
+# to compile the bundle (see _import_address_module)
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STAGE2_DIR = os.path.join(ROOT_DIR, "Stage_2")
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from master_reader import MasterRecord, iter_master_records
+
 # Constants
 INPUT_FILE = "Stage_1/full_json_generated_data_vn_units.json"
 OUTPUT_DIR = "Stage_1/generated_json"
-SPECIAL_CITIES = {"Hà Nội", "Hồ Chí Minh"}  # Cities treated specially in HCMHN folder
+SPECIAL_CITIES = {"hà nội", "hồ chí minh"}  # Cities treated specially in HCMHN folder (normalized names)
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+ADMIN_TREE_FILE = "admin_tree.json"
+CHUANHOA_FILE = "chuanhoa.csv"
+
+# Mapping key -> output file (relative to OUTPUT_DIR)
+PX_KEYS = [
+    'huyen_phuong', 'huyen_thitran', 'huyen_xa',
+    'quan_phuong', 'quan_thitran', 'quan_xa',
+    'tp_phuong', 'tp_thitran', 'tp_xa',
+    'tx_phuong', 'tx_thitran', 'tx_xa'
+]
+QH_KEYS = [
+    'thanhpho_huyen', 'thanhpho_quan',
+    'tinh_huyen', 'tinh_quan', 'tinh_tp', 'tinh_tx'
+]
+HCMHN_KEYS = ['hcm_hn_huyen', 'hcm_hn_quan', 'hcm_hn_tx', 'hcm_hn_tp']
+MAPPING_FILES = dict(
+    [(key, os.path.join("px", f"{key}.json")) for key in PX_KEYS]
+    + [(key, os.path.join("qh", f"{key}.json")) for key in QH_KEYS]
+    + [(key, os.path.join("hcmhn", f"{key}.json")) for key in HCMHN_KEYS]
+    + [('qh_d', "qh_duong.json")]
+)
 
 
 def ensure_directory_exists(directory: str) -> None:
@@ -37,30 +75,53 @@ def ensure_directory_exists(directory: str) -> None:
         logger.info(f"Created directory: {directory}")
 
 
-def load_master_json(filepath: str) -> List[Dict[str, Any]]:
-    """Load and parse the master JSON file."""
-    try:
-        logger.info(f"Loading master JSON from {filepath}")
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        logger.info(f"Successfully loaded master JSON with {len(data)} provinces")
-        return data
-    except Exception as e:
-        logger.error(f"Failed to load master JSON: {e}")
-        raise
+# Mapping key of a district / ward by the (normalized) types of its parents (see the result dict below)
+_HCMHN_DISTRICT_KEYS = {"quận": 'hcm_hn_quan', "huyện": 'hcm_hn_huyen', "thị xã": 'hcm_hn_tx', "thành phố": 'hcm_hn_tp'}
+_PROVINCE_DISTRICT_KEYS = {
+    "thành phố": {"quận": 'thanhpho_quan', "huyện": 'thanhpho_huyen'},
+    "tỉnh": {"quận": 'tinh_quan', "huyện": 'tinh_huyen', "thị xã": 'tinh_tx', "thành phố": 'tinh_tp'},
+}
+_DISTRICT_PREFIXES = {"huyện": 'huyen', "quận": 'quan', "thành phố": 'tp', "thị xã": 'tx'}
+_WARD_SUFFIXES = {"phường": 'phuong', "thị trấn": 'thitran', "xã": 'xa'}
 
 
-def extract_administrative_units(data: List[Dict[str, Any]]) -> Dict:
-    """
-    Extract and organize administrative units from the master JSON.
-    
-    Returns:
-        Dict containing various mappings required for address_module.py
-    """
-    logger.info("Extracting administrative units from master JSON")
-    
-    # Initialize result dictionaries
-    result = {
+def normalize_text(text: str) -> str:
+    """Lowercase and Unicode-NFC form of a name, the form Stage 2 matches against."""
+    return unicodedata.normalize('NFC', text.lower())
+
+
+def normalize_json_value(value: Any) -> Any:
+    """Normalize every string (dict keys included) of a JSON value with normalize_text."""
+    if isinstance(value, dict):
+        return {normalize_text(k) if isinstance(k, str) else k: normalize_json_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize_json_value(item) for item in value]
+    if isinstance(value, str):
+        return normalize_text(value)
+    return value
+
+
+def load_master_records(filepath: str) -> Iterator[MasterRecord]:
+    """Stream the master JSON as flat (level, code, name, type, parent_code) records."""
+    logger.info(f"Streaming master JSON from {filepath}")
+    return iter_master_records(filepath)
+
+
+def _district_mapping_key(province_name: str, province_type: str, district_type: str) -> Optional[str]:
+    if province_name in SPECIAL_CITIES:
+        # Special mapping for Hanoi and Ho Chi Minh
+        return _HCMHN_DISTRICT_KEYS.get(district_type)
+    return _PROVINCE_DISTRICT_KEYS.get(province_type, {}).get(district_type)
+
+
+def _ward_mapping_key(district_type: str, ward_type: str) -> Optional[str]:
+    prefix = _DISTRICT_PREFIXES.get(district_type)
+    suffix = _WARD_SUFFIXES.get(ward_type)
+    return f"{prefix}_{suffix}" if prefix and suffix else None
+
+
+def _new_mappings() -> Dict[str, Any]:
+    return {
         # District to Ward relationships (px folder)
         'huyen_phuong': defaultdict(list),  # huyện -> phường
         'huyen_thitran': defaultdict(list),  # huyện -> thị trấn
@@ -92,228 +153,284 @@ def extract_administrative_units(data: List[Dict[str, Any]]) -> Dict:
         # Street information
         'qh_d': defaultdict(list),           # quận/huyện -> đường
     }
-    
-    # Process each province
-    for province in data:
-        # Skip invalid entries
-        if "Name" not in province or "AdministrativeUnitShortName" not in province:
-            logger.warning(f"Skipping province with missing required fields: {province.get('Code', 'Unknown')}")
-            continue
-            
-        province_name = province["Name"]
-        province_type = province["AdministrativeUnitShortName"]
-        
-        # Process districts in this province
-        if "District" in province and province["District"] is not None:
-            for district in province["District"]:
-                # Skip invalid entries
-                if "Name" not in district or "AdministrativeUnitShortName" not in district:
-                    logger.warning(f"Skipping district with missing required fields in province {province_name}")
-                    continue
-                    
-                district_name = district["Name"]
-                district_type = district["AdministrativeUnitShortName"]
-                
-                # Map province to district based on their types
-                if province_name in SPECIAL_CITIES:
-                    # Special mapping for Hanoi and Ho Chi Minh
-                    if district_type == "Quận":
-                        result['hcm_hn_quan'][province_name].append(district_name)
-                    elif district_type == "Huyện":
-                        result['hcm_hn_huyen'][province_name].append(district_name)
-                    elif district_type == "Thị xã":
-                        result['hcm_hn_tx'][province_name].append(district_name)
-                    elif district_type == "Thành phố":
-                        result['hcm_hn_tp'][province_name].append(district_name)
-                elif province_type == "Thành phố":
-                    if district_type == "Quận":
-                        result['thanhpho_quan'][province_name].append(district_name)
-                    elif district_type == "Huyện":
-                        result['thanhpho_huyen'][province_name].append(district_name)
-                elif province_type == "Tỉnh":
-                    if district_type == "Quận":
-                        result['tinh_quan'][province_name].append(district_name)
-                    elif district_type == "Huyện":
-                        result['tinh_huyen'][province_name].append(district_name)
-                    elif district_type == "Thị xã":
-                        result['tinh_tx'][province_name].append(district_name)
-                    elif district_type == "Thành phố":
-                        result['tinh_tp'][province_name].append(district_name)
-                
-                # Process wards in this district
-                if "Ward" in district and district["Ward"] is not None:
-                    for ward in district["Ward"]:
-                        # Skip invalid entries
-                        if "Name" not in ward or "AdministrativeUnitShortName" not in ward:
-                            logger.warning(f"Skipping ward with missing required fields in district {district_name}")
-                            continue
-                            
-                        ward_name = ward["Name"]
-                        ward_type = ward["AdministrativeUnitShortName"]
-                        
-                        # Map district to ward based on their types
-                        if district_type == "Huyện":
-                            if ward_type == "Phường":
-                                result['huyen_phuong'][district_name].append(ward_name)
-                            elif ward_type == "Thị trấn":
-                                result['huyen_thitran'][district_name].append(ward_name)
-                            elif ward_type == "Xã":
-                                result['huyen_xa'][district_name].append(ward_name)
-                        elif district_type == "Quận":
-                            if ward_type == "Phường":
-                                result['quan_phuong'][district_name].append(ward_name)
-                            elif ward_type == "Thị trấn":
-                                result['quan_thitran'][district_name].append(ward_name)
-                            elif ward_type == "Xã":
-                                result['quan_xa'][district_name].append(ward_name)
-                        elif district_type == "Thành phố":
-                            if ward_type == "Phường":
-                                result['tp_phuong'][district_name].append(ward_name)
-                            elif ward_type == "Thị trấn":
-                                result['tp_thitran'][district_name].append(ward_name)
-                            elif ward_type == "Xã":
-                                result['tp_xa'][district_name].append(ward_name)
-                        elif district_type == "Thị xã":
-                            if ward_type == "Phường":
-                                result['tx_phuong'][district_name].append(ward_name)
-                            elif ward_type == "Thị trấn":
-                                result['tx_thitran'][district_name].append(ward_name)
-                            elif ward_type == "Xã":
-                                result['tx_xa'][district_name].append(ward_name)
-    
+
+
+def extract_master(records: Iterable[MasterRecord]) -> Tuple[Dict, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Build everything Stage 1 writes in a single pass over the master records.
+    Names and types are lowercased and NFC-normalized as they are extracted.
+    The tree keeps the master `Code` of every unit so Stage 2 can return
+    city/district/ward ids at match time; unlike the flat px files, wards stay
+    attached to their own district, so same-named districts in different
+    provinces keep their own ward lists.
+
+    Returns:
+        (mappings required for address_module.py,
+         nested province -> district -> ward tree for admin_tree.json,
+         per-province summaries {key, name, hash, files} for the manifest)
+    """
+    logger.info("Extracting administrative units from master JSON")
+    result = _new_mappings()
+    tree = []
+    provinces = []
+    province = district = summary = None
+    counts = defaultdict(int)
+
+    for record in records:
+        counts[record.level] += 1
+        if record.level == 'province':
+            summary = {"key": str(record.code or record.name), "name": record.name and normalize_text(record.name),
+                       "hash": hashlib.sha256(), "files": set()}
+            provinces.append(summary)
+            province = district = None
+            if record.name is None or record.type is None:
+                logger.warning(f"Skipping province with missing required fields: {record.code or 'Unknown'}")
+            else:
+                province = {"name": normalize_text(record.name), "type": normalize_text(record.type),
+                            "code": record.code, "districts": []}
+                tree.append(province)
+        summary["hash"].update(json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n")
+
+        if record.level == 'district' and province is not None:
+            district = None
+            if record.name is None or record.type is None:
+                logger.warning(f"Skipping district with missing required fields in province {province['name']}")
+                continue
+            district = {"name": normalize_text(record.name), "type": normalize_text(record.type),
+                        "code": record.code, "wards": []}
+            province["districts"].append(district)
+            key = _district_mapping_key(province["name"], province["type"], district["type"])
+            if key is not None:
+                result[key][province["name"]].append(district["name"])
+                summary["files"].add(key)
+        elif record.level == 'ward' and district is not None:
+            if record.name is None or record.type is None:
+                logger.warning(f"Skipping ward with missing required fields in district {district['name']}")
+                continue
+            ward = {"name": normalize_text(record.name), "type": normalize_text(record.type), "code": record.code}
+            district["wards"].append(ward)
+            key = _ward_mapping_key(district["type"], ward["type"])
+            if key is not None:
+                result[key][district["name"]].append(ward["name"])
+                summary["files"].add(key)
+
     # Convert defaultdicts to regular dicts for JSON serialization
     for key in result:
         result[key] = dict(result[key])
+    for summary in provinces:
+        summary["hash"] = summary["hash"].hexdigest()
+        summary["files"] = sorted(summary["files"])
     
     # Count total mappings for logging
     total_mappings = sum(len(values) for mapping in result.values() for values in mapping.values())
-    logger.info(f"Extracted {total_mappings} total mappings across all relationship types")
+    logger.info(f"Read {counts['province']} provinces, {counts['district']} districts, {counts['ward']} wards; "
+                f"extracted {total_mappings} total mappings across all relationship types")
     
-    return result
+    return result, tree, provinces
 
 
-def save_json_files(data: Dict, output_dir: str) -> None:
-    """Save the extracted data to separate JSON files."""
+def write_file_atomic(filepath: str, content: bytes) -> str:
+    """
+    Write content to a temporary file in the same directory, then rename it over
+    filepath, so readers never see a half-written file.
+
+    Returns:
+        sha256 of the written content.
+    """
+    directory = os.path.dirname(filepath) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(filepath) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return hashlib.sha256(content).hexdigest()
+
+
+def write_json_atomic(filepath: str, obj: Any) -> str:
+    """Atomically write obj as indented UTF-8 JSON, returning its sha256."""
+    return write_file_atomic(filepath, json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def save_admin_tree(tree: List[Dict[str, Any]], output_dir: str) -> str:
+    """Save the administrative tree next to the flat dictionaries, returning its sha256."""
+    ensure_directory_exists(output_dir)
+    digest = write_json_atomic(os.path.join(output_dir, ADMIN_TREE_FILE), tree)
+    logger.info(f"Saved {ADMIN_TREE_FILE} with {len(tree)} provinces")
+    return digest
+
+
+def save_json_files(data: Dict, output_dir: str, keys: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    Save the extracted data to separate JSON files.
+
+    Args:
+        keys: mapping keys to write (default: all of them, plus chuanhoa.csv).
+
+    Returns:
+        Dict of written file (relative to output_dir, '/'-separated) -> sha256.
+    """
     logger.info(f"Saving extracted data to JSON files in {output_dir}")
+    keys = set(MAPPING_FILES) if keys is None else set(keys)
+    written = {}
     
     # Create main directories
     ensure_directory_exists(output_dir)
     ensure_directory_exists(os.path.join(output_dir, "px"))
     ensure_directory_exists(os.path.join(output_dir, "qh"))
     ensure_directory_exists(os.path.join(output_dir, "hcmhn"))
-    
-    # Save px (district to ward) relationships
-    px_keys = [
-        'huyen_phuong', 'huyen_thitran', 'huyen_xa',
-        'quan_phuong', 'quan_thitran', 'quan_xa',
-        'tp_phuong', 'tp_thitran', 'tp_xa',
-        'tx_phuong', 'tx_thitran', 'tx_xa'
-    ]
-    for key in px_keys:
-        filepath = os.path.join(output_dir, "px", f"{key}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data[key], f, ensure_ascii=False, indent=2)
-        logger.info(f"Saved {key}.json with {len(data[key])} districts")
-    
-    # Save qh (province to district) relationships
-    qh_keys = [
-        'thanhpho_huyen', 'thanhpho_quan',
-        'tinh_huyen', 'tinh_quan', 'tinh_tp', 'tinh_tx'
-    ]
-    for key in qh_keys:
-        filepath = os.path.join(output_dir, "qh", f"{key}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data[key], f, ensure_ascii=False, indent=2)
-        logger.info(f"Saved {key}.json with {len(data[key])} provinces")
-      # Save hcmhn (Hanoi and Ho Chi Minh) relationships
-    hcmhn_keys = ['hcm_hn_huyen', 'hcm_hn_quan', 'hcm_hn_tx', 'hcm_hn_tp']
-    for key in hcmhn_keys:
-        # Đảm bảo tên file chính xác cho address_module.py
-        actual_filename = key
-        filename_for_address_module = key.replace('hcm_hn_', 'hcmhn_')
-        
-        filepath = os.path.join(output_dir, "hcmhn", f"{actual_filename}.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data[key], f, ensure_ascii=False, indent=2)
-            
-        # Tạo bản sao với tên cũ cho tương thích
-        filepath_compat = os.path.join(output_dir, "hcmhn", f"{filename_for_address_module}.json")
-        with open(filepath_compat, 'w', encoding='utf-8') as f:
-            json.dump(data[key], f, ensure_ascii=False, indent=2)
-            
-        logger.info(f"Saved {key}.json with {len(data[key])} cities")
-    
-    # Save main qh_duong.json (initially empty as we don't have street data)
-    filepath = os.path.join(output_dir, "qh_duong.json")
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data['qh_d'], f, ensure_ascii=False, indent=2)
-    logger.info(f"Saved qh_duong.json (initially empty)")
-    
+
+    # px (district to ward), qh (province to district), hcmhn (Hanoi and Ho Chi Minh)
+    # relationships and the main qh_duong.json (initially empty as we don't have street data)
+    for key, rel_path in MAPPING_FILES.items():
+        if key not in keys:
+            continue
+        written[_manifest_path(rel_path)] = write_json_atomic(os.path.join(output_dir, rel_path), data[key])
+        logger.info(f"Saved {rel_path} with {len(data[key])} entries")
+
+        if key in HCMHN_KEYS:
+            # Tạo bản sao với tên cũ cho tương thích
+            compat_path = os.path.join("hcmhn", key.replace('hcm_hn_', 'hcmhn_') + ".json")
+            written[_manifest_path(compat_path)] = write_json_atomic(os.path.join(output_dir, compat_path), data[key])
+
     # Create a basic chuanhoa.csv for standardization
-    filepath = os.path.join(output_dir, "chuanhoa.csv")
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write("tp,thành phố\n")
-        f.write("tx,thị xã\n")
-        f.write("tt,thị trấn\n")
-        f.write("q,quận\n")
-        f.write("h,huyện\n")
-        f.write("p,phường\n")
-        f.write("x,xã\n")
-        f.write("đ,đường\n")
-        f.write("hcm,hồ chí minh\n")
-        f.write("hn,hà nội\n")
-    logger.info(f"Created basic chuanhoa.csv")
-
-
-def validate_generated_files(output_dir: str) -> bool:
-    """Validate that all expected files exist and are properly formatted."""
+    filepath = os.path.join(output_dir, CHUANHOA_FILE)
+    if len(keys) == len(MAPPING_FILES) or not os.path.exists(filepath):
+        written[CHUANHOA_FILE] = write_file_atomic(filepath, (
+            "tp,thành phố\n"
+            "tx,thị xã\n"
+            "tt,thị trấn\n"
+            "q,quận\n"
+            "h,huyện\n"
+            "p,phường\n"
+            "x,xã\n"
+            "đ,đường\n"
+            "hcm,hồ chí minh\n"
+            "hn,hà nội\n"
+        ).encode('utf-8'))
+        logger.info(f"Created basic {CHUANHOA_FILE}")
+    return written
+
+
+def _manifest_path(rel_path: str) -> str:
+    return rel_path.replace(os.sep, '/')
+
+
+def file_sha256(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    """Manifest of the previous run, or None if missing, unreadable or of another version."""
+    filepath = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def outputs_up_to_date(manifest: Optional[Dict[str, Any]], input_hash: str, output_dir: str) -> bool:
+    """
+    True if the previous run read a master JSON with the same sha256 and all of
+    its output files are still there, so nothing needs to be extracted again.
+    """
+    if manifest is None or manifest.get("input_hash") != input_hash:
+        return False
+    expected_files = list(MAPPING_FILES.values()) + [ADMIN_TREE_FILE, CHUANHOA_FILE]
+    return all(os.path.exists(os.path.join(output_dir, rel_path)) for rel_path in expected_files)
+
+
+def plan_incremental(provinces: List[Dict[str, Any]], manifest: Optional[Dict[str, Any]],
+                     output_dir: str) -> Tuple[Optional[Set[str]], List[str]]:
+    """
+    Compare the province hashes of the master JSON with the previous manifest.
+
+    Returns:
+        (mapping keys to regenerate, or None for a full regeneration;
+         keys of added, removed or changed provinces)
+    """
+    hashes = {p["key"]: p["hash"] for p in provinces}
+    previous = (manifest or {}).get("provinces", {})
+    if manifest is None or manifest.get("province_order") != [p["key"] for p in provinces]:
+        # no previous run, or provinces added/removed/reordered: the order of
+        # every mapping file may change, so rebuild everything
+        changed = sorted(k for k in set(hashes) | set(previous) if hashes.get(k) != previous.get(k, {}).get("hash"))
+        return None, changed
+
+    changed = [p["key"] for p in provinces if p["hash"] != previous.get(p["key"], {}).get("hash")]
+    keys = set()
+    for p in provinces:
+        if p["key"] in changed:
+            # files the province feeds now, and the ones it fed before the change
+            keys.update(p["files"])
+            keys.update(previous.get(p["key"], {}).get("files", ()))
+    for key, rel_path in MAPPING_FILES.items():
+        if not os.path.exists(os.path.join(output_dir, rel_path)):
+            keys.add(key)
+    return keys, sorted(changed)
+
+
+def save_manifest(output_dir: str, input_file: str, provinces: List[Dict[str, Any]], files: Dict[str, str],
+                  changed_files: List[str], changed_provinces: List[str], input_hash: Optional[str] = None) -> None:
+    """
+    Record per-province hashes and per-file hashes of the generated dictionaries.
+    changed_files / changed_provinces list what this run rewrote, so downstream
+    caches and bundles can invalidate exactly those. input_hash (sha256 of the
+    master JSON) lets the next incremental run skip extraction altogether.
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "input": input_file,
+        "input_hash": input_hash,
+        "province_order": [p["key"] for p in provinces],
+        "provinces": {p["key"]: {"name": p["name"], "hash": p["hash"], "files": p["files"]} for p in provinces},
+        "files": dict(sorted(files.items())),
+        "changed_files": sorted(changed_files),
+        "changed_provinces": changed_provinces,
+    }
+    write_json_atomic(os.path.join(output_dir, MANIFEST_FILE), manifest)
+    logger.info(f"Saved {MANIFEST_FILE}: {len(changed_files)} files, {len(changed_provinces)} provinces changed")
+
+
+def validate_generated_files(output_dir: str, parse_files: Optional[Iterable[str]] = None) -> bool:
+    """
+    Validate that all expected files exist and are properly formatted.
+
+    Args:
+        parse_files: files (relative to output_dir) to re-parse as JSON;
+                     default all of them. Incremental runs pass only the files they wrote.
+    """
     logger.info("Validating generated JSON files")
     
     # Expected file paths
-    expected_files = [
-        # px folder
-        os.path.join(output_dir, "px", "huyen_phuong.json"),
-        os.path.join(output_dir, "px", "huyen_thitran.json"),
-        os.path.join(output_dir, "px", "huyen_xa.json"),
-        os.path.join(output_dir, "px", "quan_phuong.json"),
-        os.path.join(output_dir, "px", "quan_thitran.json"),
-        os.path.join(output_dir, "px", "quan_xa.json"),
-        os.path.join(output_dir, "px", "tp_phuong.json"),
-        os.path.join(output_dir, "px", "tp_thitran.json"),
-        os.path.join(output_dir, "px", "tp_xa.json"),
-        os.path.join(output_dir, "px", "tx_phuong.json"),
-        os.path.join(output_dir, "px", "tx_thitran.json"),
-        os.path.join(output_dir, "px", "tx_xa.json"),
-        
-        # qh folder
-        os.path.join(output_dir, "qh", "thanhpho_huyen.json"),
-        os.path.join(output_dir, "qh", "thanhpho_quan.json"),
-        os.path.join(output_dir, "qh", "tinh_huyen.json"),
-        os.path.join(output_dir, "qh", "tinh_quan.json"),
-        os.path.join(output_dir, "qh", "tinh_tp.json"),
-        os.path.join(output_dir, "qh", "tinh_tx.json"),
-        
-        # hcmhn folder
-        os.path.join(output_dir, "hcmhn", "hcm_hn_huyen.json"),
-        os.path.join(output_dir, "hcmhn", "hcm_hn_quan.json"),
-        os.path.join(output_dir, "hcmhn", "hcm_hn_tx.json"),
-        os.path.join(output_dir, "hcmhn", "hcm_hn_tp.json"),
-        
-        # Root files
-        os.path.join(output_dir, "qh_duong.json"),
-        os.path.join(output_dir, "chuanhoa.csv")
-    ]
+    expected_files = list(MAPPING_FILES.values()) + [ADMIN_TREE_FILE, CHUANHOA_FILE]
+    parse_files = None if parse_files is None else {_manifest_path(path) for path in parse_files}
     
     # Check each file
     all_valid = True
-    for filepath in expected_files:
+    for rel_path in expected_files:
+        filepath = os.path.join(output_dir, rel_path)
         if not os.path.exists(filepath):
             logger.error(f"Missing file: {filepath}")
             all_valid = False
             continue
         
         # For JSON files, check they're valid JSON
-        if filepath.endswith(".json"):
+        if filepath.endswith(".json") and (parse_files is None or _manifest_path(rel_path) in parse_files):
             try:
                 with open(filepath, 'r', encoding='utf-8') as f:
                     json.load(f)
@@ -329,6 +446,36 @@ def validate_generated_files(output_dir: str) -> bool:
     return all_valid
 
 
+def _import_address_module():
+    """Stage 2's address_module, which owns the bundle format."""
+    if STAGE2_DIR not in sys.path:
+        sys.path.insert(0, STAGE2_DIR)
+    import address_module
+    return address_module
+
+
+def build_address_bundle(output_dir: str) -> str:
+    """
+    Compile the generated dictionaries, reverse indexes and normalization table
+    into the single precompiled bundle that Stage 2 loads at startup.
+    """
+    bundle_path = _import_address_module().write_address_bundle(".", output_dir)
+    logger.info(f"Saved precompiled bundle {bundle_path}")
+    return bundle_path
+
+
+def bundle_is_current(output_dir: str) -> bool:
+    """True if the precompiled bundle exists and matches the current dictionaries."""
+    address_module = _import_address_module()
+    try:
+        with open(os.path.join(output_dir, address_module.BUNDLE_FILE), 'rb') as f:
+            header = pickle.load(f)
+    except Exception:
+        return False
+    return (header.get('version') == address_module.BUNDLE_VERSION
+            and header.get('source_hash') == address_module.source_hash(output_dir))
+
+
 def fix_address_module_encoding():
     """Sửa các vấn đề mã hóa trong address_module.py"""
     try:
@@ -355,23 +502,118 @@ def fix_address_module_encoding():
         # Không dừng chương trình nếu không sửa được file
 
 
-def main():
+def normalize_json_file(filepath: str) -> bool:
+    """
+    Normalize one JSON file in place (atomic rename); True if it changed.
+    Unreadable files are logged and left untouched.
+    """
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read JSON file {filepath}: {e}")
+        return False
+    normalized = normalize_json_value(content)
+    if normalized == content:
+        return False
+    write_json_atomic(filepath, normalized)
+    return True
+
+
+def normalize_json_tree(directory: str, workers: int = 1) -> int:
+    """
+    Lowercase and NFC-normalize every JSON file under directory (e.g. a hand-edited
+    or externally produced gazetteer). Files are processed by a pool of worker
+    processes when workers > 1; each one is replaced atomically.
+
+    Returns:
+        Number of files rewritten.
+    """
+    filepaths = sorted(
+        os.path.join(root, filename)
+        for root, _, files in os.walk(directory)
+        for filename in files
+        if filename.endswith(".json") and filename != MANIFEST_FILE
+    )
+    logger.info(f"Normalizing {len(filepaths)} JSON files in {directory}")
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            changed = list(pool.map(normalize_json_file, filepaths))
+    else:
+        changed = [normalize_json_file(filepath) for filepath in filepaths]
+    logger.info(f"Rewrote {sum(changed)} of {len(filepaths)} files")
+    return sum(changed)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate the Stage 2 dictionaries from the master JSON")
+    parser.add_argument("--input", default=INPUT_FILE, help="Master JSON of administrative units")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Directory of the generated dictionaries")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Only rewrite the files affected by provinces that changed since the last "
+                             f"run (recorded in {MANIFEST_FILE}); falls back to a full run without a manifest")
+    parser.add_argument("--normalize-only", metavar="DIR", default=None,
+                        help="Only lowercase + NFC-normalize the JSON files under DIR in place, without "
+                             "reading the master JSON")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for --normalize-only")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
     """Main function to execute the JSON generation process."""
+    args = parse_args(argv)
+    if args.normalize_only:
+        if not os.path.isdir(args.normalize_only):
+            logger.error(f"Directory not found: {args.normalize_only}")
+            return 1
+        normalize_json_tree(args.normalize_only, args.workers)
+        return 0
     logger.info("Starting JSON generation process")
     
     try:
-        # Load master JSON
-        data = load_master_json(INPUT_FILE)
-        
-        # Extract administrative units
-        extracted_data = extract_administrative_units(data)
+        input_hash = file_sha256(args.input)
+        manifest = load_manifest(args.output_dir) if args.incremental else None
+        if outputs_up_to_date(manifest, input_hash, args.output_dir):
+            logger.info("Master JSON unchanged since the last run, skipping extraction")
+            if manifest.get("changed_files") or manifest.get("changed_provinces"):
+                # this run rewrote nothing
+                write_json_atomic(os.path.join(args.output_dir, MANIFEST_FILE),
+                                  dict(manifest, changed_files=[], changed_provinces=[]))
+            if not bundle_is_current(args.output_dir):
+                build_address_bundle(args.output_dir)
+            return 0
+
+        # Stream the master JSON once into the mappings, the tree and the province hashes
+        extracted_data, tree, provinces = extract_master(load_master_records(args.input))
+
+        keys, changed_provinces = plan_incremental(provinces, manifest, args.output_dir)
+        if keys is None:
+            previous_files = {}
+        else:
+            previous_files = manifest.get("files", {})
+            logger.info(f"Incremental run: {len(changed_provinces)} provinces changed, "
+                        f"regenerating {len(keys)} mapping files")
         
         # Save to JSON files
-        save_json_files(extracted_data, OUTPUT_DIR)
+        written = save_json_files(extracted_data, args.output_dir, keys)
+        tree_path = os.path.join(args.output_dir, ADMIN_TREE_FILE)
+        if keys is None or changed_provinces or not os.path.exists(tree_path):
+            written[ADMIN_TREE_FILE] = save_admin_tree(tree, args.output_dir)
+        changed_files = [path for path, digest in written.items() if previous_files.get(path) != digest]
         
         # Validate generated files
-        is_valid = validate_generated_files(OUTPUT_DIR)
+        is_valid = validate_generated_files(args.output_dir, None if keys is None else written)
         
+        # Precompiled bundle for fast Stage 2 startup
+        if is_valid:
+            save_manifest(args.output_dir, args.input, provinces, dict(previous_files, **written),
+                          changed_files, changed_provinces, input_hash)
+            if keys is None or changed_files or not bundle_is_current(args.output_dir):
+                build_address_bundle(args.output_dir)
+            else:
+                logger.info("No dictionary changed, keeping the precompiled bundle")
+
 
     except Exception as e:
         logger.error(f"Error during JSON generation: {e}", exc_info=True)
@@ -1,7 +1,10 @@
 import pandas as pd
+import argparse
 import os
 import re 
-from address_module import load_address_dict, update_entity_address 
+from address_module import (load_address_dict, parse_addresses, parse_addresses_parallel, make_worker_pool,
+                            is_valid_address, enable_result_cache, enable_stage_stats, result_frame)
+from stream_io import detect_format, iter_input_chunks, ChunkWriter
 
 # --- CONFIGURATION ---
 # Đường dẫn đến file Excel input
@@ -17,7 +20,136 @@ PROJECT_PATH = "."
 GENERATED_JSON_DIR_NAME = "Stage_1/generated_json"
 # --- END CONFIGURATION ---
 
+# Thứ tự cột của file output
+OUTPUT_COLUMNS = ['Address', 'tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch',
+                  'city_id', 'district_id', 'ward_id', 'Error_Processing']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Trích xuất thành phần địa chỉ (Stage 2)")
+    parser.add_argument("--input", default=INPUT_EXCEL_FILE,
+                        help="File input (.xlsx, .csv, .jsonl, .parquet)")
+    parser.add_argument("--output", default=OUTPUT_EXCEL_FILE,
+                        help="File output (.xlsx, .csv, .jsonl, .parquet)")
+    parser.add_argument("--column", default=ADDRESS_COLUMN_NAME,
+                        help="Tên cột chứa địa chỉ đầy đủ")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số tiến trình xử lý song song (mặc định 1: chạy tuần tự)")
+    parser.add_argument("--chunk-size", type=int, default=2000,
+                        help="Số địa chỉ mỗi chunk khi chạy song song")
+    parser.add_argument("--chunk-rows", type=int, default=50000,
+                        help="Số dòng đọc/ghi mỗi lần ở chế độ streaming (CSV/JSONL/Parquet)")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Bật cache LRU kết quả cho các địa chỉ lặp lại (số phần tử, 0: tắt)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Chỉ phân tích mỗi địa chỉ khác nhau một lần trong mỗi chunk")
+    parser.add_argument("--stage-stats", default=None,
+                        help="Ghi thống kê thời gian/số lần so sánh theo từng bước ra file "
+                             "(.prom: định dạng Prometheus, còn lại: JSON; chỉ khi chạy tuần tự)")
+    return parser.parse_args()
+
+
+def process_addresses(addresses, add_dicts, args, pool=None):
+    """
+    Xử lý một Series địa chỉ (toàn bộ file hoặc một chunk), in ra các dòng
+    rỗng/lỗi và trả về DataFrame theo OUTPUT_COLUMNS (luôn có cột Error_Processing).
+    """
+    # Kiểm tra các địa chỉ rỗng/không hợp lệ (sẽ cho kết quả None)
+    for index, _ in addresses[~addresses.map(is_valid_address)].items():
+        print(f"Hàng {index + 2}: Địa chỉ rỗng hoặc không hợp lệ. Bỏ qua.")
+
+    if args.workers > 1:
+        columns = parse_addresses_parallel(addresses, PROJECT_PATH, GENERATED_JSON_DIR_NAME,
+                                           workers=args.workers, chunk_size=args.chunk_size,
+                                           as_frame=False, pool=pool, dedupe=args.dedupe)
+    else:
+        columns = parse_addresses(addresses, add_dicts, as_frame=False, dedupe=args.dedupe)
+    df_result = result_frame(columns, index=addresses.index)
+
+    for index, error in df_result['Error_Processing'].dropna().items():
+        print(f"Lỗi khi xử lý địa chỉ ở hàng {index + 2} ('{addresses[index]}'): {error}")
+
+    df_output = pd.concat([addresses.rename('Address'), df_result], axis=1)
+    return df_output.reindex(columns=OUTPUT_COLUMNS)
+
+
+def run_excel(args, add_dicts):
+    # Chế độ cũ: đọc/ghi toàn bộ file Excel trong bộ nhớ (chỉ dùng cho file nhỏ)
+    print(f"Đang đọc file input: {args.input}...")
+    try:
+        df_input = pd.read_excel(args.input)
+    except Exception as e:
+        print(f"Lỗi khi đọc file Excel '{args.input}': {e}")
+        return
+
+    if args.column not in df_input.columns:
+        print(f"Lỗi: Cột địa chỉ '{args.column}' không tìm thấy trong file input.")
+        print(f"Các cột hiện có trong file: {df_input.columns.tolist()}")
+        print("Vui lòng kiểm tra và cập nhật biến ADDRESS_COLUMN_NAME trong script.")
+        return
+
+    total_rows = len(df_input)
+    print(f"Bắt đầu xử lý {total_rows} địa chỉ...")
+    pool = None
+    if args.workers > 1:
+        print(f"Chạy song song với {args.workers} tiến trình (chunk {args.chunk_size} địa chỉ)...")
+        pool = make_worker_pool(PROJECT_PATH, GENERATED_JSON_DIR_NAME, args.workers, args.cache_size)
+    try:
+        df_output = process_addresses(df_input[args.column], add_dicts, args, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f"Hoàn tất xử lý {total_rows} địa chỉ.")
+
+    # Chỉ giữ lại cột 'Error_Processing' nếu có dòng lỗi
+    if df_output['Error_Processing'].isna().all():
+        df_output = df_output.drop(columns=['Error_Processing'])
+
+    # Ghi DataFrame kết quả ra file Excel
+    print(f"Đang ghi kết quả ra file: {args.output}...")
+    try:
+        df_output.to_excel(args.output, index=False)
+        print(f"Đã ghi thành công file output: {os.path.abspath(args.output)}")
+    except Exception as e:
+        print(f"Lỗi khi ghi file Excel '{args.output}': {e}")
+
+
+def run_streaming(args, add_dicts):
+    # Đọc và ghi theo từng chunk, bộ nhớ không tăng theo kích thước file
+    print(f"Đang xử lý theo chunk {args.chunk_rows} dòng: {args.input} -> {args.output}")
+    pool = None
+    if args.workers > 1:
+        pool = make_worker_pool(PROJECT_PATH, GENERATED_JSON_DIR_NAME, args.workers, args.cache_size)
+    try:
+        with ChunkWriter(args.output) as writer:
+            for chunk in iter_input_chunks(args.input, chunk_rows=args.chunk_rows):
+                if args.column not in chunk.columns:
+                    print(f"Lỗi: Cột địa chỉ '{args.column}' không tìm thấy trong file input.")
+                    print(f"Các cột hiện có trong file: {chunk.columns.tolist()}")
+                    return
+                writer.write(process_addresses(chunk[args.column], add_dicts, args, pool))
+                print(f"Đã xử lý {writer.rows} địa chỉ...")
+    except Exception as e:
+        print(f"Lỗi khi xử lý file '{args.input}': {e}")
+        return
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f"Đã ghi thành công {writer.rows} dòng ra file output: {os.path.abspath(args.output)}")
+
+
+def write_stage_stats(stats, filepath):
+    with open(filepath, 'w', encoding='utf-8') as f:
+        if filepath.endswith('.prom'):
+            f.write(stats.to_prometheus())
+        else:
+            f.write(stats.to_json(indent=2))
+    print(f"Đã ghi thống kê theo bước ra file: {os.path.abspath(filepath)}")
+
+
 def main():
+    args = parse_args()
+
     # 1. Tải các từ điển địa chỉ
     print("Đang tải các từ điển địa chỉ...")
     try:
@@ -31,93 +163,33 @@ def main():
         print(f"Đã xảy ra lỗi không mong muốn khi tải từ điển: {e}")
         return
 
-    # 2. Đọc file Excel input
-    if not os.path.exists(INPUT_EXCEL_FILE):
-        print(f"Lỗi: File input '{INPUT_EXCEL_FILE}' không tìm thấy tại '{os.path.abspath(INPUT_EXCEL_FILE)}'.")
+    if args.cache_size > 0 and args.workers <= 1:
+        enable_result_cache(add_dicts, args.cache_size)
+    if args.stage_stats and args.workers <= 1:
+        enable_stage_stats(add_dicts)
+
+    # 2. Kiểm tra file input và định dạng
+    if not os.path.exists(args.input):
+        print(f"Lỗi: File input '{args.input}' không tìm thấy tại '{os.path.abspath(args.input)}'.")
         return
-    
-    print(f"Đang đọc file input: {INPUT_EXCEL_FILE}...")
     try:
-        df_input = pd.read_excel(INPUT_EXCEL_FILE)
-    except Exception as e:
-        print(f"Lỗi khi đọc file Excel '{INPUT_EXCEL_FILE}': {e}")
-        return
-
-    if ADDRESS_COLUMN_NAME not in df_input.columns:
-        print(f"Lỗi: Cột địa chỉ '{ADDRESS_COLUMN_NAME}' không tìm thấy trong file input.")
-        print(f"Các cột hiện có trong file: {df_input.columns.tolist()}")
-        print("Vui lòng kiểm tra và cập nhật biến ADDRESS_COLUMN_NAME trong script.")
+        input_format = detect_format(args.input)
+        output_format = detect_format(args.output)
+    except ValueError as e:
+        print(f"Lỗi: {e}")
         return
 
-    # 3. Chuẩn bị danh sách để lưu kết quả
-    output_data = []
-    total_rows = len(df_input)
-    print(f"Bắt đầu xử lý {total_rows} địa chỉ...")
-
-    # 4. Lặp qua từng hàng (địa chỉ) trong DataFrame input
-    for index, row in df_input.iterrows():
-        original_address = row[ADDRESS_COLUMN_NAME]
-        
-        # Kiểm tra nếu địa chỉ là NaN, None hoặc chuỗi rỗng
-        if pd.isna(original_address) or not isinstance(original_address, str) or not original_address.strip():
-            print(f"Hàng {index + 2}: Địa chỉ rỗng hoặc không hợp lệ. Bỏ qua.")
-            # Thêm một hàng với các giá trị None để giữ cấu trúc
-            result_row = {'Address': original_address}
-            for col in ['tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch']:
-                result_row[col] = None
-            output_data.append(result_row)
-            continue
-
-        # Tạo entity_dict đầu vào cho hàm xử lý
-        entity_input = {'address': [original_address]}
-        
-        try:
-            # Gọi hàm xử lý chính từ address_module
-            processed_entity_dict, _ = update_entity_address(entity_input, add_dicts)
-            
-            # Trích xuất kết quả
-            # Giá trị trả về từ update_entity_address là list một phần tử
-            result_row = {
-                'Address': original_address,
-                'tinh': processed_entity_dict.get('tinh', [None])[0],
-                'tinh_cat': processed_entity_dict.get('tinh_cat', [None])[0],
-                'qh': processed_entity_dict.get('qh', [None])[0],
-                'qh_cat': processed_entity_dict.get('qh_cat', [None])[0],
-                'px': processed_entity_dict.get('px', [None])[0],
-                'px_cat': processed_entity_dict.get('px_cat', [None])[0],
-                'duong': processed_entity_dict.get('duong', [None])[0],
-                'Address_ch': processed_entity_dict.get('Address_ch', [None])[0]
-            }
-            output_data.append(result_row)
-
-        except Exception as e:
-            print(f"Lỗi khi xử lý địa chỉ ở hàng {index + 2} ('{original_address}'): {e}")
-            # Trong trường hợp lỗi, ghi lại địa chỉ gốc và thông báo lỗi
-            result_row = {'Address': original_address, 'Error_Processing': str(e)}
-            for col in ['tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch']:
-                if col not in result_row: result_row[col] = None
-            output_data.append(result_row)
-        
-        if (index + 1) % 100 == 0: # In tiến độ mỗi 100 dòng
-            print(f"Đã xử lý {index + 1}/{total_rows} địa chỉ...")
-
-    print(f"Hoàn tất xử lý {total_rows} địa chỉ.")
+    # 3. Excel -> Excel giữ nguyên cách xử lý cũ, các trường hợp còn lại dùng streaming
+    if input_format == 'excel' and output_format == 'excel':
+        run_excel(args, add_dicts)
+    else:
+        run_streaming(args, add_dicts)
 
-    # 5. Tạo DataFrame từ danh sách kết quả
-    df_output = pd.DataFrame(output_data)
-    
-    # Sắp xếp lại các cột theo thứ tự mong muốn
-    output_columns = ['Address', 'tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch', 'Error_Processing']
-    # Chỉ giữ lại các cột có trong df_output để tránh lỗi nếu cột 'Error_Processing' không tồn tại
-    df_output = df_output.reindex(columns=[col for col in output_columns if col in df_output.columns])
+    if getattr(add_dicts, 'result_cache', None) is not None:
+        print(f"Thống kê cache: {add_dicts.result_cache.stats()}")
+    if getattr(add_dicts, 'stage_stats', None) is not None:
+        write_stage_stats(add_dicts.stage_stats, args.stage_stats)
 
-    # 6. Ghi DataFrame kết quả ra file Excel
-    print(f"Đang ghi kết quả ra file: {OUTPUT_EXCEL_FILE}...")
-    try:
-        df_output.to_excel(OUTPUT_EXCEL_FILE, index=False)
-        print(f"Đã ghi thành công file output: {os.path.abspath(OUTPUT_EXCEL_FILE)}")
-    except Exception as e:
-        print(f"Lỗi khi ghi file Excel '{OUTPUT_EXCEL_FILE}': {e}")
 
 if __name__ == "__main__":
     main()
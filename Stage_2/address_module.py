@@ -4,12 +4,98 @@ import csv
 import json
 import re
 import os
+import pickle
+import hashlib
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from operator import attrgetter
+
+from admin_tree import AdminTree, ADMIN_TREE_FILE, load_admin_tree_json
+from fuzzy_matcher import (FuzzyMatcher, fold_accents, find_whole_words, token_spans, WARD_KEYWORDS,
+                           PROVINCE_PREFIXES)
+from gazetteer import build_gazetteer
+from normalizer import Normalizer, nfc_json, to_nfc
+from result_cache import ParseResultCache
+from stage_stats import StageStats
+from suffix_matcher import SuffixMatcher, NON_DISTRICT_PREFIXES, TRAILING_IGNORED, canonical_tone
 
 
 class AddObj(object):
     pass
 
 
+# (tên từ điển trong add_dicts, loại tỉnh/thành, loại quận/huyện) - đúng thứ tự xử lý
+HCMHN_DICTS = [
+    ('hcm_hn_huyen', 'thành phố', 'huyện'),
+    ('hcm_hn_quan', 'thành phố', 'quận'),
+    ('hcm_hn_tx', 'thành phố', 'thị xã'),
+    ('hcm_hn_tp', 'thành phố', 'thành phố'),  # ---------------update: them
+]
+TINH_DICTS = [
+    ('thanhpho_huyen', 'thành phố', 'huyện'),
+    ('thanhpho_quan', 'thành phố', 'quận'),
+    # ('thanhpho_tx', 'thành phố', 'thị xã'),  # ---------------update: xoa
+    ('tinh_huyen', 'tỉnh', 'huyện'),
+    ('tinh_quan', 'tỉnh', 'quận'),
+    ('tinh_tp', 'tỉnh', 'thành phố'),
+    ('tinh_tx', 'tỉnh', 'thị xã'),
+]
+# (tên từ điển trong add_dicts, loại phường/xã)
+PX_DICTS = [
+    ('huyen_phuong', 'phường'),
+    ('huyen_thitran', 'thị trấn'),
+    ('huyen_xa', 'xã'),
+    ('quan_phuong', 'phường'),
+    ('quan_thitran', 'thị trấn'),
+    ('quan_xa', 'xã'),
+    ('tp_phuong', 'phường'),
+    ('tp_thitran', 'thị trấn'),  # ---------------update: them
+    ('tp_xa', 'xã'),
+    ('tx_phuong', 'phường'),
+    ('tx_thitran', 'thị trấn'),  # ---------------update: them
+    ('tx_xa', 'xã'),
+]
+
+
+# (tên thuộc tính trong add_dicts, đường dẫn tương đối trong thư mục từ điển)
+ADDRESS_DICT_FILES = [
+    # qh_px
+    ('huyen_phuong',   os.path.join('px', 'huyen_phuong.json')),
+    ('huyen_thitran',  os.path.join('px', 'huyen_thitran.json')),
+    ('huyen_xa',       os.path.join('px', 'huyen_xa.json')),
+    ('quan_phuong',    os.path.join('px', 'quan_phuong.json')),
+    ('quan_thitran',   os.path.join('px', 'quan_thitran.json')),
+    ('quan_xa',        os.path.join('px', 'quan_xa.json')),
+    ('tp_phuong',      os.path.join('px', 'tp_phuong.json')),
+    ('tp_thitran',     os.path.join('px', 'tp_thitran.json')),
+    ('tp_xa',          os.path.join('px', 'tp_xa.json')),
+    ('tx_phuong',      os.path.join('px', 'tx_phuong.json')),
+    ('tx_thitran',     os.path.join('px', 'tx_thitran.json')),
+    ('tx_xa',          os.path.join('px', 'tx_xa.json')),
+    # qh_tinh
+    ('thanhpho_huyen', os.path.join('qh', 'thanhpho_huyen.json')),
+    ('thanhpho_quan',  os.path.join('qh', 'thanhpho_quan.json')),
+    ('tinh_huyen',     os.path.join('qh', 'tinh_huyen.json')),
+    ('tinh_quan',      os.path.join('qh', 'tinh_quan.json')),
+    ('tinh_tp',        os.path.join('qh', 'tinh_tp.json')),
+    ('tinh_tx',        os.path.join('qh', 'tinh_tx.json')),
+    # HCM + HN
+    ('hcm_hn_huyen',   os.path.join('hcmhn', 'hcm_hn_huyen.json')),
+    ('hcm_hn_quan',    os.path.join('hcmhn', 'hcm_hn_quan.json')),
+    ('hcm_hn_tx',      os.path.join('hcmhn', 'hcm_hn_tx.json')),
+    ('hcm_hn_tp',      os.path.join('hcmhn', 'hcm_hn_tp.json')),
+    # qh_duong
+    ('qh_d',           'qh_duong.json'),
+]
+CHUANHOA_FILE = 'chuanhoa.csv'
+
+# bundle biên dịch sẵn (Stage 1 tạo ra), tăng BUNDLE_VERSION khi cấu trúc add_dicts thay đổi
+BUNDLE_FILE = 'address_bundle.pkl'
+BUNDLE_VERSION = 8
+
+
 def ch_xlsx_to_csv(project_path, dir_name):
     dir_path = os.path.join(project_path, dir_name)
     ch = pd.read_excel(os.path.join(dir_path, 'chuanhoa.xlsx'))
@@ -21,188 +107,446 @@ def load_json_utf8(filepath):
         return json.load(f)
 
 
-def load_address_dict(project_path, dir_name): #dir_name: thư mục chứa địa chỉ hành chính
+def load_address_dict(project_path, dir_name, use_bundle=True): #dir_name: thư mục chứa địa chỉ hành chính
     # load path
     dir_path = os.path.join(project_path, dir_name)
+    # dùng bundle đã biên dịch sẵn nếu có và còn khớp với các file nguồn
+    if use_bundle:
+        add_dicts = load_address_bundle(dir_path)
+        if add_dicts is not None:
+            return add_dicts
+
     # create obj to store data
     add_dicts = AddObj()
+    # tên trong từ điển được chuẩn hoá NFC giống địa chỉ đầu vào (xem _run_procs)
+    for attr, rel_path in ADDRESS_DICT_FILES:
+        setattr(add_dicts, attr, nfc_json(load_json_utf8(os.path.join(dir_path, rel_path))))
 
-    # qh_px
-    add_dicts.huyen_phuong   = load_json_utf8(os.path.join(dir_path, 'px', 'huyen_phuong.json'))
-    add_dicts.huyen_thitran  = load_json_utf8(os.path.join(dir_path, 'px', 'huyen_thitran.json'))
-    add_dicts.huyen_xa       = load_json_utf8(os.path.join(dir_path, 'px', 'huyen_xa.json'))
-    add_dicts.quan_phuong    = load_json_utf8(os.path.join(dir_path, 'px', 'quan_phuong.json'))
-    add_dicts.quan_thitran   = load_json_utf8(os.path.join(dir_path, 'px', 'quan_thitran.json'))
-    add_dicts.quan_xa        = load_json_utf8(os.path.join(dir_path, 'px', 'quan_xa.json'))
-    add_dicts.tp_phuong      = load_json_utf8(os.path.join(dir_path, 'px', 'tp_phuong.json'))
-    add_dicts.tp_thitran     = load_json_utf8(os.path.join(dir_path, 'px', 'tp_thitran.json'))
-    add_dicts.tp_xa          = load_json_utf8(os.path.join(dir_path, 'px', 'tp_xa.json'))
-    add_dicts.tx_phuong      = load_json_utf8(os.path.join(dir_path, 'px', 'tx_phuong.json'))
-    add_dicts.tx_thitran     = load_json_utf8(os.path.join(dir_path, 'px', 'tx_thitran.json'))
-    add_dicts.tx_xa          = load_json_utf8(os.path.join(dir_path, 'px', 'tx_xa.json'))
+    # chuan hoa
+    add_dicts.chuanhoa       = pd.read_csv(os.path.join(dir_path, CHUANHOA_FILE), header=None, encoding='utf-8')
+    add_dicts.normalizer     = Normalizer.from_table(add_dicts.chuanhoa)
+
+    # cây hành chính tỉnh -> quận/huyện -> phường/xã, đường: dựng từ admin_tree.json
+    # (sinh từ file JSON gốc) nếu có, nếu không thì từ các từ điển phẳng
+    ward_index, street_index = build_district_index(add_dicts)
+    tree_json = nfc_json(load_admin_tree_json(dir_path))
+    if tree_json is None:
+        add_dicts.admin_tree = AdminTree.from_dicts(add_dicts, HCMHN_DICTS + TINH_DICTS, ward_index, street_index)
+    else:
+        add_dicts.admin_tree = AdminTree.from_json(tree_json, HCMHN_DICTS + TINH_DICTS, PX_DICTS, street_index)
+
+    # automaton dùng chung cho mọi địa chỉ, chỉ dựng một lần
+    add_dicts.gazetteer      = build_gazetteer(add_dicts, HCMHN_DICTS + TINH_DICTS, PX_DICTS)
+
+    # trie hậu tố tỉnh/thành + quận/huyện
+    add_dicts.suffix_matcher = SuffixMatcher(add_dicts.admin_tree.iter_districts())
+
+    # chỉ mục không dấu / sai một ký tự, dùng khi so khớp chính xác thất bại
+    add_dicts.fuzzy_matcher  = FuzzyMatcher(add_dicts.admin_tree)
+    return add_dicts
 
-    # qh_tinh
-    add_dicts.thanhpho_huyen = load_json_utf8(os.path.join(dir_path, 'qh', 'thanhpho_huyen.json'))
-    add_dicts.thanhpho_quan  = load_json_utf8(os.path.join(dir_path, 'qh', 'thanhpho_quan.json'))
-    add_dicts.tinh_huyen     = load_json_utf8(os.path.join(dir_path, 'qh', 'tinh_huyen.json'))
-    add_dicts.tinh_quan      = load_json_utf8(os.path.join(dir_path, 'qh', 'tinh_quan.json'))
-    add_dicts.tinh_tp        = load_json_utf8(os.path.join(dir_path, 'qh', 'tinh_tp.json'))
-    add_dicts.tinh_tx        = load_json_utf8(os.path.join(dir_path, 'qh', 'tinh_tx.json'))
 
-    # HCM + HN
-    add_dicts.hcm_hn_huyen   = load_json_utf8(os.path.join(dir_path, 'hcmhn', 'hcm_hn_huyen.json'))
-    add_dicts.hcm_hn_quan    = load_json_utf8(os.path.join(dir_path, 'hcmhn', 'hcm_hn_quan.json'))
-    add_dicts.hcm_hn_tx      = load_json_utf8(os.path.join(dir_path, 'hcmhn', 'hcm_hn_tx.json'))
-    add_dicts.hcm_hn_tp      = load_json_utf8(os.path.join(dir_path, 'hcmhn', 'hcm_hn_tp.json'))
+def source_hash(dir_path):
+    # hash nội dung các file nguồn (JSON + chuanhoa.csv) kèm phiên bản định dạng bundle
+    h = hashlib.sha256(str(BUNDLE_VERSION).encode())
+    rel_paths = [rel_path for _, rel_path in ADDRESS_DICT_FILES] + [CHUANHOA_FILE]
+    if os.path.exists(os.path.join(dir_path, ADMIN_TREE_FILE)):
+        rel_paths.append(ADMIN_TREE_FILE)
+    for rel_path in rel_paths:
+        h.update(rel_path.replace(os.sep, '/').encode('utf-8'))
+        with open(os.path.join(dir_path, rel_path), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def load_address_bundle(dir_path):
+    # trả về None nếu chưa có bundle, bundle cũ hoặc không đọc được -> nạp lại từ JSON
+    bundle_path = os.path.join(dir_path, BUNDLE_FILE)
+    if not os.path.exists(bundle_path):
+        return None
+    try:
+        expected_hash = source_hash(dir_path)
+        with open(bundle_path, 'rb') as f:
+            header = pickle.load(f)
+            if header.get('version') != BUNDLE_VERSION or header.get('source_hash') != expected_hash:
+                return None
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def write_address_bundle(project_path, dir_name):
+    """
+    Biên dịch toàn bộ từ điển, chỉ mục và bảng chuẩn hoá thành một file
+    pickle duy nhất (BUNDLE_FILE) trong thư mục từ điển.
+
+    Returns:
+        str: đường dẫn file bundle.
+    """
+    dir_path = os.path.join(project_path, dir_name)
+    add_dicts = load_address_dict(project_path, dir_name, use_bundle=False)
+    header = {'version': BUNDLE_VERSION, 'source_hash': source_hash(dir_path)}
+
+    bundle_path = os.path.join(dir_path, BUNDLE_FILE)
+    tmp_path = bundle_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(add_dicts, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # ghi ra file tạm rồi đổi tên để tiến trình khác không đọc phải file dở dang
+    os.replace(tmp_path, bundle_path)
+    return bundle_path
+
+
+def _city_check(data, key, text1):
+    # key = key +' ' không có trường hợp bắt sai tên tỉnh vd vinhome không bắt vinh
+    # kiem tra ten tinh
+    if (key + ' ') in (data['Address_ch'][-16:] + ' '):
+        if data['t_check'] != 1:
+            data['t_check'] = 1
+            data['tinh'] = key
+            data['tinh_cat'] = text1
+            data['Address_ch'] = data['Address_ch'].replace(text1+ ' ' + key, '')
+
+
+def _district_check(data, key, value, value_search, text1, text2):
+    if (value_search + ' ') in (data['Address_ch'][-22:] + ' '):
+        if data['h_check'] != 1:
+            data['qh'] = value
+            data['qh_cat'] = text2
+            data['h_check'] = 1
+            data['Address_ch'] = data['Address_ch'].replace(value, '')
+        # neu khong co tinh thi fill tinh
+        if data['t_check'] != 1:
+            data['tinh'] = key
+            data['tinh_cat'] = text1
+            data['t_check'] = 1
+            data['Address_ch'] = data['Address_ch'].replace(key, '')
+
+
+def _ward_check(data, value_1, value_1_search, text1):
+    if (value_1_search + ' ') in (data['Address_ch'] + ' '):
+        data['Address_ch'] = data['Address_ch'].replace(value_1_search, '')
+        data['px'] = value_1
+        data['px_cat'] = text1
+
+
+def _street_check(data, value_2):
+    if (value_2 + ' ') in (data['Address_ch'] + ' '):
+        data['Address_ch'] = data['Address_ch'].replace(value_2, '')
+        data['duong'] = value_2
+
+
+def build_district_index(add_dicts):
+    # (dùng để dựng AdminTree từ các từ điển phẳng)
+    # gộp 12 từ điển px: quận/huyện -> [(phường/xã, loại, dạng tìm kiếm, tên từ điển)] theo đúng thứ tự PX_DICTS
+    ward_index = {}
+    for attr, text1 in PX_DICTS:
+        for district, wards in getattr(add_dicts, attr).items():
+            entries = ward_index.setdefault(district, [])
+            for ward in wards:
+                # tránh trường hợp bắt sai với các phường có số
+                ward_search = ward
+                if len(ward) <= 2 and text1 == 'phường':
+                    ward_search = "phường " + ward
+                entries.append((ward, text1, ward_search, attr))
+    street_index = {district: list(streets) for district, streets in add_dicts.qh_d.items()}
+    return ward_index, street_index
+
+
+def suffix_city_district(data, matcher, gazetteer=None, tree=None):
+    # Xác định tỉnh + quận/huyện từ phần cuối địa chỉ bằng trie hậu tố; phần hành chính
+    # ở cuối bị cắt khỏi Address_ch. False -> chưa chắc chắn, dùng tree_city_district.
+    if matcher is None or data['t_check'] == 1 or data['h_check'] == 1:
+        return False
+    text = data['Address_ch']
+    found = matcher.match(text)
+    if found is None or (tree is not None and _adjacent_district(text, found, tree)):
+        return False
+    _set_city_district(data, found)
+    if gazetteer is not None:
+        gazetteer.truncate(text, found[4])
+    return True
+
+
+def _adjacent_district(text, found, tree):
+    # "cụm cn thanh oai - hà đông": quận/huyện bắt được (không có tiền tố loại) đứng ngay sau
+    # một quận/huyện khác cùng tỉnh -> không chắc chắn; trừ khi phần phía trước là tên
+    # phường/xã của chính quận/huyện đó ("hiệp bình chánh , thủ đức")
+    tinh, _, qh, qh_cat, cut = found
+    if text.startswith(qh_cat + ' ', cut):
+        return False
+    province = tree.provinces.get(tinh)
+    district = province.by_name.get(qh) if province is not None else None
+    if district is None:
+        return False
+    head = ' ' + text[:cut].rstrip(' -')
+    if any(head.endswith(' ' + ward[2]) for ward in district.wards):
+        return False
+    for other in province.districts:
+        if other is not district and other.name != qh and head.endswith(' ' + other.search):
+            before = head[:-len(other.search) - 1].rsplit(None, 1)
+            if not before or before[-1] not in NON_DISTRICT_PREFIXES:
+                return True
+    return False
+
+
+def _set_city_district(data, found):
+    # found: kết quả SuffixMatcher.match, phần hành chính ở cuối bị cắt khỏi Address_ch
+    data['tinh'], data['tinh_cat'], data['qh'], data['qh_cat'], cut = found
+    data['t_check'] = 1
+    data['h_check'] = 1
+    data['Address_ch'] = data['Address_ch'][:cut]
+
+
+def _tree_city_district(data, tree, gazetteer=None):
+    # trả về (quận/huyện bắt được hoặc None, số ứng viên đã so sánh)
+    present = gazetteer.present(data['Address_ch']) if gazetteer is not None else None
+    comparisons = 0
+    province = None
+    if present is None:
+        provinces = tree.province_list
+    else:
+        provinces = sorted((tree.provinces[name] for name in present if name in tree.provinces),
+                           key=attrgetter('order'))
+    for candidate in provinces:
+        comparisons += 1
+        _city_check(data, candidate.name, candidate.cat)
+        if data['t_check'] == 1:
+            province = candidate
+            break
+
+    # đã có tỉnh -> chỉ xét các quận/huyện của tỉnh đó
+    if present is None:
+        districts = province.districts if province is not None else tree.district_list
+    else:
+        present = gazetteer.present(data['Address_ch'])
+        if province is not None:
+            districts = [province.by_search[name] for name in present if name in province.by_search]
+        else:
+            districts = [district for name in present for district in tree.districts_by_search.get(name, ())]
+        districts.sort(key=attrgetter('order'))
+    for district in districts:
+        comparisons += 1
+        if (district.search + ' ') in (data['Address_ch'][-22:] + ' '):
+            _district_check(data, district.province.name, district.name, district.search,
+                            district.province.cat, district.cat)
+            return district, comparisons
+    return None, comparisons
+
+
+def tree_city_district(data, tree, gazetteer=None):
+    # Tìm tỉnh/thành rồi quận/huyện trên cây hành chính: khi đã có tỉnh thì chỉ xét
+    # các quận/huyện của tỉnh đó, chưa có tỉnh thì quận/huyện đầu tiên theo thứ tự ưu tiên
+    if data['t_check'] != 1 and data['h_check'] != 1:
+        _tree_city_district(data, tree, gazetteer)
+    return data
 
-    # qh_duong
-    add_dicts.qh_d           = load_json_utf8(os.path.join(dir_path, 'qh_duong.json'))
 
-    # chuan hoa
-    add_dicts.chuanhoa       = pd.read_csv(os.path.join(dir_path, 'chuanhoa.csv'), header=None, encoding='utf-8')
-    return add_dicts
+def _district_node(data, add_dicts):
+    if data['h_check'] != 1:
+        return None
+    return add_dicts.admin_tree.district(data['tinh'], data['qh'])
 
 
-def city_district(data, dict_data, text1, text2):
-    # Tim thành phố/tỉnh - huyện/quận/thị xã/thành phố
-    for key, values in dict_data.items():
-        # key = key +' ' không có trường hợp bắt sai tên tỉnh vd vinhome không bắt vinh
-        # kiem tra ten tinh
-        if (key + ' ') in (data['Address_ch'][-16:] + ' '):
-            if data['t_check'] != 1:
-                data['t_check'] = 1
-                data['tinh'] = key
-                data['tinh_cat'] = text1
-                data['Address_ch'] = data['Address_ch'].replace(text1+ ' ' + key, '')
-        # kiem tra co huyen khong
-        for value in values:
-            # tránh trường hợp bắt sai với các quận có số
-            value_search = value
-            if len(value) <= 2 and text2 == 'quận': 
-                value_search = "quận " + value
-
-            if (value_search + ' ') in (data['Address_ch'][-22:] + ' '):
-                if data['h_check'] != 1:
-                    data['qh'] = value
-                    data['qh_cat'] = text2
-                    data['h_check'] = 1
-                    data['Address_ch'] = data['Address_ch'].replace(value, '')
-                # neu khong co tinh thi fill tinh
-                if data['t_check'] != 1:
-                    data['tinh'] = key
-                    data['tinh_cat'] = text1
-                    data['t_check'] = 1
-                    data['Address_ch'] = data['Address_ch'].replace(key, '')
+def district_wards(data, add_dicts):
+    # chỉ xét các phường/xã của quận/huyện đã tìm được
+    district = _district_node(data, add_dicts)
+    if district is not None:
+        gazetteer = getattr(add_dicts, 'gazetteer', None)
+        for value_1, text1, value_1_search, _ in district.wards:
+            if gazetteer is None or value_1_search in gazetteer.present(data['Address_ch']):
+                _ward_check(data, value_1, value_1_search, text1)
     return data
 
 
-def district_ward(data, dict_data, text1):
-    # kiem tra co phường/xã/thị trấn khong
-    if data['h_check'] == 1:
-        for key_1, values_1 in dict_data.items():
-            if data['qh'] == key_1:
-                for value_1 in values_1:
-                    # tránh trường hợp bắt sai với các phường có số
-                    # chỉ có phuong mới có số
-                    value_1_search = value_1
-                    if len(value_1) <= 2 and text1 == 'phường':
-                        value_1_search = "phường " + value_1
-                    if (value_1_search + ' ') in (data['Address_ch'] + ' '):
-                        data['Address_ch'] = data['Address_ch'].replace(value_1_search, '')
-                        data['px'] = value_1
-                        data['px_cat'] = text1
+def district_streets(data, add_dicts):
+    district = _district_node(data, add_dicts)
+    if district is not None:
+        gazetteer = getattr(add_dicts, 'gazetteer', None)
+        for value_2 in district.streets:
+            if gazetteer is None or value_2 in gazetteer.present(data['Address_ch']):
+                _street_check(data, value_2)
     return data
 
 
-def district_street(data, dict_data):
-    # kiem tra co duong khong
+def _cut_words(data, folded, start, end):
+    # bỏ các từ start..end-1 (vị trí theo chuỗi không dấu, trùng với Address_ch)
+    spans = token_spans(folded)
+    text = data['Address_ch']
+    data['Address_ch'] = text[:spans[start][0]] + text[spans[end - 1][1]:]
+
+
+def _fuzzy_suffix_accepted(text, folded, found):
+    # Có tên tỉnh đi kèm -> nhận. Chỉ có quận/huyện thì tỉnh được suy ra từ tên quận/huyện,
+    # dễ sai: tên không dấu trùng với đơn vị khác ("quan hoa": huyện quan hóa của thanh hóa,
+    # cũng là phường quan hoa của hà nội), tên có dấu nhưng sai dấu ("văn quán" / "văn quan")
+    # -> chỉ nhận khi có tiền tố loại ("huyen quan hoa") hoặc viết có dấu đúng tên
+    tinh, _, qh, qh_cat, cut = found
+    if (' ' + fold_accents(tinh) + ' ') in (' ' + folded[cut:] + ' '):
+        return True
+    words = text[cut:].split()
+    for ignored in TRAILING_IGNORED:
+        if [fold_accents(word) for word in words[-len(ignored):]] == [fold_accents(word) for word in ignored]:
+            words = words[:-len(ignored)]
+    cat_words = fold_accents(qh_cat).split()
+    has_prefix = len(words) > len(cat_words) and [fold_accents(word) for word in words[:len(cat_words)]] == cat_words
+    name = words[len(cat_words):] if has_prefix else words
+    if [canonical_tone(word) for word in name] == [canonical_tone(word) for word in qh.split()]:
+        return True
+    return has_prefix and all(word == fold_accents(word) for word in name)
+
+
+def _fuzzy_province(text, folded, fuzzy):
+    # tên tỉnh ở cuối: khớp không dấu khi phần đó viết không dấu, sai một ký tự khi có
+    # tiền tố "tinh"/"thanh pho" ("long an" / "cong an", "can tho" / "can ho" dễ bắt sai)
+    words = folded.split()
+    end = fuzzy.tail(words)
+    # sai một ký tự chỉ xét khi có tiền tố loại tỉnh
+    has_prefix = any(prefix[-1] in words for prefix in PROVINCE_PREFIXES)
+    if not has_prefix and (end == 0 or words[end - 1] not in fuzzy.province_last_words):
+        return None
+    for max_distance in ((0, 1) if has_prefix else (0,)):
+        hit = fuzzy.match_at_end(fuzzy.provinces, words, end, max_distance)
+        if hit is None:
+            continue
+        start, province = hit
+        for prefix in PROVINCE_PREFIXES:
+            if start >= len(prefix) and tuple(words[start - len(prefix):start]) == prefix:
+                return start - len(prefix), province
+        spans = token_spans(folded)
+        region = slice(spans[start][0], spans[end - 1][1])
+        if max_distance == 0 and text[region] == folded[region]:
+            return start, province
+    return None
+
+
+def fuzzy_city_district(data, fuzzy):
+    # So khớp không dấu / sai một ký tự cho tỉnh và quận/huyện còn thiếu sau so khớp chính xác.
+    # Quận/huyện chỉ được tìm trong các quận/huyện của tỉnh đã xác định.
     if data['h_check'] == 1:
-        for key_2, values_2 in dict_data.items():
-            if data['qh'] == key_2:
-                for value_2 in values_2:
-                    if (value_2 + ' ') in (data['Address_ch'] + ' '):
-                        data['Address_ch'] = data['Address_ch'].replace(value_2, '')
-                        data['duong'] = value_2
+        return data
+    folded = fold_accents(data['Address_ch'])
+    if data['t_check'] != 1:
+        found = fuzzy.suffix.match(folded)
+        if found is not None and _fuzzy_suffix_accepted(data['Address_ch'], folded, found):
+            _set_city_district(data, found)
+            return data
+        hit = _fuzzy_province(data['Address_ch'], folded, fuzzy)
+        if hit is None:
+            return data
+        start, province = hit
+        words = folded.split()
+        data['tinh'], data['tinh_cat'], data['t_check'] = province.name, province.cat, 1
+        _cut_words(data, folded, start, len(words))
+        folded = fold_accents(data['Address_ch'])
+
+    province = fuzzy.tree.provinces.get(data['tinh'])
+    if province is None:
+        return data
+    words = folded.split()
+    end = fuzzy.tail(words)
+    # tên tỉnh viết không có tiền tố không bị cắt khỏi Address_ch -> bỏ qua khi tìm quận/huyện
+    province_words = tuple(fold_accents(province.name).split())
+    if tuple(words[end - len(province_words):end]) == province_words:
+        end -= len(province_words)
+    hit = fuzzy.match_at_end(fuzzy.district_index(province), words, end)
+    if hit is not None:
+        start, district = hit
+        data['qh'], data['qh_cat'], data['h_check'] = district.name, district.cat, 1
+        _cut_words(data, folded, start, end)
+    return data
+
+
+def fuzzy_ward_street(data, fuzzy):
+    # So khớp không dấu (phường/xã: cả sai một ký tự sau từ khoá "phuong"/"xa"/"tran")
+    # trong các phường/xã, đường của quận/huyện đã xác định
+    if data['h_check'] != 1 or (data['px'] is not None and data['duong'] is not None):
+        return data
+    district = fuzzy.tree.district(data['tinh'], data['qh'])
+    if district is None:
+        return data
+    if data['px'] is None:
+        index, wards = fuzzy.ward_index(district)
+        folded = fold_accents(data['Address_ch'])
+        # khớp nguyên từ: tên không dấu dễ trùng với phần cuối của tên khác ("an phuoc" / "tan phuoc")
+        found = find_whole_words(wards, folded)
+        if found is not None:
+            pos = (' ' + folded + ' ').find(' ' + found[0] + ' ')
+            text = data['Address_ch']
+            data['Address_ch'] = text[:pos] + text[pos + len(found[0]):]
+            data['px'], data['px_cat'] = found[1][0], found[1][1]
+        else:
+            words = folded.split()
+            hit = fuzzy.match_after_keyword(index, words, WARD_KEYWORDS)
+            if hit is not None:
+                start, k, entry = hit
+                data['px'], data['px_cat'] = entry[0], entry[1]
+                _cut_words(data, folded, start, start + k)
+    if data['duong'] is None:
+        folded = fold_accents(data['Address_ch'])
+        found = find_whole_words(fuzzy.street_index(district), folded)
+        if found is not None:
+            pos = (' ' + folded + ' ').find(' ' + found[0] + ' ')
+            text = data['Address_ch']
+            data['Address_ch'] = text[:pos] + text[pos + len(found[0]):]
+            data['duong'] = found[1]
+    return data
+
+
+def unit_ids(data, tree):
+    # mã tỉnh/quận/phường (theo file JSON gốc) của các đơn vị vừa bắt được, lấy từ cây hành chính
+    data['city_id'], data['district_id'], data['ward_id'] = tree.unit_ids(
+        data['tinh'], data['qh'], data['px'], data['px_cat'])
     return data
 
+
 #chuẩn hoá bằng regex
 def add_norm(data, chuanhoa):
-    address = data['Address_ch']
-    vietnamese_letters_only = "a-zA-Zàáãạảăắằẳẵặâấầẩẫậèéẹẽẻêếềểễệđìíỉĩịòóõọỏôốồổỗộơớờởỡợùúũụủưứừửữựỳýỵỷỹ"
-    for i in range(len(chuanhoa)): 
-        abbrev = str(chuanhoa.iloc[i, 0]).strip() 
-        # Lấy từ đầy đủ từ cột 1 của hàng thứ i
-        full = str(chuanhoa.iloc[i, 1]).strip()   
-        # Kiểm tra xem abbrev có rỗng không để tránh lỗi regex
-        if not abbrev:
-            continue
-        # để xử lý các ký tự đặc biệt trong abbrev nếu có
-        pattern_abbrev = r'\b' + re.escape(abbrev) + r'\.?(?![%s])' % vietnamese_letters_only
-        address = re.sub(pattern_abbrev, full, address, flags=re.IGNORECASE)
-
-     # tạo khonảng trắng giữa chữ và số (vd p12-> phường12 -> phường 12)
-     # chữ trước số sau  
-    pattern_letter_then_digit = r'([%s]+)(\d+)' % vietnamese_letters_only
-    address = re.sub(pattern_letter_then_digit, r'\1 \2', address)
-    #  số trước chữ sau
-    pattern_digit_then_letter = r'(\d+)([%s]+)' % vietnamese_letters_only
-    address = re.sub(pattern_digit_then_letter, r'\1 \2', address)
-    # Xóa các ký tự không cần thiết
-    address = address.replace(',', '')
-    address = address.replace('.', ' ')
-    # Chuẩn hóa nhiều khoảng trắng thành một khoảng trắng duy nhất
-    address = re.sub(r'\s\s+', ' ', address).strip()
-
-    data['Address_ch'] = address
+    # chuanhoa: Normalizer dựng sẵn (add_dicts.normalizer) hoặc bảng chuanhoa.csv
+    normalizer = chuanhoa if isinstance(chuanhoa, Normalizer) else Normalizer.from_table(chuanhoa)
+    data['Address_ch'] = normalizer.normalize(data['Address_ch'])
     return data
 
 
+def resolve_city_district(data, add_dicts, use_fuzzy=True):
+    # tỉnh/thành + quận/huyện trên cây hành chính (thay cho việc chia HCM/HN - add_proc_1 và
+    # các tỉnh còn lại - add_proc_2 trước đây): trie hậu tố, vòng theo thứ tự ưu tiên, rồi không dấu
+    # (use_fuzzy=False: chỉ so khớp chính xác, dùng khi đo riêng bước không dấu)
+    gazetteer = getattr(add_dicts, 'gazetteer', None)
+    tree = add_dicts.admin_tree
+    if not suffix_city_district(data, getattr(add_dicts, 'suffix_matcher', None), gazetteer, tree):
+        tree_city_district(data, tree, gazetteer)
+    fuzzy = getattr(add_dicts, 'fuzzy_matcher', None)
+    if use_fuzzy and fuzzy is not None:
+        fuzzy_city_district(data, fuzzy)
+    return data
 
-def add_proc_1(data, add_dicts):
-    # extract
-    city_district(data, add_dicts.hcm_hn_huyen, 'thành phố', 'huyện')
-    city_district(data, add_dicts.hcm_hn_quan, 'thành phố', 'quận')
-    city_district(data, add_dicts.hcm_hn_tx, 'thành phố', 'thị xã')
-    city_district(data, add_dicts.hcm_hn_tp, 'thành phố', 'thành phố')  # ---------------update: them
-    district_ward(data, add_dicts.huyen_phuong, 'phường')
-    district_ward(data, add_dicts.huyen_thitran, 'thị trấn')
-    district_ward(data, add_dicts.huyen_xa, 'xã')
-    district_ward(data, add_dicts.quan_phuong, 'phường')
-    district_ward(data, add_dicts.quan_thitran, 'thị trấn')
-    district_ward(data, add_dicts.quan_xa, 'xã')
-    district_ward(data, add_dicts.tp_phuong, 'phường')
-    district_ward(data, add_dicts.tp_thitran, 'thị trấn')  # ---------------update: them
-    district_ward(data, add_dicts.tp_xa, 'xã')
-    district_ward(data, add_dicts.tx_phuong, 'phường')
-    district_ward(data, add_dicts.tx_thitran, 'thị trấn')  # ---------------update: them
-    district_ward(data, add_dicts.tx_xa, 'xã')
-    district_street(data, add_dicts.qh_d)
+
+def resolve_ward_street(data, add_dicts, use_fuzzy=True):
+    # phường/xã, đường trong quận/huyện đã xác định và mã các đơn vị
+    district_wards(data, add_dicts)
+    district_streets(data, add_dicts)
+    fuzzy = getattr(add_dicts, 'fuzzy_matcher', None)
+    if use_fuzzy and fuzzy is not None:
+        fuzzy_ward_street(data, fuzzy)
+    unit_ids(data, add_dicts.admin_tree)
     return data
 
 
+def add_proc_1(data, add_dicts):
+    # tỉnh/thành -> quận/huyện -> phường/xã -> đường, từ trên xuống trên cây hành chính
+    # (HCM/HN và các tỉnh còn lại trong cùng một lượt, HCM/HN được ưu tiên)
+    stats = getattr(add_dicts, 'stage_stats', None)
+    if stats is not None:
+        return _add_proc_instrumented(data, add_dicts, stats)
+    resolve_city_district(data, add_dicts)
+    return resolve_ward_street(data, add_dicts)
+
+
 def add_proc_2(data, add_dicts):
-    # TinhHuyen-----ssssssssssssssss
-    if data['t_check'] != 1:
-        city_district(data, add_dicts.thanhpho_huyen, 'thành phố', 'huyện')
-        city_district(data, add_dicts.thanhpho_quan, 'thành phố', 'quận')
-        # city_district(data,thanhpho_tx,'thành phố','thị xã')#---------------update: xoa
-        city_district(data, add_dicts.tinh_huyen, 'tỉnh', 'huyện')
-        city_district(data, add_dicts.tinh_quan, 'tỉnh', 'quận')
-        city_district(data, add_dicts.tinh_tp, 'tỉnh', 'thành phố')
-        city_district(data, add_dicts.tinh_tx, 'tỉnh', 'thị xã')
-        district_ward(data, add_dicts.huyen_phuong, 'phường')
-        district_ward(data, add_dicts.huyen_thitran, 'thị trấn')
-        district_ward(data, add_dicts.huyen_xa, 'xã')
-        district_ward(data, add_dicts.quan_phuong, 'phường')
-        district_ward(data, add_dicts.quan_thitran, 'thị trấn')
-        district_ward(data, add_dicts.quan_xa, 'xã')
-        district_ward(data, add_dicts.tp_phuong, 'phường')
-        district_ward(data, add_dicts.tp_thitran, 'thị trấn')  # ---------------update: them
-        district_ward(data, add_dicts.tp_xa, 'xã')
-        district_ward(data, add_dicts.tx_phuong, 'phường')
-        district_ward(data, add_dicts.tx_thitran, 'thị trấn')  # ---------------update: them
-        district_ward(data, add_dicts.tx_xa, 'xã')
-        district_street(data, add_dicts.qh_d)
+    # đã bỏ: các tỉnh ngoài HCM/HN được add_proc_1 xử lý trên cùng cây hành chính
+    warnings.warn('add_proc_2 không còn tác dụng, add_proc_1 đã xử lý mọi tỉnh/thành',
+                  DeprecationWarning, stacklevel=2)
     return data
 
 
@@ -217,34 +561,360 @@ def add_proc_3(data):
     return data
 
 
-def update_entity_address(entity_dict, add_dicts):
-    add_name_dict_keys = ['tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch',
-                          't_check', 'h_check']
-    add_name_dict = dict.fromkeys(add_name_dict_keys)
-
-    data = dict.fromkeys(add_name_dict_keys)
-    # for ent_name in add_name_dict_keys: data[ent_name] = []
-    long_add = max(entity_dict['address'], key=len)
-    data['Address_ch'] = long_add.lower().replace("_", " ")
-
-    # for i, d in enumerate(data): data['Address_ch'][i] = add_norm(data['Address_ch'][i], add_dicts.chuanhoa)
-
-    data = add_norm(data, add_dicts.chuanhoa)
-    data = add_proc_1(data, add_dicts)
-    data = add_proc_2(data, add_dicts)
-    data = add_proc_3(data)
+# ---- đo thời gian / số lần so sánh theo từng bước (chỉ chạy khi đã bật enable_stage_stats) ----
+def enable_stage_stats(add_dicts):
+    # thống kê được giữ trên add_dicts nên chỉ tính cho tiến trình hiện tại
+    add_dicts.stage_stats = StageStats()
+    return add_dicts.stage_stats
+
+
+def disable_stage_stats(add_dicts):
+    add_dicts.stage_stats = None
+
+
+def get_stage_stats(add_dicts):
+    stats = getattr(add_dicts, 'stage_stats', None)
+    return stats.stats() if stats is not None else {}
+
+
+def _run_stage(stats, stage, func, *args):
+    if stats is None:
+        return func(*args)
+    start = time.perf_counter()
+    result = func(*args)
+    stats.record(stage, time.perf_counter() - start)
+    return result
+
+
+def _tree_city_district_instrumented(stats, data, tree, gazetteer):
+    # số ứng viên: các tỉnh, quận/huyện còn lại sau bộ lọc gazetteer và cây hành chính
+    before = (data['tinh'], data['qh'])
+    start = time.perf_counter()
+    district, comparisons = _tree_city_district(data, tree, gazetteer)
+    elapsed = time.perf_counter() - start
+    stats.record('city_district', elapsed, comparisons, int(before != (data['tinh'], data['qh'])))
+    if district is not None:
+        stats.record_dict('city_district', district.source, matches=1)
+
+
+def _district_wards_instrumented(stats, data, add_dicts):
+    district = _district_node(data, add_dicts)
+    entries = district.wards if district is not None else ()
+    before = (data['px'], data['px_cat'])
+    start = time.perf_counter()
+    district_wards(data, add_dicts)
+    elapsed = time.perf_counter() - start
+    matched = (data['px'], data['px_cat']) != before
+    stats.record('district_ward', elapsed, len(entries), int(matched))
+    # thời gian không tách được theo từ điển -> chỉ đếm số so sánh và từ điển bắt được
+    counts = {}
+    for entry in entries:
+        counts[entry[3]] = counts.get(entry[3], 0) + 1
+    matched_attr = None
+    if matched:
+        matched_attr = next((entry[3] for entry in reversed(entries)
+                             if (entry[0], entry[1]) == (data['px'], data['px_cat'])), None)
+    for attr, count in counts.items():
+        stats.record_dict('district_ward', attr, count, int(attr == matched_attr))
+
+
+def _district_streets_instrumented(stats, data, add_dicts):
+    district = _district_node(data, add_dicts)
+    entries = district.streets if district is not None else ()
+    before = data['duong']
+    start = time.perf_counter()
+    district_streets(data, add_dicts)
+    elapsed = time.perf_counter() - start
+    stats.record('district_street', elapsed, len(entries), int(data['duong'] != before))
+
+
+def _fuzzy_instrumented(stats, stage, func, data, fuzzy, fields):
+    before = tuple(data[field] for field in fields)
+    start = time.perf_counter()
+    func(data, fuzzy)
+    elapsed = time.perf_counter() - start
+    stats.record(stage, elapsed, matches=int(before != tuple(data[field] for field in fields)))
+
+
+def _add_proc_instrumented(data, add_dicts, stats):
+    # resolve_city_district / resolve_ward_street được ghi như hai bước riêng, kèm các bước con
+    gazetteer = getattr(add_dicts, 'gazetteer', None)
+    tree = add_dicts.admin_tree
+    fuzzy = getattr(add_dicts, 'fuzzy_matcher', None)
+    before = (data['tinh'], data['qh'])
+    group_start = start = time.perf_counter()
+    matched = suffix_city_district(data, getattr(add_dicts, 'suffix_matcher', None), gazetteer, tree)
+    stats.record('suffix_city_district', time.perf_counter() - start, matches=int(matched))
+    if not matched:
+        _tree_city_district_instrumented(stats, data, tree, gazetteer)
+    if fuzzy is not None:
+        _fuzzy_instrumented(stats, 'fuzzy_city_district', fuzzy_city_district, data, fuzzy, ('tinh', 'qh'))
+    stats.record('resolve_city_district', time.perf_counter() - group_start,
+                 matches=int(before != (data['tinh'], data['qh'])))
+
+    before = (data['px'], data['duong'])
+    group_start = time.perf_counter()
+    _district_wards_instrumented(stats, data, add_dicts)
+    _district_streets_instrumented(stats, data, add_dicts)
+    if fuzzy is not None:
+        _fuzzy_instrumented(stats, 'fuzzy_ward_street', fuzzy_ward_street, data, fuzzy, ('px', 'duong'))
+    unit_ids(data, tree)
+    stats.record('resolve_ward_street', time.perf_counter() - group_start,
+                 matches=int(before != (data['px'], data['duong'])))
+    return data
 
-    for ent_name in add_name_dict_keys: entity_dict[ent_name] = []
-    for ent_name in add_name_dict_keys: entity_dict[ent_name].append(data[ent_name])
 
-    add_name_dict['Address_ch'] = 'address (còn lại)'
-    add_name_dict['tinh_cat'] = 'address (Tỉnh/Thành) prefix'
-    add_name_dict['tinh'] = 'address (Tỉnh/Thành)'
-    add_name_dict['qh_cat'] = 'address (Quận/Huyện) prefix'
-    add_name_dict['qh'] = 'address (Quận/Huyện)'
-    add_name_dict['px_cat'] = 'address (Phường/Xã) prefix'
-    add_name_dict['px'] = 'address (Phường/Xã)'
-    add_name_dict['duong'] = 'address (Đường)'
-    return entity_dict, add_name_dict
+ADD_NAME_DICT_KEYS = ['tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch',
+                      'city_id', 'district_id', 'ward_id', 't_check', 'h_check']
+# các cột kết quả trả về cho chế độ xử lý hàng loạt; *_id là mã trong file JSON gốc
+# (None khi từ điển được dựng không có admin_tree.json)
+RESULT_COLUMNS = ['tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch',
+                  'city_id', 'district_id', 'ward_id']
+ID_COLUMNS = ['city_id', 'district_id', 'ward_id']
+# kết quả bất biến của một địa chỉ, các trường theo ADD_NAME_DICT_KEYS
+ParsedAddress = namedtuple('ParsedAddress', ADD_NAME_DICT_KEYS)
+# vị trí các cột RESULT_COLUMNS trong ParsedAddress
+_RESULT_POSITIONS = [(col, ADD_NAME_DICT_KEYS.index(col)) for col in RESULT_COLUMNS]
+# tên hiển thị của các trường, trả về cùng kết quả của update_entity_address
+ADD_NAME_DISPLAY = {
+    'tinh': 'address (Tỉnh/Thành)',
+    'tinh_cat': 'address (Tỉnh/Thành) prefix',
+    'qh': 'address (Quận/Huyện)',
+    'qh_cat': 'address (Quận/Huyện) prefix',
+    'px': 'address (Phường/Xã)',
+    'px_cat': 'address (Phường/Xã) prefix',
+    'duong': 'address (Đường)',
+    'Address_ch': 'address (còn lại)',
+    'city_id': 'address (Tỉnh/Thành) id',
+    'district_id': 'address (Quận/Huyện) id',
+    'ward_id': 'address (Phường/Xã) id',
+    't_check': None,
+    'h_check': None,
+}
+
+
+def enable_result_cache(add_dicts, maxsize=100000, normalized_maxsize=None):
+    """
+    Bật cache LRU kết quả phân tích (theo chuỗi gốc và chuỗi đã chuẩn hoá) cho
+    add_dicts. Thống kê hit/miss/eviction: add_dicts.result_cache.stats().
+    """
+    add_dicts.result_cache = ParseResultCache(maxsize, normalized_maxsize)
+    return add_dicts.result_cache
+
+
+def disable_result_cache(add_dicts):
+    add_dicts.result_cache = None
+
+
+def prepare_address(address):
+    # chuỗi đầu vào của add_norm: chữ thường, dạng NFC (địa chỉ chép từ hệ thống khác có thể là NFD)
+    return to_nfc(address.lower().replace("_", " "))
+
+
+def _run_procs(address, add_dicts, cache=None):
+    # chạy các bước xử lý trên dict data nội bộ, trả về ParsedAddress
+    data = dict.fromkeys(ADD_NAME_DICT_KEYS)
+    data['Address_ch'] = prepare_address(address)
+
+    stats = getattr(add_dicts, 'stage_stats', None)
+    data = _run_stage(stats, 'add_norm', add_norm, data, add_dicts.normalizer)
+    if cache is not None:
+        # kết quả chỉ phụ thuộc vào chuỗi đã chuẩn hoá
+        normalized = data['Address_ch']
+        cached = cache.normalized.get(normalized)
+        if cached is not None:
+            cache.raw.put(address, cached)
+            return cached
+
+    data = _run_stage(stats, 'add_proc_1', add_proc_1, data, add_dicts)
+    data = _run_stage(stats, 'add_proc_3', add_proc_3, data)
+    record = ParsedAddress(*[data[key] for key in ADD_NAME_DICT_KEYS])
+
+    if cache is not None:
+        cache.raw.put(address, record)
+        cache.normalized.put(normalized, record)
+    return record
+
+
+def parse_address(address, add_dicts):
+    """
+    Xử lý một chuỗi địa chỉ, trả về ParsedAddress (bất biến, có thể dùng chung
+    giữa các lần gọi và với cache kết quả).
+    """
+    cache = getattr(add_dicts, 'result_cache', None)
+    if cache is not None:
+        cached = cache.raw.get(address)
+        if cached is not None:
+            return cached
+    return _run_procs(address, add_dicts, cache)
+
+
+def parse_address_data(address, add_dicts):
+    # tương thích: trả về dict data nội bộ như trước
+    return parse_address(address, add_dicts)._asdict()
+
+
+def is_valid_address(address):
+    # NaN, None, không phải chuỗi hoặc chuỗi rỗng -> không xử lý
+    return isinstance(address, str) and bool(address.strip())
+
+
+def _parse_safely(address, add_dicts):
+    # (ParsedAddress, None) nếu thành công, (None, thông báo lỗi) nếu lỗi, (None, None) nếu địa chỉ không hợp lệ
+    if not is_valid_address(address):
+        return None, None
+    try:
+        return parse_address(address, add_dicts), None
+    except Exception as e:
+        return None, str(e)
+
+
+def parse_addresses(addresses, add_dicts, as_frame=True, dedupe=False):
+    """
+    Xử lý hàng loạt địa chỉ.
+
+    Args:
+        addresses: iterable hoặc pandas Series các chuỗi địa chỉ.
+        add_dicts: kết quả của load_address_dict.
+        as_frame (bool): True -> trả về DataFrame (giữ index nếu đầu vào là Series),
+                         False -> trả về dict {tên cột: list}.
+        dedupe (bool): chỉ phân tích mỗi chuỗi địa chỉ khác nhau một lần trong lô,
+                       các dòng trùng dùng lại kết quả.
+
+    Returns:
+        Các cột RESULT_COLUMNS và 'Error_Processing' (thông báo lỗi của từng dòng,
+        None nếu không lỗi). Địa chỉ rỗng/không hợp lệ cho kết quả None.
+        Với DataFrame, cột 'Error_Processing' chỉ có khi có ít nhất một dòng lỗi.
+    """
+    index = addresses.index if isinstance(addresses, pd.Series) else None
+    if not isinstance(addresses, (list, tuple, pd.Series)):
+        addresses = list(addresses)
+    # ghi thẳng vào các cột cấp phát sẵn, dòng không hợp lệ/lỗi giữ nguyên None
+    n = len(addresses)
+    columns = {col: [None] * n for col in RESULT_COLUMNS + ['Error_Processing']}
+    targets = [(columns[col], pos) for col, pos in _RESULT_POSITIONS]
+    errors = columns['Error_Processing']
+    seen = {} if dedupe else None
+
+    for i, address in enumerate(addresses):
+        if seen is not None and isinstance(address, str):
+            result = seen.get(address)
+            if result is None:
+                result = seen[address] = _parse_safely(address, add_dicts)
+            record, error = result
+        else:
+            record, error = _parse_safely(address, add_dicts)
+        if record is not None:
+            for column, pos in targets:
+                column[i] = record[pos]
+        elif error is not None:
+            errors[i] = error
+
+    if not as_frame:
+        return columns
+    return _columns_to_frame(columns, index)
+
+
+def _columns_to_frame(columns, index=None):
+    if not any(e is not None for e in columns['Error_Processing']):
+        columns = {col: values for col, values in columns.items() if col != 'Error_Processing'}
+    return result_frame(columns, index)
+
+
+def result_frame(columns, index=None):
+    """
+    DataFrame từ dict cột của parse_addresses(as_frame=False). Các cột mã (ID_COLUMNS)
+    luôn có kiểu Int64 (không có mã -> <NA>) để mọi chunk ghi ra cùng một kiểu, kể cả
+    chunk không bắt được đơn vị nào (ví dụ schema Parquet lấy từ chunk đầu tiên).
+    """
+    df = pd.DataFrame(columns, index=index)
+    for col in ID_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('Int64')
+    return df
+
+
+# từ điển của từng tiến trình con, được nạp một lần bởi _init_worker
+_worker_add_dicts = None
+
+
+def _init_worker(project_path, dir_name, cache_size=0):
+    global _worker_add_dicts
+    _worker_add_dicts = load_address_dict(project_path, dir_name)
+    if cache_size:
+        enable_result_cache(_worker_add_dicts, cache_size)
+
+
+def parse_worker_chunk(chunk, dedupe=False, with_cache_stats=False):
+    """
+    Phân tích một chunk địa chỉ trong tiến trình con của make_worker_pool, dùng từ
+    điển đã nạp bởi initializer. Trả về dict cột như parse_addresses(as_frame=False);
+    with_cache_stats=True -> (dict cột, (pid, thống kê cache kết quả của tiến trình hoặc None)).
+    """
+    columns = parse_addresses(chunk, _worker_add_dicts, as_frame=False, dedupe=dedupe)
+    if not with_cache_stats:
+        return columns
+    cache = getattr(_worker_add_dicts, 'result_cache', None)
+    return columns, (os.getpid(), cache.stats() if cache is not None else None)
+
+
+def make_worker_pool(project_path, dir_name, workers=None, cache_size=0):
+    # pool tiến trình dùng lại được cho nhiều lần gọi parse_addresses_parallel;
+    # cache_size > 0 bật cache LRU kết quả trong từng tiến trình
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(project_path, dir_name, cache_size))
+
+
+def parse_addresses_parallel(addresses, project_path, dir_name, workers=None, chunk_size=2000, as_frame=True,
+                             pool=None, dedupe=False, cache_stats=None):
+    """
+    Giống parse_addresses nhưng chia đầu vào thành các chunk và xử lý song song
+    bằng nhiều tiến trình. Mỗi tiến trình tự nạp từ điển một lần (pool initializer),
+    kết quả được ghép lại theo đúng thứ tự đầu vào.
+
+    Args:
+        addresses: iterable hoặc pandas Series các chuỗi địa chỉ.
+        project_path, dir_name: như load_address_dict.
+        workers (int): số tiến trình (None -> số CPU).
+        chunk_size (int): số địa chỉ mỗi lần gửi cho một tiến trình.
+        as_frame (bool): như parse_addresses.
+        pool: pool tạo bởi make_worker_pool để dùng lại giữa các lần gọi
+              (khi đó project_path, dir_name, workers bị bỏ qua).
+        dedupe (bool): như parse_addresses, áp dụng trong từng chunk.
+        cache_stats (dict): nếu có, được cập nhật {pid: thống kê cache kết quả} của các tiến trình
+                            đã xử lý chunk (cache nằm trong tiến trình con, không có ở tiến trình gọi).
+    """
+    index = addresses.index if isinstance(addresses, pd.Series) else None
+    addresses = list(addresses)
+    chunks = [addresses[i:i + chunk_size] for i in range(0, len(addresses), chunk_size)]
+
+    columns = {col: [] for col in RESULT_COLUMNS + ['Error_Processing']}
+    own_pool = pool is None
+    if own_pool:
+        pool = make_worker_pool(project_path, dir_name, workers)
+    try:
+        # map giữ nguyên thứ tự các chunk
+        with_stats = [cache_stats is not None] * len(chunks)
+        for result in pool.map(parse_worker_chunk, chunks, [dedupe] * len(chunks), with_stats):
+            if cache_stats is not None:
+                result, (pid, stats) = result
+                if stats is not None:
+                    cache_stats[pid] = stats
+            for col, values in result.items():
+                columns[col].extend(values)
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    if not as_frame:
+        return columns
+    return _columns_to_frame(columns, index)
 
 
+def update_entity_address(entity_dict, add_dicts):
+    # lớp tương thích: mỗi trường được ghi vào entity_dict dưới dạng list một phần tử
+    long_add = max(entity_dict['address'], key=len)
+    record = parse_address(long_add, add_dicts)
+    for ent_name, value in zip(ADD_NAME_DICT_KEYS, record):
+        entity_dict[ent_name] = [value]
+    return entity_dict, dict(ADD_NAME_DISPLAY)
@@ -0,0 +1,191 @@
+import json
+import os
+
+
+# tên file cây hành chính do Stage 1 sinh ra từ file JSON gốc (không bắt buộc)
+ADMIN_TREE_FILE = 'admin_tree.json'
+# hai thành phố được tách riêng thành các từ điển hcm_hn_* ở Stage 1
+SPECIAL_CITIES = ('hà nội', 'hồ chí minh')
+# loại quận/huyện, phường/xã -> phần tên từ điển tương ứng của Stage 1
+_DISTRICT_SOURCE = {'huyện': 'huyen', 'quận': 'quan', 'thị xã': 'tx', 'thành phố': 'tp'}
+_PROVINCE_SOURCE = {'thành phố': 'thanhpho', 'tỉnh': 'tinh'}
+_WARD_SOURCE = {'phường': 'phuong', 'thị trấn': 'thitran', 'xã': 'xa'}
+
+
+def unit_id(code):
+    # mã đơn vị trong file JSON gốc ('Code') -> số nguyên như ID của Stage 3, None nếu không có
+    if isinstance(code, int):
+        return code
+    return int(code) if code and code.isdigit() else None
+
+
+def district_search(name, cat):
+    # tránh trường hợp bắt sai với các quận có số
+    if len(name) <= 2 and cat == 'quận':
+        return 'quận ' + name
+    return name
+
+
+def ward_search(name, cat):
+    # tránh trường hợp bắt sai với các phường có số
+    if len(name) <= 2 and cat == 'phường':
+        return 'phường ' + name
+    return name
+
+
+class Province(object):
+    def __init__(self, name, cat, order, code=None):
+        self.name = name
+        self.cat = cat
+        self.order = order
+        self.code = code
+        self.districts = []
+        # dạng tìm kiếm -> quận/huyện, tên -> quận/huyện (chỉ trong tỉnh này)
+        self.by_search = {}
+        self.by_name = {}
+
+
+class District(object):
+    def __init__(self, province, name, cat, order, source, code=None):
+        self.province = province
+        self.name = name
+        self.cat = cat
+        self.code = code
+        self.search = district_search(name, cat)
+        self.order = order
+        # tên từ điển Stage 1 tương ứng (vd hcm_hn_quan), dùng cho thống kê
+        self.source = source
+        # [(phường/xã, loại, dạng tìm kiếm, tên từ điển)] theo thứ tự PX_DICTS
+        self.wards = []
+        self.streets = []
+        # (phường/xã, loại) -> mã phường/xã (chỉ có khi dựng từ admin_tree.json)
+        self.ward_codes = {}
+
+
+class AdminTree(object):
+    """
+    Cây hành chính tỉnh/thành -> quận/huyện -> phường/xã, đường. Các cấp được xác
+    định từ trên xuống: khi đã biết tỉnh chỉ xét các quận/huyện của tỉnh đó, khi đã
+    biết quận/huyện chỉ xét các phường/xã, đường của quận/huyện đó.
+
+    Thứ tự ưu tiên (order) giữ đúng thứ tự duyệt các từ điển HCMHN_DICTS + TINH_DICTS
+    của cách làm cũ, dùng khi nhiều đơn vị cùng khớp.
+    """
+    def __init__(self):
+        self.provinces = {}
+        self.province_list = []
+        self.district_list = []
+        # dạng tìm kiếm -> [quận/huyện] của mọi tỉnh, theo thứ tự ưu tiên
+        self.districts_by_search = {}
+        self._districts_by_name = {}
+
+    def _province(self, name, cat, code=None):
+        province = self.provinces.get(name)
+        if province is None:
+            province = self.provinces[name] = Province(name, cat, len(self.province_list), code)
+            self.province_list.append(province)
+        return province
+
+    def add_district(self, province_name, province_cat, name, cat, source, province_code=None, code=None):
+        province = self._province(province_name, province_cat, province_code)
+        district = District(province, name, cat, len(self.district_list), source, code)
+        self.district_list.append(district)
+        province.districts.append(district)
+        province.by_search.setdefault(district.search, district)
+        province.by_name.setdefault(name, district)
+        self.districts_by_search.setdefault(district.search, []).append(district)
+        self._districts_by_name.setdefault(name, []).append(district)
+        return district
+
+    def district(self, province_name, name):
+        # quận/huyện tên name của tỉnh province_name (hoặc quận/huyện cùng tên đầu tiên)
+        province = self.provinces.get(province_name)
+        district = province.by_name.get(name) if province is not None else None
+        if district is None:
+            districts = self._districts_by_name.get(name)
+            district = districts[0] if districts else None
+        return district
+
+    def unit_ids(self, province_name, district_name, ward_name, ward_cat):
+        """
+        Mã (city_id, district_id, ward_id) của các đơn vị đã bắt được, lấy trực tiếp
+        từ các nút của cây; None với cấp chưa xác định hoặc không có mã.
+        """
+        province = self.provinces.get(province_name)
+        if province is None:
+            return None, None, None
+        district = province.by_name.get(district_name)
+        if district is None:
+            return province.code, None, None
+        return province.code, district.code, district.ward_codes.get((ward_name, ward_cat))
+
+    def iter_districts(self):
+        # (tỉnh, loại tỉnh, quận/huyện, loại quận/huyện) theo thứ tự ưu tiên
+        for district in self.district_list:
+            yield district.province.name, district.province.cat, district.name, district.cat
+
+    @classmethod
+    def from_dicts(cls, add_dicts, district_dicts, ward_index, street_index):
+        """
+        Dựng cây từ các từ điển phẳng của Stage 1. Các từ điển phường/xã và đường chỉ
+        có khoá là tên quận/huyện nên các quận/huyện cùng tên dùng chung danh sách con.
+        """
+        tree = cls()
+        for attr, text1, text2 in district_dicts:
+            for key, values in getattr(add_dicts, attr).items():
+                for value in values:
+                    district = tree.add_district(key, text1, value, text2, attr)
+                    district.wards = ward_index.get(value, [])
+                    district.streets = street_index.get(value, [])
+        return tree
+
+    @classmethod
+    def from_json(cls, provinces, district_dicts, ward_dicts, street_index):
+        """
+        Dựng cây từ admin_tree.json (Stage 1 sinh từ file JSON gốc): mỗi quận/huyện có
+        đúng danh sách phường/xã của nó. Chỉ giữ các đơn vị có từ điển tương ứng
+        trong district_dicts / ward_dicts, giống như các từ điển phẳng.
+
+        Args:
+            provinces: [{name, type, code, districts: [{name, type, code, wards: [{name, type, code}]}]}]
+                       (code không bắt buộc)
+        """
+        district_rank = {attr: i for i, (attr, _, _) in enumerate(district_dicts)}
+        ward_rank = {attr: i for i, (attr, _) in enumerate(ward_dicts)}
+        pending = []
+        for province in provinces:
+            province_name = province['name'].lower()
+            province_cat = province['type'].lower()
+            province_code = unit_id(province.get('code'))
+            prefix = 'hcm_hn' if province_name in SPECIAL_CITIES else _PROVINCE_SOURCE.get(province_cat)
+            for district in province.get('districts') or ():
+                district_cat = district['type'].lower()
+                source = '%s_%s' % (prefix, _DISTRICT_SOURCE.get(district_cat))
+                if source in district_rank:
+                    pending.append((district_rank[source], len(pending), province_name, province_cat, province_code,
+                                    district, district_cat, source))
+
+        tree = cls()
+        for _, _, province_name, province_cat, province_code, district, district_cat, source in sorted(
+                pending, key=lambda p: p[:2]):
+            node = tree.add_district(province_name, province_cat, district['name'].lower(), district_cat, source,
+                                     province_code, unit_id(district.get('code')))
+            wards = []
+            for i, ward in enumerate(district.get('wards') or ()):
+                ward_name, ward_cat = ward['name'].lower(), ward['type'].lower()
+                attr = '%s_%s' % (_DISTRICT_SOURCE.get(district_cat), _WARD_SOURCE.get(ward_cat))
+                if attr in ward_rank:
+                    wards.append((ward_rank[attr], i, (ward_name, ward_cat, ward_search(ward_name, ward_cat), attr)))
+                    node.ward_codes.setdefault((ward_name, ward_cat), unit_id(ward.get('code')))
+            node.wards = [entry for _, _, entry in sorted(wards, key=lambda w: w[:2])]
+            node.streets = street_index.get(node.name, [])
+        return tree
+
+
+def load_admin_tree_json(dir_path):
+    # None nếu thư mục từ điển không có admin_tree.json
+    tree_path = os.path.join(dir_path, ADMIN_TREE_FILE)
+    if not os.path.exists(tree_path):
+        return None
+    with open(tree_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
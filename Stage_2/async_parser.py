@@ -0,0 +1,195 @@
+import asyncio
+import collections
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from address_module import load_address_dict, parse_addresses, make_worker_pool, parse_worker_chunk
+
+
+class AsyncAddressParser(object):
+    """
+    Giao diện asyncio cho việc phân tích địa chỉ: việc phân tích (CPU) được đẩy
+    sang pool thread hoặc tiến trình để không chặn event loop. Các lời gọi đồng thời
+    được gom thành lô (tối đa max_batch địa chỉ, chờ tối đa max_wait_ms), hàng đợi
+    có giới hạn max_queue nên bên gửi phải chờ khi hàng đợi đầy (backpressure).
+
+    Args:
+        add_dicts: từ điển đã nạp bằng load_address_dict, dùng chung cho mọi lời gọi
+                   (chế độ 'thread'). None -> tự nạp từ project_path, dir_name.
+        executor (str): 'thread' (dùng chung add_dicts trong tiến trình hiện tại) hoặc
+                        'process' (mỗi tiến trình con tự nạp từ điển một lần).
+        workers (int): số thread/tiến trình, cũng là số lô được xử lý cùng lúc.
+    """
+    def __init__(self, add_dicts=None, project_path='.', dir_name='Stage_1/generated_json', executor='thread',
+                 workers=1, max_batch=256, max_wait_ms=2, max_queue=1024, cache_size=0):
+        if executor not in ('thread', 'process'):
+            raise ValueError("executor phải là 'thread' hoặc 'process'")
+        self.workers = max(1, workers)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        if executor == 'process':
+            self.add_dicts = add_dicts
+            self._executor = make_worker_pool(project_path, dir_name, self.workers, cache_size)
+            self._parse = parse_worker_chunk
+        else:
+            self.add_dicts = add_dicts if add_dicts is not None else load_address_dict(project_path, dir_name)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='address-parser')
+            self._parse = functools.partial(parse_addresses, add_dicts=self.add_dicts, as_frame=False)
+        self._queue = None
+        self._batcher = None
+        self._inflight = None
+        self._loop = None
+        self._closed = False
+        # các lô đang chạy trong executor
+        self._tasks = set()
+
+    def _ensure_started(self):
+        # hàng đợi, semaphore và task gom lô gắn với event loop đang chạy: dựng lại khi
+        # parser được dùng trong một loop khác (vd asyncio.run lần thứ hai) hoặc task đã dừng
+        if self._closed:
+            raise RuntimeError('AsyncAddressParser đã bị đóng')
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._loop is not loop or self._batcher.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._inflight = asyncio.Semaphore(self.workers)
+            self._tasks = set()
+            self._batcher = loop.create_task(self._run())
+
+    async def submit(self, address):
+        # đưa một địa chỉ vào hàng đợi (chờ nếu đầy), trả về future của kết quả
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((address, future))
+        return future
+
+    async def parse_async(self, address):
+        """
+        Phân tích một địa chỉ, trả về dict {tên cột: giá trị} gồm RESULT_COLUMNS
+        và 'Error_Processing'.
+        """
+        return await (await self.submit(address))
+
+    async def parse_stream(self, addresses, max_pending=None):
+        """
+        Phân tích lần lượt các địa chỉ từ một async iterable (hoặc iterable thường),
+        trả về kết quả theo đúng thứ tự đầu vào. Tối đa max_pending địa chỉ
+        (mặc định max_queue) được xử lý dở cùng lúc.
+        """
+        max_pending = max_pending or self.max_queue
+        pending = collections.deque()
+        async for address in _aiter(addresses):
+            pending.append(await self.submit(address))
+            if len(pending) >= max_pending:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+
+    async def _collect(self, batch):
+        # thêm vào batch (tại chỗ, để close() huỷ được lô đang gom dở) tối đa max_batch địa chỉ
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - loop.time()
+            try:
+                if remaining > 0:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                await self._inflight.acquire()
+                task = asyncio.get_running_loop().create_task(self._process(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                batch = []
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+
+    async def _process(self, batch):
+        try:
+            addresses = [address for address, _ in batch]
+            columns = await asyncio.get_running_loop().run_in_executor(self._executor, self._parse, addresses)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._inflight.release()
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result({col: values[i] for col, values in columns.items()})
+
+    async def close(self):
+        """
+        Dừng task gom lô, huỷ các địa chỉ còn trong hàng đợi (bên đang chờ nhận
+        CancelledError), chờ các lô đang xử lý xong rồi tắt executor mà không chặn event loop.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        if self._batcher is not None and self._loop is loop:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        # hàng đợi của loop cũ (đã đóng) không còn ai chờ
+        self._batcher = None
+        self._queue = None
+        await loop.run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+
+async def _aiter(iterable):
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+# parser mặc định cho các hàm tiện ích parse_async / parse_stream
+_default_parser = None
+
+
+def get_default_parser(**kwargs):
+    # tạo một lần (kwargs chỉ có tác dụng ở lần gọi đầu tiên), tạo lại nếu parser cũ đã bị đóng
+    global _default_parser
+    if _default_parser is None or _default_parser._closed:
+        _default_parser = AsyncAddressParser(**kwargs)
+    return _default_parser
+
+
+async def parse_async(address, parser=None):
+    return await (parser or get_default_parser()).parse_async(address)
+
+
+async def parse_stream(addresses, parser=None, max_pending=None):
+    async for result in (parser or get_default_parser()).parse_stream(addresses, max_pending):
+        yield result
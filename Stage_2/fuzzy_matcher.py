@@ -0,0 +1,210 @@
+import re
+
+from suffix_matcher import SuffixMatcher, TRAILING_IGNORED
+
+
+def _build_fold_table():
+    table = {}
+    for base, variants in (('a', 'àáảãạăằắẳẵặâầấẩẫậ'), ('e', 'èéẻẽẹêềếểễệ'), ('i', 'ìíỉĩị'),
+                           ('o', 'òóỏõọôồốổỗộơờớởỡợ'), ('u', 'ùúủũụưừứửữự'), ('y', 'ỳýỷỹỵ'), ('d', 'đ')):
+        for ch in variants:
+            table[ord(ch)] = base
+            table[ord(ch.upper())] = base.upper()
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+_TOKEN = re.compile(r'\S+')
+
+# tên ngắn hơn (tính cả khoảng trắng) hoặc có chữ số chỉ được so khớp không dấu, không cho phép sai ký tự
+MIN_FUZZY_LENGTH = 6
+# từ đứng trước tên phường/xã/thị trấn (đã bỏ dấu)
+WARD_KEYWORDS = ('phuong', 'xa', 'tran')
+# tiền tố loại tỉnh/thành đứng trước tên tỉnh (đã bỏ dấu)
+PROVINCE_PREFIXES = (('tinh',), ('thanh', 'pho'))
+
+
+def fold_accents(text):
+    # bỏ dấu tiếng Việt; mỗi ký tự -> đúng một ký tự nên vị trí trong chuỗi không đổi
+    return text.translate(_FOLD_TABLE)
+
+
+def within_one_edit(a, b):
+    # a, b cách nhau tối đa một phép thêm/xoá/thay ký tự hoặc hoán vị hai ký tự kề nhau
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    n = min(la, lb)
+    while i < n and a[i] == b[i]:
+        i += 1
+    if la > lb:
+        return a[i + 1:] == b[i:]
+    if la < lb:
+        return a[i:] == b[i + 1:]
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    return i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+
+
+def _deletes(text):
+    return {text} | {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+class DeletionIndex(object):
+    """
+    Chỉ mục xoá một ký tự (kiểu SymSpell): tìm các tên cách chuỗi truy vấn tối đa
+    một phép sửa chỉ bằng vài lần tra dict, không phải so với từng tên.
+    """
+    def __init__(self):
+        self._index = {}
+        # số từ của các tên -> độ dài các cửa sổ cần thử
+        self.lengths = ()
+
+    def add(self, name, entry):
+        if len(name.split()) not in self.lengths:
+            self.lengths = tuple(sorted(set(self.lengths) | {len(name.split())}, reverse=True))
+        fuzzy = len(name) >= MIN_FUZZY_LENGTH and not any(ch.isdigit() for ch in name)
+        for key in (_deletes(name) if fuzzy else (name,)):
+            entries = self._index.setdefault(key, [])
+            if not any(item[0] == name and item[1] is entry for item in entries):
+                entries.append((name, entry, fuzzy))
+
+    def lookup(self, query, max_distance=1):
+        """
+        Returns:
+            entry của tên trùng khớp (không dấu) hoặc (max_distance=1) của tên duy nhất
+            cách query một phép sửa; None nếu không có hoặc có nhiều tên cùng cách một phép sửa.
+        """
+        exact = self._index.get(query, ())
+        for name, entry, _ in exact:
+            if name == query:
+                return entry
+        if max_distance < 1 or len(query) < MIN_FUZZY_LENGTH - 1 or any(ch.isdigit() for ch in query):
+            return None
+        found = []
+        for key in _deletes(query):
+            for name, entry, fuzzy in self._index.get(key, ()):
+                if fuzzy and all(entry is not other for other in found) and within_one_edit(query, name):
+                    found.append(entry)
+        return found[0] if len(found) == 1 else None
+
+
+class FuzzyMatcher(object):
+    """
+    Chỉ mục bóng (đã bỏ dấu) cho các tên trên cây hành chính, dùng khi so khớp
+    chính xác không tìm được: địa chỉ không dấu ("phuong ben nghe quan 1") và sai
+    một ký tự. Việc tìm sai ký tự chỉ xét các đơn vị con của cấp đã xác định
+    (quận/huyện của tỉnh, phường/xã của quận/huyện); chỉ mục của từng đơn vị cha
+    được dựng khi cần lần đầu.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.suffix = SuffixMatcher(tree.iter_districts(), fold=fold_accents)
+        self.provinces = DeletionIndex()
+        for province in tree.province_list:
+            self.provinces.add(fold_accents(province.name), province)
+        # từ cuối của các tên tỉnh -> loại nhanh khi không cho phép sai ký tự
+        self.province_last_words = frozenset(fold_accents(p.name).split()[-1] for p in tree.province_list)
+        self._district_indexes = {}
+        self._ward_indexes = {}
+        self._street_indexes = {}
+        self._trailing = tuple(tuple(fold_accents(word) for word in ignored) for ignored in TRAILING_IGNORED)
+
+    def build_indexes(self):
+        # dựng trước mọi chỉ mục con (bình thường được dựng khi cần lần đầu); khoảng nửa giây
+        # và bundle lớn hơn vài lần nên không làm khi nạp, chỉ dùng khi cần độ trễ ổn định (vd benchmark)
+        for province in self.tree.province_list:
+            self.district_index(province)
+        for district in self.tree.district_list:
+            self.ward_index(district)
+            self.street_index(district)
+
+    def district_index(self, province):
+        index = self._district_indexes.get(province.name)
+        if index is None:
+            index = DeletionIndex()
+            for district in province.districts:
+                index.add(fold_accents(district.search), district)
+                index.add(fold_accents(district.cat + ' ' + district.name), district)
+            self._district_indexes[province.name] = index
+        return index
+
+    def ward_index(self, district):
+        # (DeletionIndex, chỉ mục theo từ đầu tiên) các phường/xã của quận/huyện
+        wards = self._ward_indexes.get(district.order)
+        if wards is None:
+            index = DeletionIndex()
+            for entry in district.wards:
+                index.add(fold_accents(entry[2]), entry)
+            wards = (index, _first_word_index((fold_accents(entry[2]), entry) for entry in district.wards))
+            self._ward_indexes[district.order] = wards
+        return wards
+
+    def street_index(self, district):
+        streets = self._street_indexes.get(district.order)
+        if streets is None:
+            streets = _first_word_index((fold_accents(street), street) for street in district.streets)
+            self._street_indexes[district.order] = streets
+        return streets
+
+    def tail(self, words):
+        # số từ còn lại sau khi bỏ các từ cuối được bỏ qua (vd "viet nam")
+        end = len(words)
+        for ignored in self._trailing:
+            if tuple(words[end - len(ignored):end]) == ignored:
+                end -= len(ignored)
+        return end
+
+    @staticmethod
+    def match_at_end(index, words, end, max_distance=1):
+        # tên dài nhất (theo số từ) kết thúc ngay trước words[end] -> (vị trí từ đầu, entry)
+        for k in index.lengths:
+            if k <= end:
+                entry = index.lookup(' '.join(words[end - k:end]), max_distance)
+                if entry is not None:
+                    return end - k, entry
+        return None
+
+    @staticmethod
+    def match_after_keyword(index, words, keywords):
+        # tên dài nhất đứng ngay sau một từ khoá (vd "phuong") -> (vị trí từ đầu, số từ, entry)
+        for i, word in enumerate(words[:-1]):
+            if word in keywords:
+                for k in index.lengths:
+                    if i + 1 + k <= len(words):
+                        entry = index.lookup(' '.join(words[i + 1:i + 1 + k]))
+                        if entry is not None:
+                            return i + 1, k, entry
+        return None
+
+
+def _first_word_index(names):
+    # từ đầu tiên -> [(thứ tự, tên không dấu, entry)]
+    index = {}
+    for order, (name, entry) in enumerate(names):
+        if name:
+            index.setdefault(name.split()[0], []).append((order, name, entry))
+    return index
+
+
+def find_whole_words(index, folded):
+    """
+    Tên (trong chỉ mục _first_word_index) xuất hiện nguyên từ trong chuỗi không dấu;
+    nếu có nhiều tên thì lấy tên đứng sau cùng theo thứ tự chỉ mục, giống các vòng
+    so khớp chính xác. Returns: (tên không dấu, entry) hoặc None.
+    """
+    best = None
+    padded = ' ' + folded + ' '
+    for word in set(folded.split()):
+        for candidate in index.get(word, ()):
+            if (best is None or candidate[0] > best[0]) and (' ' + candidate[1] + ' ') in padded:
+                best = candidate
+    return (best[1], best[2]) if best is not None else None
+
+
+def token_spans(text):
+    # [(vị trí bắt đầu, vị trí kết thúc)] của từng từ
+    return [m.span() for m in _TOKEN.finditer(text)]
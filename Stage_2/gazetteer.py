@@ -0,0 +1,137 @@
+from collections import deque
+
+
+class AhoCorasick(object):
+    """
+    Automaton Aho–Corasick: tìm tất cả các mẫu xuất hiện trong một chuỗi
+    chỉ với một lần duyệt từ trái sang phải.
+    """
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+    def add(self, pattern):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        if pattern not in self._out[state]:
+            self._out[state] = self._out[state] + (pattern,)
+
+    def build(self):
+        # duyệt BFS để tính liên kết fail, các nút nông hơn luôn được xử lý trước
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        return self
+
+    def iter_matches(self, text):
+        # trả về (start, end, pattern) cho mọi lần xuất hiện, kể cả chồng lấn
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pattern in out[state]:
+                    yield i + 1 - len(pattern), i + 1, pattern
+
+
+class Gazetteer(object):
+    """
+    Tập hợp toàn bộ tên tỉnh/thành, quận/huyện, phường/xã, đường (dạng dùng để
+    tìm kiếm) trong một automaton duy nhất, dùng làm bộ lọc trước cho các bước
+    so khớp trên cây hành chính (tree_city_district, district_wards, district_streets).
+
+    Một tên được coi là "có mặt" khi (tên + ' ') in (địa chỉ + ' '), đúng như
+    điều kiện của các bước đó.
+    """
+    def __init__(self):
+        self.automaton = AhoCorasick()
+        self.kinds = {}
+        self._last = (None, frozenset(), ())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # kết quả quét gần nhất không cần lưu vào bundle
+        state['_last'] = (None, frozenset(), ())
+        return state
+
+    def _add_name(self, name, kind):
+        kinds = self.kinds.get(name)
+        if kinds is None:
+            self.kinds[name] = (kind,)
+            self.automaton.add(name + ' ')
+        elif kind not in kinds:
+            self.kinds[name] = kinds + (kind,)
+
+    def _add_dict(self, kind, dict_data, text):
+        for key, values in dict_data.items():
+            if kind == 'qh':
+                self._add_name(key, 'tinh')
+            for value in values:
+                # tránh trường hợp bắt sai với các quận/phường có số
+                if len(value) <= 2 and ((kind == 'qh' and text == 'quận') or (kind == 'px' and text == 'phường')):
+                    value = text + ' ' + value
+                self._add_name(value, kind)
+
+    def add_district_dict(self, dict_data, text2):
+        # tỉnh -> quận/huyện
+        self._add_dict('qh', dict_data, text2)
+
+    def add_ward_dict(self, dict_data, text1):
+        # quận/huyện -> phường/xã/thị trấn
+        self._add_dict('px', dict_data, text1)
+
+    def add_street_dict(self, dict_data):
+        # quận/huyện -> đường
+        self._add_dict('duong', dict_data, None)
+
+    def build(self):
+        self.automaton.build()
+        return self
+
+    def present(self, text):
+        # các tên có mặt trong text; kết quả của lần quét gần nhất được giữ lại
+        last_text, last_names, _ = self._last
+        if text == last_text:
+            return last_names
+        ends = [(end, pattern[:-1]) for _, end, pattern in self.automaton.iter_matches(text + ' ')]
+        names = frozenset(name for _, name in ends)
+        self._last = (text, names, ends)
+        return names
+
+    def truncate(self, text, cut):
+        # Địa chỉ text bị cắt còn text[:cut] (cut là đầu một từ): các tên có mặt trong
+        # phần còn lại suy ra từ lần quét trước, không cần quét lại
+        last_text, _, ends = self._last
+        if text != last_text:
+            return
+        ends = [(end, name) for end, name in ends if end <= cut]
+        self._last = (text[:cut], frozenset(name for _, name in ends), ends)
+
+
+def build_gazetteer(add_dicts, district_dicts, ward_dicts):
+    gazetteer = Gazetteer()
+    for attr, _, text2 in district_dicts:
+        gazetteer.add_district_dict(getattr(add_dicts, attr), text2)
+    for attr, text1 in ward_dicts:
+        gazetteer.add_ward_dict(getattr(add_dicts, attr), text1)
+    gazetteer.add_street_dict(add_dicts.qh_d)
+    return gazetteer.build()
@@ -0,0 +1,88 @@
+import re
+import unicodedata
+
+
+VIETNAMESE_LETTERS_ONLY = "a-zA-Zàáãạảăắằẳẵặâấầẩẫậèéẹẽẻêếềểễệđìíỉĩịòóõọỏôốồổỗộơớờởỡợùúũụủưứừửữựỳýỵỷỹ"
+
+
+def to_nfc(text):
+    """
+    Đưa chuỗi về dạng dựng sẵn (NFC): dấu tiếng Việt tổ hợp (NFD, vd "a" + dấu sắc
+    rời) không khớp với VIETNAMESE_LETTERS_ONLY và các từ điển. Phần lớn địa chỉ đã
+    là NFC nên chỉ kiểm tra nhanh (is_normalized), không tạo chuỗi mới.
+    """
+    if unicodedata.is_normalized('NFC', text):
+        return text
+    return unicodedata.normalize('NFC', text)
+
+
+def nfc_json(value):
+    # chuẩn hoá NFC mọi chuỗi (kể cả khoá) trong dữ liệu JSON đã đọc
+    if isinstance(value, str):
+        return to_nfc(value)
+    if isinstance(value, dict):
+        return {nfc_json(key): nfc_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [nfc_json(item) for item in value]
+    return value
+
+
+class Normalizer(object):
+    """
+    Chuẩn hoá địa chỉ bằng regex, các pattern chỉ được biên dịch một lần.
+
+    Kết quả giống hệt cách làm cũ (một re.sub cho từng dòng của chuanhoa.csv):
+    các từ viết tắt được gộp thành một alternation theo đúng thứ tự trong bảng
+    và được thay thế qua tra cứu dict trong một lần duyệt.
+    """
+    def __init__(self, pairs):
+        self.replacements = {}
+        alternatives = []
+        for abbrev, full in pairs:
+            abbrev = to_nfc(str(abbrev).strip())
+            # Lấy từ đầy đủ từ cột 1
+            full = to_nfc(str(full).strip())
+            # Kiểm tra xem abbrev có rỗng không để tránh lỗi regex
+            if not abbrev or abbrev.lower() in self.replacements:
+                continue
+            self.replacements[abbrev.lower()] = full
+            # để xử lý các ký tự đặc biệt trong abbrev nếu có
+            alternatives.append(re.escape(abbrev))
+
+        self.pattern_abbrev = None
+        if alternatives:
+            self.pattern_abbrev = re.compile(r'\b(%s)\.?(?![%s])' % ('|'.join(alternatives), VIETNAMESE_LETTERS_ONLY),
+                                             flags=re.IGNORECASE)
+        # tạo khoảng trắng giữa chữ và số (vd p12-> phường12 -> phường 12)
+        self.pattern_letter_then_digit = re.compile(r'([%s]+)(\d+)' % VIETNAMESE_LETTERS_ONLY)
+        self.pattern_digit_then_letter = re.compile(r'(\d+)([%s]+)' % VIETNAMESE_LETTERS_ONLY)
+        self.pattern_spaces = re.compile(r'\s\s+')
+
+    @classmethod
+    def from_table(cls, chuanhoa):
+        # chuanhoa: DataFrame đọc từ chuanhoa.csv (cột 0: viết tắt, cột 1: đầy đủ)
+        return cls(zip(chuanhoa.iloc[:, 0].tolist(), chuanhoa.iloc[:, 1].tolist()))
+
+    def _replace(self, match):
+        abbrev = match.group(1)
+        full = self.replacements.get(abbrev)
+        if full is None:
+            full = self.replacements[abbrev.lower()]
+        return full
+
+    def normalize(self, address):
+        if self.pattern_abbrev is not None:
+            address = self.pattern_abbrev.sub(self._replace, address)
+        # chữ trước số sau
+        address = self.pattern_letter_then_digit.sub(r'\1 \2', address)
+        # số trước chữ sau
+        address = self.pattern_digit_then_letter.sub(r'\1 \2', address)
+        # Xóa các ký tự không cần thiết
+        address = address.replace(',', '')
+        address = address.replace('.', ' ')
+        # Chuẩn hóa nhiều khoảng trắng thành một khoảng trắng duy nhất
+        return self.pattern_spaces.sub(' ', address).strip()
+
+    def normalize_many(self, addresses):
+        normalize = self.normalize
+        return [normalize(address) for address in addresses]
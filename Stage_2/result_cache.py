@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Cache LRU có giới hạn số phần tử, đếm số lần hit/miss/eviction.
+    An toàn khi dùng từ nhiều thread.
+    """
+    def __init__(self, maxsize=100000):
+        if maxsize <= 0:
+            raise ValueError("maxsize phải lớn hơn 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._data), 'maxsize': self.maxsize}
+
+
+class ParseResultCache(object):
+    """
+    Cache kết quả phân tích địa chỉ theo hai khoá: chuỗi gốc và chuỗi sau khi
+    chuẩn hoá (add_norm). Các biến thể viết tắt khác nhau của cùng một địa chỉ
+    (vd "p.12, q.3" và "phường 12 quận 3") dùng chung kết quả qua khoá chuẩn hoá.
+    """
+    def __init__(self, maxsize=100000, normalized_maxsize=None):
+        self.raw = LRUCache(maxsize)
+        self.normalized = LRUCache(normalized_maxsize if normalized_maxsize is not None else maxsize)
+
+    def clear(self):
+        self.raw.clear()
+        self.normalized.clear()
+
+    def stats(self):
+        return {'raw': self.raw.stats(), 'normalized': self.normalized.stats()}
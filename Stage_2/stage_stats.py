@@ -0,0 +1,96 @@
+import json
+import threading
+
+
+def _empty():
+    return {'calls': 0, 'seconds': 0.0, 'comparisons': 0, 'matches': 0}
+
+
+def _add(counter, calls, seconds, comparisons, matches):
+    counter['calls'] += calls
+    counter['seconds'] += seconds
+    counter['comparisons'] += comparisons
+    counter['matches'] += matches
+
+
+class StageStats(object):
+    """
+    Thống kê cộng dồn theo từng bước xử lý (add_norm, add_proc_1, city_district, ...):
+    số lần gọi, tổng thời gian (giây), số ứng viên được so sánh và số lần bắt được.
+    Các bước duyệt từ điển có thêm thống kê theo từng từ điển (vd huyen_xa).
+    An toàn khi dùng từ nhiều thread.
+    """
+    METRICS = (
+        ('calls', 'counter', 'Số lần gọi'),
+        ('seconds', 'counter', 'Tổng thời gian (giây)'),
+        ('comparisons', 'counter', 'Số ứng viên được so sánh'),
+        ('matches', 'counter', 'Số lần bắt được giá trị mới'),
+    )
+
+    def __init__(self):
+        self._stages = {}
+        self._dicts = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds=0.0, comparisons=0, matches=0, dict_name=None, calls=1):
+        with self._lock:
+            counter = self._stages.get(stage)
+            if counter is None:
+                counter = self._stages[stage] = _empty()
+            _add(counter, calls, seconds, comparisons, matches)
+            if dict_name is not None:
+                counter = self._dicts.get((stage, dict_name))
+                if counter is None:
+                    counter = self._dicts[(stage, dict_name)] = _empty()
+                _add(counter, calls, seconds, comparisons, matches)
+
+    def record_dict(self, stage, dict_name, comparisons=0, matches=0):
+        # chỉ cộng vào thống kê theo từ điển (khi thời gian không tách riêng được từng từ điển)
+        with self._lock:
+            counter = self._dicts.get((stage, dict_name))
+            if counter is None:
+                counter = self._dicts[(stage, dict_name)] = _empty()
+            _add(counter, 0, 0.0, comparisons, matches)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._dicts.clear()
+
+    def stats(self):
+        # {stage: {calls, seconds, comparisons, matches, dicts: {dict_name: {...}}}}
+        with self._lock:
+            result = {stage: dict(counter, dicts={}) for stage, counter in self._stages.items()}
+            for (stage, dict_name), counter in self._dicts.items():
+                result.setdefault(stage, dict(_empty(), dicts={}))['dicts'][dict_name] = dict(counter)
+        return result
+
+    def hot_dictionaries(self, n=10, by='comparisons'):
+        # các (stage, từ điển) tốn nhiều nhất theo tiêu chí `by`
+        with self._lock:
+            items = [(stage, dict_name, counter[by]) for (stage, dict_name), counter in self._dicts.items()]
+        return sorted(items, key=lambda item: item[2], reverse=True)[:n]
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.stats(), ensure_ascii=False, **kwargs)
+
+    def to_prometheus(self, prefix='address_parser'):
+        # định dạng text exposition của Prometheus
+        stats = self.stats()
+        lines = []
+        for scope, label_names in (('stage', ('stage',)), ('dictionary', ('stage', 'dictionary'))):
+            for metric, metric_type, help_text in self.METRICS:
+                name = f"{prefix}_{scope}_{metric}_total"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for stage, counter in sorted(stats.items()):
+                    rows = [((stage,), counter)] if scope == 'stage' else \
+                        [((stage, dict_name), c) for dict_name, c in sorted(counter['dicts'].items())]
+                    for label_values, c in rows:
+                        labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, label_values))
+                        lines.append(f"{name}{{{labels}}} {c[metric]}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,117 @@
+import os
+import json
+
+import pandas as pd
+
+
+# Định dạng hỗ trợ đọc/ghi theo chunk (Excel chỉ nên dùng cho file nhỏ)
+STREAM_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+def detect_format(filepath):
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in EXCEL_EXTENSIONS:
+        return 'excel'
+    if ext not in STREAM_FORMATS:
+        raise ValueError(f"Định dạng file không được hỗ trợ: '{filepath}' "
+                         f"(hỗ trợ: {', '.join(sorted(STREAM_FORMATS) + list(EXCEL_EXTENSIONS))})")
+    return STREAM_FORMATS[ext]
+
+
+def _import_pyarrow_parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Đọc/ghi Parquet cần cài đặt pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def iter_input_chunks(filepath, chunk_rows=50000, columns=None):
+    """
+    Đọc file đầu vào theo từng chunk DataFrame với index liên tục (0, 1, 2, ...
+    tính trên toàn file), để bộ nhớ không tăng theo kích thước file.
+    File Excel không đọc theo chunk được nên được đọc một lần rồi chia nhỏ.
+    """
+    fmt = detect_format(filepath)
+    if fmt == 'csv':
+        yield from pd.read_csv(filepath, chunksize=chunk_rows, usecols=columns, encoding='utf-8')
+    elif fmt == 'jsonl':
+        with pd.read_json(filepath, lines=True, chunksize=chunk_rows, encoding='utf-8') as reader:
+            for chunk in reader:
+                yield chunk[columns] if columns else chunk
+    elif fmt == 'parquet':
+        _, pq = _import_pyarrow_parquet()
+        offset = 0
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunk_rows, columns=columns):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+    else:
+        df = pd.read_excel(filepath, usecols=columns)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+class ChunkWriter(object):
+    """
+    Ghi nối tiếp từng chunk DataFrame ra CSV, JSONL hoặc Parquet.
+    Với Excel, các chunk được gom lại và chỉ ghi khi close() (chỉ dùng cho file nhỏ).
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.format = detect_format(filepath)
+        self.rows = 0
+        self._started = False
+        self._parquet_writer = None
+        self._schema = None
+        self._excel_chunks = []
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.filepath, mode='a' if self._started else 'w', header=not self._started,
+                      index=False, encoding='utf-8')
+        elif self.format == 'jsonl':
+            with open(self.filepath, 'a' if self._started else 'w', encoding='utf-8') as f:
+                # giá trị thiếu (NaN, <NA> của cột Int64) -> null
+                for record in df.astype(object).where(df.notna(), None).to_dict(orient='records'):
+                    f.write(json.dumps(record, ensure_ascii=False, default=str))
+                    f.write('\n')
+        elif self.format == 'parquet':
+            self._write_parquet(df)
+        else:
+            self._excel_chunks.append(df)
+        self._started = True
+        self.rows += len(df)
+
+    def _write_parquet(self, df):
+        pa, pq = _import_pyarrow_parquet()
+        if self._parquet_writer is None:
+            # cột toàn None trong chunk đầu sẽ bị suy ra kiểu null -> các cột object luôn là string
+            inferred = pa.Schema.from_pandas(df, preserve_index=False)
+            self._schema = pa.schema([
+                pa.field(col, pa.string()) if df[col].dtype == object or pd.api.types.is_string_dtype(df[col])
+                else inferred.field(col)
+                for col in df.columns
+            ])
+            self._parquet_writer = pq.ParquetWriter(self.filepath, self._schema)
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._parquet_writer.write_table(table)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self.format == 'excel':
+            df = pd.concat(self._excel_chunks) if self._excel_chunks else pd.DataFrame()
+            df.to_excel(self.filepath, index=False)
+            self._excel_chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
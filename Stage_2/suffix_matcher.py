@@ -0,0 +1,181 @@
+# các từ ở cuối địa chỉ được bỏ qua khi tìm phần hành chính
+TRAILING_IGNORED = (('việt', 'nam'),)
+# từ đứng trước tên cấp phường/xã/đường -> tên phía sau không phải quận/huyện
+NON_DISTRICT_PREFIXES = ('phường', 'xã', 'trấn', 'đường', 'phố')
+# từ chỉ đơn vị lân cận ("giáp quận 11", "gần quận 1") -> tên phía sau không phải địa chỉ
+NEIGHBOUR_PREFIXES = ('giáp', 'gần', 'cạnh')
+
+# dấu thanh đặt theo kiểu cũ/mới ("hoà"/"hòa", "thuý"/"thúy") -> cùng một dạng khi so khớp
+_TONE_SHIFT = {}
+for _lead, _lead_toned, _base, _base_toned in (('o', 'òóỏõọ', 'a', 'àáảãạ'), ('o', 'òóỏõọ', 'e', 'èéẻẽẹ'),
+                                               ('u', 'ùúủũụ', 'y', 'ỳýỷỹỵ')):
+    for _a, _b in zip(_lead_toned, _base_toned):
+        _TONE_SHIFT[_lead + _b] = _a + _base
+
+
+def canonical_tone(word):
+    shifted = _TONE_SHIFT.get(word[-2:])
+    return word if shifted is None else word[:-2] + shifted
+
+
+def _canonical_tokens(name):
+    return [canonical_tone(word) for word in name.split()]
+
+
+class ReverseTokenTrie(object):
+    """
+    Trie trên các từ của tên, được thêm theo thứ tự ngược (từ cuối lên đầu) để
+    tìm các tên kết thúc tại một vị trí trong địa chỉ bằng cách đi ngược từng từ.
+    """
+    def __init__(self):
+        self._children = [{}]
+        self._entries = [()]
+        self.max_tokens = 0
+
+    def add(self, tokens, entry):
+        self.max_tokens = max(self.max_tokens, len(tokens))
+        node = 0
+        for token in reversed(tokens):
+            nxt = self._children[node].get(token)
+            if nxt is None:
+                nxt = len(self._children)
+                self._children[node][token] = nxt
+                self._children.append({})
+                self._entries.append(())
+            node = nxt
+        self._entries[node] = self._entries[node] + (entry,)
+
+    def last_tokens(self):
+        return self._children[0].keys()
+
+    def matches(self, words, end):
+        # [(start, entries)] của mọi tên kết thúc ngay trước words[end], từ ngắn đến dài
+        found = []
+        node = 0
+        children, entries = self._children, self._entries
+        for i in range(end - 1, -1, -1):
+            word = words[i]
+            child = children[node].get(word)
+            if child is None:
+                # thử lại với dấu thanh chuẩn hoá (chỉ khi từ có dạng "oà", "uý", ...)
+                shifted = _TONE_SHIFT.get(word[-2:])
+                if shifted is None:
+                    break
+                child = children[node].get(word[:-2] + shifted)
+                if child is None:
+                    break
+            node = child
+            if entries[node]:
+                found.append((i, entries[node]))
+        return found
+
+
+class SuffixMatcher(object):
+    """
+    Tìm tỉnh/thành và quận/huyện ở cuối địa chỉ: đi ngược từng từ để lấy tên tỉnh
+    dài nhất (có hoặc không có tiền tố 'tỉnh'/'thành phố'), sau đó tên quận/huyện
+    dài nhất thuộc tỉnh đó đứng ngay trước. Thời gian tỉ lệ với độ dài phần hậu tố.
+
+    Args:
+        districts: iterable (tỉnh, loại tỉnh, quận/huyện, loại quận/huyện) theo thứ tự ưu tiên,
+                   vd AdminTree.iter_districts().
+        fold: hàm biến đổi tên trước khi đưa vào trie (vd bỏ dấu), địa chỉ truyền vào
+              match() phải được biến đổi bằng cùng hàm đó. Kết quả vẫn là tên gốc.
+    """
+    def __init__(self, districts, fold=None):
+        self.provinces = ReverseTokenTrie()
+        self.districts = ReverseTokenTrie()
+        if fold is None:
+            _tokens = _canonical_tokens
+        else:
+            def _tokens(name):
+                return fold(name).split()
+        self._trailing = tuple(tuple(_tokens(' '.join(ignored))) for ignored in TRAILING_IGNORED)
+        self._non_district = frozenset(_tokens(' '.join(NON_DISTRICT_PREFIXES)))
+        self._neighbour = frozenset(_tokens(' '.join(NEIGHBOUR_PREFIXES)))
+        seen_provinces = set()
+        for order, (key, text1, value, text2) in enumerate(districts):
+            for name, prefix in ((key, None), (text1 + ' ' + key, text1)):
+                if (name, prefix) not in seen_provinces:
+                    seen_provinces.add((name, prefix))
+                    self.provinces.add(_tokens(name), (key, prefix))
+            # (thứ tự, tỉnh, quận/huyện, loại tỉnh, loại quận/huyện, có tiền tố)
+            self.districts.add(_tokens(text2 + ' ' + value), (order, key, value, text1, text2, True))
+            # quận có số chỉ được nhận khi có tiền tố 'quận'
+            if not (len(value) <= 2 and text2 == 'quận'):
+                self.districts.add(_tokens(value), (order, key, value, text1, text2, False))
+        # các từ có thể đứng cuối một tên -> loại nhanh các địa chỉ không kết thúc bằng tên hành chính
+        self.last_tokens = frozenset(self.provinces.last_tokens()) | frozenset(self.districts.last_tokens())
+        # số từ cuối tối đa cần xét
+        self.max_tokens = (self.provinces.max_tokens + self.districts.max_tokens
+                           + max(len(ignored) for ignored in TRAILING_IGNORED))
+
+    def _district_before(self, words, end, accept):
+        # quận/huyện dài nhất kết thúc ngay trước words[end] thoả accept(entry)
+        for start, entries in reversed(self.districts.matches(words, end)):
+            candidates = [entry for entry in entries if accept(entry)]
+            if not candidates:
+                continue
+            entry = min(candidates)
+            before = words[start - 1] if start > 0 else None
+            if not entry[5] and before in self._non_district:
+                # "phường tân bình": tên phía sau là phường/xã, không phải quận/huyện
+                return None
+            if before in self._neighbour:
+                # "giáp quận 11": đơn vị lân cận, không phải quận/huyện của địa chỉ
+                return None
+            return start, entry
+        return None
+
+    def match(self, text):
+        """
+        Returns:
+            (tỉnh, loại tỉnh, quận/huyện, loại quận/huyện, vị trí ký tự bắt đầu phần hành chính)
+            hoặc None nếu không xác định được chắc chắn.
+        """
+        # chỉ tách max_tokens từ cuối
+        tail = text.rsplit(None, self.max_tokens)
+        if len(tail) > self.max_tokens:
+            tail = tail[1:]
+        words = tail
+        end = len(words)
+        for ignored in self._trailing:
+            if tuple(words[end - len(ignored):end]) == ignored:
+                end -= len(ignored)
+        if end == 0:
+            return None
+        last = words[end - 1]
+        if last not in self.last_tokens and canonical_tone(last) not in self.last_tokens:
+            return None
+
+        # tỉnh ở cuối + quận/huyện ngay trước
+        provinces = self.provinces.matches(words, end)
+        for start, entries in reversed(provinces):
+            for key, prefix in entries:
+                found = self._district_before(
+                    words, start, lambda entry: entry[1] == key and (prefix is None or entry[3] == prefix))
+                if found is not None:
+                    d_start, entry = found
+                    return key, entry[3], entry[2], entry[4], _offset(text, tail, d_start)
+
+        if provinces:
+            # có tên tỉnh ở cuối nhưng không có quận/huyện hợp lệ ngay trước
+            return None
+        # chỉ có quận/huyện ở cuối: chỉ nhận khi tên thuộc duy nhất một tỉnh
+        matches = self.districts.matches(words, end)
+        if matches:
+            start, entries = matches[-1]
+            if len({entry[1] for entry in entries}) == 1:
+                found = self._district_before(words, end, lambda entry: True)
+                if found is not None and found[0] == start:
+                    entry = found[1]
+                    return entry[1], entry[3], entry[2], entry[4], _offset(text, tail, start)
+        return None
+
+
+def _offset(text, tail, start):
+    # vị trí ký tự của tail[start] trong text (tail là các từ cuối của text)
+    pos = len(text)
+    for word in reversed(tail[start:]):
+        pos = text.rfind(word, 0, pos)
+    return pos
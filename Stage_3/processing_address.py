@@ -1,41 +1,64 @@
-import pandas as pd
-from tranform_module import combine_address_strings, generate_tsv_column, map_row_to_output_format, AdminUnitIDMapper
+from tranform_module import transform_extracted_frame, AdminUnitIDMapper, ADDRESS_PART_COLUMNS, seed_lexeme_table
+import argparse
 import os
-import json
+import sys
+
+# Đọc/ghi theo chunk dùng chung với Stage 2
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Stage_2"))
+from stream_io import detect_format, iter_input_chunks, ChunkWriter
 
 # Bước 1: Cấu hình đường dẫn
 INPUT_EXCEL_FILE = "extracted_addresses_output.xlsx"
 OUTPUT_CSV_FILE = "converted_output.csv"
 JSON_ADMIN_FILE = "Stage_1/full_json_generated_data_vn_units.json"  # Đường dẫn tới file JSON chứa dữ liệu hành chính
+GENERATED_JSON_DIR = "Stage_1/generated_json"  # Từ điển Stage 1, dùng để nạp trước bảng lexeme cho TSV
+
 
-# Bước 2: Tạo danh sách địa chỉ từ file Excel
-combined_addresses = combine_address_strings(INPUT_EXCEL_FILE)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chuyển đổi địa chỉ đã trích xuất sang định dạng CSDL (Stage 3)")
+    parser.add_argument("--input", default=INPUT_EXCEL_FILE,
+                        help="File kết quả Stage 2 (.xlsx, .csv, .jsonl, .parquet)")
+    parser.add_argument("--output", default=OUTPUT_CSV_FILE,
+                        help="File output (.csv, .jsonl, .parquet)")
+    parser.add_argument("--admin-json", default=JSON_ADMIN_FILE,
+                        help="File JSON chứa dữ liệu hành chính")
+    parser.add_argument("--dict-dir", default=GENERATED_JSON_DIR,
+                        help="Thư mục từ điển Stage 1 (nạp trước bảng lexeme, bỏ qua nếu không có)")
+    parser.add_argument("--chunk-rows", type=int, default=50000,
+                        help="Số dòng xử lý mỗi lần")
+    return parser.parse_args()
 
-# Bước 3: Đọc lại file Excel để trích xuất các cột hành chính
-df = pd.read_excel(INPUT_EXCEL_FILE)
 
-# Thêm cột "Address" từ danh sách đã kết hợp
-df["Address"] = combined_addresses
+def main():
+    args = parse_args()
 
-# Bước 4: Tạo cột TSV bằng hàm generate_tsv_column
-df["tsv"] = df["Address"].apply(lambda addr: generate_tsv_column(addr.lower()))
+    if not os.path.exists(args.input):
+        print(f"Lỗi: File '{args.input}' không tìm thấy.")
+        return
+    try:
+        detect_format(args.input)
+        detect_format(args.output)
+    except ValueError as e:
+        print(f"Lỗi: {e}")
+        return
 
-# Bước 5: Khởi tạo admin_mapper
-admin_mapper = AdminUnitIDMapper(JSON_ADMIN_FILE)
+    # Bước 2: Khởi tạo admin_mapper
+    admin_mapper = AdminUnitIDMapper(args.admin_json)
+    seed_lexeme_table(args.dict_dir)
 
-# Bước 6: Sinh output với format yêu cầu (giống file D_data_address.csv)
-output_rows = []
-for idx, row in df.iterrows():
-    mapped_row = map_row_to_output_format(row.to_dict(), admin_mapper, current_id=idx + 1)
-    mapped_row["tsv"] = row["tsv"]
-    output_rows.append(mapped_row)
+    # Bước 3: Đọc file input một lần theo chunk; mỗi chunk được ghép địa chỉ,
+    # sinh TSV, ánh xạ ID theo cột rồi ghi nối tiếp ra file output
+    with ChunkWriter(args.output) as writer:
+        for i, chunk in enumerate(iter_input_chunks(args.input, chunk_rows=args.chunk_rows)):
+            if i == 0:
+                for col in ADDRESS_PART_COLUMNS:
+                    if col not in chunk.columns:
+                        print(f"Cảnh báo: Cột '{col}' không tìm thấy trong file input. Sẽ được bỏ qua trong việc tạo chuỗi địa chỉ.")
+            # id = số thứ tự dòng trong file (bắt đầu từ 1)
+            writer.write(transform_extracted_frame(chunk, admin_mapper, start_id=writer.rows + 1))
 
-# Bước 7: Ghi kết quả ra file CSV
-output_df = pd.DataFrame(output_rows)
+    print(f" Đã tạo file CSV: {args.output}")
 
-# Sắp xếp lại các cột giống D_data_address.csv (bỏ timestamp)
-columns_order = ['id', 'street_id', 'ward_id', 'district_id', 'city_id', 'country_id', 'full_address', 'tsv']
-output_df = output_df[columns_order]
-output_df.to_csv(OUTPUT_CSV_FILE, index=False)
 
-print(f" Đã tạo file CSV: {OUTPUT_CSV_FILE}")
+if __name__ == "__main__":
+    main()
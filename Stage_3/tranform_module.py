@@ -1,19 +1,39 @@
 import pandas as pd
+import numpy as np
 import json
 from unidecode import unidecode
 import os
+import sys
+
+# bộ đọc file JSON gốc dùng chung với Stage 1, đặt ở thư mục gốc của repo (master_reader.py)
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from master_reader import iter_master_records
+
 
 class AdminUnitIDMapper:
     """
     Lớp để tải và ánh xạ tên đơn vị hành chính sang ID từ file JSON.
     ID được lấy từ trường 'Code' trong JSON.
     """
-    def __init__(self, json_filepath):
+    def __init__(self, json_filepath, records=None):
+        """
+        Args:
+            records: dòng MasterRecord có sẵn (vd dùng chung một lần đọc file JSON gốc
+                     với Stage 1); None -> đọc dần từ json_filepath.
+        """
         self.json_filepath = json_filepath
         self.provinces_df = pd.DataFrame()
         self.districts_df = pd.DataFrame()
         self.wards_df = pd.DataFrame()
-        self._load_and_flatten_data()
+        # chỉ mục băm: normalized_name / (normalized_name, province_id) / (normalized_name, district_id) -> id
+        self._province_index = {}
+        self._district_index = {}
+        self._ward_index = {}
+        self._normalized_cache = {}
+        self._load_and_flatten_data(records)
+        self._build_indexes()
 
     def _normalize_name(self, name_str):
         if not name_str or not isinstance(name_str, str):
@@ -26,86 +46,167 @@ class AdminUnitIDMapper:
                 normalized = normalized[len(p):]
         return normalized.strip().replace('-', ' ')
 
-    def _load_and_flatten_data(self):
+    @staticmethod
+    def _code_to_id(code):
+        return int(code) if code and code.isdigit() else None
+
+    def _load_and_flatten_data(self, records=None):
+        # bảng tỉnh/quận/phường từ dòng MasterRecord phẳng, không nạp cả cây JSON vào bộ nhớ
+        provinces_list = []
+        districts_list = []
+        wards_list = []
         try:
-            with open(self.json_filepath, 'r', encoding='utf-8') as f:
-                raw_data_list = json.load(f)
+            for record in (records if records is not None else iter_master_records(self.json_filepath)):
+                row = {
+                    'id': self._code_to_id(record.code),
+                    'name': record.name,
+                    'normalized_name': self._normalize_name(record.name),
+                }
+                if record.level == 'province':
+                    provinces_list.append(row)
+                elif record.level == 'district':
+                    row['province_id'] = self._code_to_id(record.parent_code)
+                    districts_list.append(row)
+                else:
+                    # Ưu tiên Ward.DistrictCode, không có thì là mã quận/huyện chứa phường
+                    row['district_id'] = self._code_to_id(record.parent_code)
+                    wards_list.append(row)
         except FileNotFoundError:
             print(f"Lỗi: Không tìm thấy file JSON: {self.json_filepath}")
             return
-        except json.JSONDecodeError:
+        except ValueError:
             print(f"Lỗi: File JSON không hợp lệ: {self.json_filepath}")
             return
 
-        provinces_list = []
-        districts_list = []
-        wards_list = []
+        self.provinces_df = self._units_frame(provinces_list, ['id', 'name', 'normalized_name'])
+        self.districts_df = self._units_frame(districts_list, ['id', 'name', 'normalized_name', 'province_id'])
+        self.wards_df = self._units_frame(wards_list, ['id', 'name', 'normalized_name', 'district_id'])
+
+    @staticmethod
+    def _units_frame(rows, columns):
+        return pd.DataFrame(rows, columns=columns).drop_duplicates(subset=['id']).dropna(subset=['id'])
+
+    @staticmethod
+    def _first_index(keys, ids):
+        # giữ id của dòng đầu tiên cho mỗi khoá, giống match['id'].iloc[0]
+        index = {}
+        for key, id_ in zip(keys, ids):
+            if key not in index:
+                index[key] = id_
+        return index
 
-        for province_data in raw_data_list:
-            if province_data.get("Type") == "province":
-                prov_code = province_data.get("Code")
-                prov_name = province_data.get("Name")
-                provinces_list.append({
-                    'id': int(prov_code) if prov_code and prov_code.isdigit() else None,
-                    'name': prov_name,
-                    'normalized_name': self._normalize_name(prov_name)
-                })
-
-                if "District" in province_data and isinstance(province_data["District"], list):
-                    for district_data in province_data["District"]:
-                        dist_code = district_data.get("Code")
-                        dist_name = district_data.get("Name")
-                        dist_prov_code = district_data.get("ProvinceCode")
-                        districts_list.append({
-                            'id': int(dist_code) if dist_code and dist_code.isdigit() else None,
-                            'name': dist_name,
-                            'normalized_name': self._normalize_name(dist_name),
-                            'province_id': int(dist_prov_code) if dist_prov_code and dist_prov_code.isdigit() else None,
-                        })
-
-                        if "Ward" in district_data and isinstance(district_data["Ward"], list):
-                            for ward_data in district_data["Ward"]:
-                                ward_code = ward_data.get("Code")
-                                ward_name = ward_data.get("Name")
-                                ward_dist_code = district_data.get("DistrictCode", dist_code) # Ưu tiên Ward.DistrictCode
-                                
-                                wards_list.append({
-                                    'id': int(ward_code) if ward_code and ward_code.isdigit() else None,
-                                    'name': ward_name,
-                                    'normalized_name': self._normalize_name(ward_name),
-                                    'district_id': int(ward_dist_code) if ward_dist_code and ward_dist_code.isdigit() else None,
-                                })
-        
-        self.provinces_df = pd.DataFrame(provinces_list).drop_duplicates(subset=['id']).dropna(subset=['id'])
-        self.districts_df = pd.DataFrame(districts_list).drop_duplicates(subset=['id']).dropna(subset=['id'])
-        self.wards_df = pd.DataFrame(wards_list).drop_duplicates(subset=['id']).dropna(subset=['id'])
+    def _build_indexes(self):
+        if not self.provinces_df.empty:
+            self._province_index = self._first_index(
+                self.provinces_df['normalized_name'].tolist(), self.provinces_df['id'].tolist())
+        if not self.districts_df.empty:
+            self._district_index = self._first_index(
+                zip(self.districts_df['normalized_name'].tolist(), self.districts_df['province_id'].tolist()),
+                self.districts_df['id'].tolist())
+        if not self.wards_df.empty:
+            self._ward_index = self._first_index(
+                zip(self.wards_df['normalized_name'].tolist(), self.wards_df['district_id'].tolist()),
+                self.wards_df['id'].tolist())
+
+    def _normalize_cached(self, name_str):
+        normalized = self._normalized_cache.get(name_str)
+        if normalized is None:
+            normalized = self._normalize_name(name_str)
+            self._normalized_cache[name_str] = normalized
+        return normalized
 
     def get_city_id(self, province_name_excel):
         if self.provinces_df.empty or pd.isna(province_name_excel) or province_name_excel == "":
             return None
-        norm_name = self._normalize_name(province_name_excel)
-        match = self.provinces_df[self.provinces_df['normalized_name'] == norm_name]
-        return match['id'].iloc[0] if not match.empty else None
+        norm_name = self._normalize_cached(province_name_excel)
+        return self._province_index.get(norm_name)
 
     def get_district_id(self, district_name_excel, city_id_from_json):
         if self.districts_df.empty or pd.isna(district_name_excel) or district_name_excel == "" or city_id_from_json is None:
             return None
-        norm_name = self._normalize_name(district_name_excel)
-        match = self.districts_df[
-            (self.districts_df['normalized_name'] == norm_name) &
-            (self.districts_df['province_id'] == city_id_from_json)
-        ]
-        return match['id'].iloc[0] if not match.empty else None
+        norm_name = self._normalize_cached(district_name_excel)
+        return self._district_index.get((norm_name, city_id_from_json))
 
     def get_ward_id(self, ward_name_excel, district_id_from_json):
         if self.wards_df.empty or pd.isna(ward_name_excel) or ward_name_excel == "" or district_id_from_json is None:
             return None
-        norm_name = self._normalize_name(ward_name_excel)
-        match = self.wards_df[
-            (self.wards_df['normalized_name'] == norm_name) &
-            (self.wards_df['district_id'] == district_id_from_json)
-        ]
-        return match['id'].iloc[0] if not match.empty else None
+        norm_name = self._normalize_cached(ward_name_excel)
+        return self._ward_index.get((norm_name, district_id_from_json))
+
+    def _normalize_column(self, values):
+        # chuẩn hoá cả cột, tên rỗng/NaN -> None để không khớp với dòng nào
+        return [self._normalize_cached(v) if isinstance(v, str) and v != "" else None for v in values]
+
+    def map_ids(self, df, tinh_col='tinh', qh_col='qh', px_col='px'):
+        """
+        Ánh xạ cả cột tên tỉnh/huyện/xã sang ID bằng merge, thay cho việc gọi
+        get_city_id / get_district_id / get_ward_id cho từng dòng.
+
+        Args:
+            df (pd.DataFrame): DataFrame chứa các cột tên (mặc định 'tinh', 'qh', 'px').
+
+        Returns:
+            pd.DataFrame: cùng index với df, gồm các cột 'city_id', 'district_id', 'ward_id'
+                          (NaN nếu không tìm thấy).
+        """
+        keys = pd.DataFrame({
+            'p_name': self._normalize_column(df[tinh_col]) if tinh_col in df.columns else None,
+            'd_name': self._normalize_column(df[qh_col]) if qh_col in df.columns else None,
+            'w_name': self._normalize_column(df[px_col]) if px_col in df.columns else None,
+        }, index=range(len(df)))
+
+        provinces = self._lookup_frame(self.provinces_df, ['normalized_name'], 'city_id', ['p_name'])
+        districts = self._lookup_frame(self.districts_df, ['normalized_name', 'province_id'], 'district_id',
+                                       ['d_name', 'city_id'])
+        wards = self._lookup_frame(self.wards_df, ['normalized_name', 'district_id'], 'ward_id',
+                                   ['w_name', 'district_id'])
+
+        # merge how='left' giữ nguyên thứ tự các dòng bên trái
+        keys = keys.merge(provinces, on=['p_name'], how='left')
+        keys = keys.merge(districts, on=['d_name', 'city_id'], how='left')
+        keys = keys.merge(wards, on=['w_name', 'district_id'], how='left')
+
+        result = keys[['city_id', 'district_id', 'ward_id']]
+        result.index = df.index
+        return result
+
+    @staticmethod
+    def _lookup_frame(units_df, key_cols, id_name, new_key_cols):
+        # bảng tra (khoá -> id), bỏ khoá trùng (giữ dòng đầu) và khoá NaN
+        if units_df.empty:
+            return pd.DataFrame(columns=new_key_cols + [id_name])
+        lookup = units_df[key_cols + ['id']].dropna().drop_duplicates(subset=key_cols, keep='first')
+        return lookup.rename(columns=dict(zip(key_cols + ['id'], new_key_cols + [id_name])))
+
+
+# Các cột dùng để ghép địa chỉ, theo đúng thứ tự
+ADDRESS_PART_COLUMNS = ["duong", "px_cat", "px", "qh_cat", "qh", "tinh_cat", "tinh"]
+# Mã tỉnh/quận/phường do Stage 2 trả về cùng kết quả trích xuất (nếu có)
+STAGE2_ID_COLUMNS = ['city_id', 'district_id', 'ward_id']
+# Thứ tự cột của file output (giống D_data_address.csv, bỏ timestamp)
+OUTPUT_COLUMNS = ['id', 'street_id', 'ward_id', 'district_id', 'city_id', 'country_id', 'full_address', 'tsv']
+
+
+def combine_address_columns(df, cols_for_concat=ADDRESS_PART_COLUMNS):
+    """
+    Ghép các cột thành phần thành địa chỉ đầy đủ bằng phép nối chuỗi theo cột
+    (không lặp từng dòng). Giá trị NaN/rỗng bị bỏ qua, các phần cách nhau một
+    khoảng trắng. Cột không có trong df được bỏ qua.
+
+    Returns:
+        pd.Series: chuỗi địa chỉ đã ghép (chuỗi rỗng nếu mọi phần đều rỗng/NaN).
+    """
+    combined = pd.Series("", index=df.index, dtype=object)
+    for col_name in cols_for_concat:
+        if col_name not in df.columns:
+            continue
+        col = df[col_name]
+        part = pd.Series("", index=df.index, dtype=object)
+        notna = col.notna()
+        part[notna] = col[notna].astype(str).str.strip()
+        sep = np.where((combined != "") & (part != ""), " ", "")
+        combined = combined + sep + part
+    return combined
 
 
 def combine_address_strings(excel_filepath):
@@ -129,29 +230,38 @@ def combine_address_strings(excel_filepath):
         print(f"Lỗi khi đọc file Excel '{excel_filepath}': {e}")
         return []
 
-    combined_addresses = []
-    
-    # Định nghĩa các cột cần thiết
     # Đảm bảo các tên cột này khớp với file Excel của bạn
-    cols_for_concat = ["duong", "px_cat", "px", "qh_cat", "qh", "tinh_cat", "tinh"]
-    
-    for col in cols_for_concat:
+    for col in ADDRESS_PART_COLUMNS:
         if col not in df.columns:
             print(f"Cảnh báo: Cột '{col}' không tìm thấy trong file Excel. Sẽ được bỏ qua trong việc tạo chuỗi địa chỉ.")
 
-    for _, row in df.iterrows():
-        parts = []
-        for col_name in cols_for_concat:
-            if col_name in row and pd.notna(row[col_name]):
-                parts.append(str(row[col_name]).strip())
-        
-        # Chỉ thêm vào nếu có ít nhất một phần tử khác rỗng
-        if any(part for part in parts):
-            combined_addresses.append(" ".join(filter(None, parts)))
-        else:
-            combined_addresses.append("") # Thêm chuỗi rỗng nếu tất cả các phần đều rỗng/NaN
-            
-    return combined_addresses
+    return combine_address_columns(df).tolist()
+
+
+def transform_extracted_frame(df, admin_mapper_instance, start_id=1, country_id=1):
+    """
+    Chuyển một DataFrame kết quả Stage 2 (toàn bộ file hoặc một chunk) sang
+    định dạng output: ghép địa chỉ, sinh TSV và ánh xạ ID theo cột.
+
+    Args:
+        df (pd.DataFrame): có các cột ADDRESS_PART_COLUMNS và (tuỳ chọn) STAGE2_ID_COLUMNS.
+        admin_mapper_instance: AdminUnitIDMapper, None -> chỉ dùng ID do Stage 2 trả về.
+        start_id (int): id của dòng đầu tiên trong df.
+
+    Returns:
+        pd.DataFrame: các cột theo OUTPUT_COLUMNS.
+    """
+    addresses = combine_address_columns(df)
+    frame = pd.DataFrame({
+        'tinh': df['tinh'] if 'tinh' in df.columns else None,
+        'qh': df['qh'] if 'qh' in df.columns else None,
+        'px': df['px'] if 'px' in df.columns else None,
+        **{col: df[col] for col in STAGE2_ID_COLUMNS if col in df.columns},
+        'Address': addresses,
+        'tsv': generate_tsv_batch(addresses.str.lower()),
+    }, index=df.index)
+    output = map_frame_to_output_format(frame, admin_mapper_instance, start_id=start_id, country_id=country_id)
+    return output[OUTPUT_COLUMNS]
 
 
 def map_row_to_output_format(input_row_data, admin_mapper_instance, current_id, country_id=1):
@@ -178,40 +288,166 @@ def map_row_to_output_format(input_row_data, admin_mapper_instance, current_id,
     }
 
 
-def generate_tsv_column(normalized_address_string):
+def _resolve_ids(df, admin_mapper_instance):
+    # luôn dùng float64 để định dạng ID giống nhau giữa các chunk
+    if not all(col in df.columns for col in STAGE2_ID_COLUMNS):
+        if admin_mapper_instance is None:
+            return pd.DataFrame(np.nan, index=df.index, columns=STAGE2_ID_COLUMNS)
+        return admin_mapper_instance.map_ids(df).astype('float64')
+
+    ids = df[STAGE2_ID_COLUMNS].apply(pd.to_numeric, errors='coerce').astype('float64')
+    # dòng đủ ID: mọi cấp có tên đều đã có mã từ Stage 2
+    complete = pd.Series(True, index=df.index)
+    for name_col, id_col in zip(('tinh', 'qh', 'px'), STAGE2_ID_COLUMNS):
+        if name_col in df.columns:
+            named = df[name_col].notna() & (df[name_col] != "")
+            complete &= ~named | ids[id_col].notna()
+    if admin_mapper_instance is not None and not complete.all():
+        missing = ~complete.to_numpy()
+        ids.loc[missing] = admin_mapper_instance.map_ids(df[missing]).astype('float64').to_numpy()
+    return ids
+
+
+def map_frame_to_output_format(df, admin_mapper_instance, start_id=1, country_id=1):
     """
-    Tạo chuỗi TSV từ một chuỗi địa chỉ đã được chuẩn hóa.
+    Phiên bản theo cột của map_row_to_output_format: ánh xạ ID cho toàn bộ
+    DataFrame một lần. ID do Stage 2 trả về (STAGE2_ID_COLUMNS) được dùng trực tiếp;
+    chỉ các dòng thiếu ID mới được tra lại bằng AdminUnitIDMapper.map_ids.
 
     Args:
-        normalized_address_string (str): Chuỗi địa chỉ đã được chuẩn hóa               (chữ thường, bỏ dấu phẩy/chấm, khoảng trắng đơn,
-                                          đã qua add_norm).
+        df (pd.DataFrame): có các cột 'tinh', 'qh', 'px', 'Address', (tuỳ chọn) 'tsv'
+                           và STAGE2_ID_COLUMNS.
+        start_id (int): id của dòng đầu tiên, các dòng tiếp theo tăng dần.
+
     Returns:
-        str: Chuỗi TSV.
+        pd.DataFrame: các cột id, street_id, ward_id, district_id, city_id, country_id,
+                      full_address (và tsv nếu có).
     """
-    if not normalized_address_string or not isinstance(normalized_address_string, str):
-        return ""
+    ids = _resolve_ids(df, admin_mapper_instance)
+    output = pd.DataFrame({
+        'id': range(start_id, start_id + len(df)),
+        'street_id': None,  # khong có thông tin về đường trong csdl
+        'ward_id': ids['ward_id'].to_numpy(),
+        'district_id': ids['district_id'].to_numpy(),
+        'city_id': ids['city_id'].to_numpy(),
+        'country_id': country_id,
+        'full_address': df['Address'].fillna("").to_numpy() if 'Address' in df.columns else "",
+    })
+    if 'tsv' in df.columns:
+        output['tsv'] = df['tsv'].to_numpy()
+    return output
+
+
+# từ -> lexeme đã bỏ dấu ("" nếu từ bị bỏ qua trong TSV). Các địa chỉ chỉ dùng vài
+# nghìn âm tiết nên mỗi từ chỉ cần unidecode một lần; giới hạn kích thước để các
+# từ hiếm (số nhà, mã căn hộ...) không làm bảng phình mãi.
+MAX_LEXEME_TABLE_SIZE = 200000
+_LEXEME_TABLE = {}
 
-    words = normalized_address_string.split()
-    lexemes_positions = {}
 
-    for i, word in enumerate(words):
+def _lexeme(word):
+    lexeme = _LEXEME_TABLE.get(word)
+    if lexeme is None:
         # Loại bỏ dấu tiếng Việt và đảm bảo chữ thường
         lexeme = unidecode(word).lower()
-        
         # Bỏ qua các từ rỗng hoặc quá ngắn (có thể tùy chỉnh)
         # Ví dụ: bỏ qua từ 1 chữ cái (trừ khi nó là số)
-        if not lexeme or (len(lexeme) < 2 and not lexeme.isdigit()):
-            continue
+        if len(lexeme) < 2 and not lexeme.isdigit():
+            lexeme = ""
+        if len(_LEXEME_TABLE) < MAX_LEXEME_TABLE_SIZE:
+            _LEXEME_TABLE[word] = lexeme
+    return lexeme
+
 
-        if lexeme not in lexemes_positions:
-            lexemes_positions[lexeme] = []
+def seed_lexeme_table(dir_path):
+    """
+    Nạp trước bảng lexeme với mọi từ trong tên (khoá và giá trị) của các file JSON
+    từ điển do Stage 1 sinh ra (dạng chữ thường).
+
+    Returns:
+        int: số từ trong bảng sau khi nạp (0 nếu thư mục không tồn tại).
+    """
+    if not os.path.isdir(dir_path):
+        return 0
+    names = set()
+
+    def collect(value):
+        if isinstance(value, str):
+            names.add(value)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                collect(key)
+                collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+
+    for root, _, files in os.walk(dir_path):
+        for file_name in sorted(files):
+            # manifest.json của Stage 1 chỉ chứa hash, không có tên
+            if file_name.endswith('.json') and file_name != 'manifest.json':
+                with open(os.path.join(root, file_name), 'r', encoding='utf-8') as f:
+                    collect(json.load(f))
+    for name in names:
+        for word in name.split():
+            _lexeme(word.lower())
+    return len(_LEXEME_TABLE)
+
+
+def _tsv(words):
+    lexemes_positions = {}
+    for i, word in enumerate(words, 1):
+        lexeme = _LEXEME_TABLE.get(word)
+        if lexeme is None:
+            lexeme = _lexeme(word)
+        if not lexeme:
+            continue
         # Vị trí trong TSV thường bắt đầu từ 1
-        lexemes_positions[lexeme].append(str(i + 1) + 'A') 
+        positions = lexemes_positions.get(lexeme)
+        if positions is None:
+            lexemes_positions[lexeme] = [i]
+        else:
+            positions.append(i)
 
-    tsv_parts = []
     # Sắp xếp các lexeme theo thứ tự bảng chữ cái để đảm bảo tính nhất quán của output
-    for lexeme, positions in sorted(lexemes_positions.items()):
-        tsv_parts.append(f"'{lexeme}':{','.join(positions)}")
-    
-    return ' '.join(tsv_parts)
+    return ' '.join("'%s':%s" % (lexeme, ','.join(['%dA' % p for p in positions]))
+                    for lexeme, positions in sorted(lexemes_positions.items()))
+
 
+def generate_tsv_column(normalized_address_string):
+    """
+    Tạo chuỗi TSV từ một chuỗi địa chỉ đã được chuẩn hóa.
+
+    Args:
+        normalized_address_string (str): Chuỗi địa chỉ đã được chuẩn hóa (chữ thường, bỏ dấu phẩy/chấm,
+                                          khoảng trắng đơn, đã qua add_norm).
+    Returns:
+        str: Chuỗi TSV dạng "'lexeme':1A,3A 'lexeme2':2A".
+    """
+    if not normalized_address_string or not isinstance(normalized_address_string, str):
+        return ""
+    return _tsv(normalized_address_string.split())
+
+
+def generate_tsv_batch(normalized_addresses):
+    """
+    Phiên bản theo cột của generate_tsv_column: mỗi địa chỉ khác nhau trong cột chỉ
+    được xử lý một lần, kết quả giống hệt generate_tsv_column từng dòng.
+
+    Args:
+        normalized_addresses: iterable (list, pd.Series) các chuỗi địa chỉ đã chuẩn hóa.
+
+    Returns:
+        list: chuỗi TSV theo đúng thứ tự đầu vào.
+    """
+    done = {}
+    result = []
+    for address in normalized_addresses:
+        if not address or not isinstance(address, str):
+            result.append("")
+            continue
+        tsv = done.get(address)
+        if tsv is None:
+            tsv = done[address] = _tsv(address.split())
+        result.append(tsv)
+    return result
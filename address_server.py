@@ -0,0 +1,424 @@
+"""
+HTTP service phân tích địa chỉ (chỉ dùng thư viện chuẩn): nạp từ điển một lần,
+gom các request đồng thời thành lô (micro-batch) rồi xử lý bằng pool tiến trình.
+
+Endpoint:
+    GET  /parse?address=...           một địa chỉ (Stage 2)
+    POST /parse                       {"address": "..."}
+    POST /parse_batch                 mảng JSON (chuỗi hoặc {"address": ...}) hoặc NDJSON,
+                                      trả về kết quả Stage 2 + ID hành chính và TSV (Stage 3)
+    GET  /health
+    GET  /metrics                     định dạng text của Prometheus
+
+Ví dụ:
+    python address_server.py --port 8080 --workers 4
+    curl -s localhost:8080/parse_batch -d '["p.12, q.3, tp hcm"]'
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_2"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_3"))
+
+from address_module import (load_address_dict, parse_addresses, parse_addresses_parallel, make_worker_pool,
+                            enable_result_cache, enable_stage_stats, RESULT_COLUMNS)
+from tranform_module import AdminUnitIDMapper, transform_extracted_frame, seed_lexeme_table
+
+# --- CONFIGURATION ---
+PROJECT_PATH = ROOT_DIR
+GENERATED_JSON_DIR_NAME = "Stage_1/generated_json"
+JSON_ADMIN_FILE = os.path.join(ROOT_DIR, "Stage_1", "full_json_generated_data_vn_units.json")
+# --- END CONFIGURATION ---
+
+STAGE3_COLUMNS = ['city_id', 'district_id', 'ward_id', 'full_address', 'tsv']
+
+
+class MicroBatcher(object):
+    """
+    Gom các địa chỉ được gửi từ nhiều thread thành lô (tối đa max_batch địa chỉ,
+    chờ tối đa max_wait_ms kể từ địa chỉ đầu tiên) và xử lý từng lô bằng parse_batch.
+    Hàng đợi có giới hạn: khi đầy, thread gửi bị chặn lại (backpressure).
+
+    Args:
+        parse_batch: hàm nhận list địa chỉ, trả về dict {tên cột: list} như parse_addresses(as_frame=False).
+    """
+    def __init__(self, parse_batch, max_batch=256, max_wait_ms=5, max_queue=10000):
+        self.parse_batch = parse_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        # đặt bởi close(): thread xử lý dừng sau lô hiện tại, không dùng put() có thể bị chặn khi hàng đợi đầy
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit_many(self, addresses):
+        futures = []
+        for address in addresses:
+            future = Future()
+            self._put((address, future))
+            futures.append(future)
+        if self._closed.is_set() and not self._thread.is_alive():
+            # close() chạy xong trong lúc đang gửi: không còn ai xử lý các địa chỉ vừa đưa vào
+            self._fail_pending()
+        return futures
+
+    def _put(self, item):
+        # chờ khi hàng đợi đầy (backpressure) nhưng không chờ mãi sau khi đã đóng
+        while True:
+            if self._closed.is_set():
+                raise RuntimeError("MicroBatcher đã đóng")
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def submit(self, address):
+        return self.submit_many([address])[0]
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """
+        Dừng thread xử lý sau lô đang chạy; các địa chỉ còn trong hàng đợi nhận RuntimeError.
+        Không bị chặn khi hàng đợi đầy: None chỉ được đưa vào (để đánh thức thread đang chờ)
+        khi còn chỗ, ngược lại thread đang bận và sẽ thấy cờ _closed sau lô hiện tại.
+        """
+        self._closed.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join()
+        self._fail_pending()
+
+    def _fail_pending(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError("MicroBatcher đã đóng"))
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._closed.is_set():
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                columns = self.parse_batch([address for address, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for i, (_, future) in enumerate(batch):
+                future.set_result({col: values[i] for col, values in columns.items()})
+
+
+class ServerMetrics(object):
+    # bộ đếm request theo endpoint/mã trạng thái và thời gian xử lý
+    def __init__(self):
+        self.requests = {}
+        self.seconds = {}
+        self.addresses = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, seconds, addresses=0):
+        with self._lock:
+            self.requests[(endpoint, status)] = self.requests.get((endpoint, status), 0) + 1
+            self.seconds[endpoint] = self.seconds.get(endpoint, 0.0) + seconds
+            self.addresses += addresses
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.requests), dict(self.seconds), self.addresses
+
+
+class AddressService(object):
+    """
+    Phần xử lý của server, tách khỏi HTTP để có thể dùng trực tiếp.
+
+    Args:
+        workers (int): > 1 -> phân tích bằng pool tiến trình, mỗi lô được chia đều cho các tiến trình.
+        admin_json (str): file JSON dữ liệu hành chính cho Stage 3, dùng để tra ID các dòng Stage 2 chưa có mã;
+                          không có thì chỉ dùng ID do Stage 2 trả về.
+        cache_size (int): > 0 bật cache LRU kết quả.
+        stage_stats (bool): bật thống kê theo bước (chỉ khi chạy tuần tự, workers <= 1).
+    """
+    def __init__(self, project_path=PROJECT_PATH, dir_name=GENERATED_JSON_DIR_NAME, workers=1,
+                 admin_json=JSON_ADMIN_FILE, max_batch=256, max_wait_ms=5, cache_size=0, stage_stats=False):
+        self.project_path = project_path
+        self.dir_name = dir_name
+        self.workers = workers
+        self.add_dicts = load_address_dict(project_path, dir_name)
+        seed_lexeme_table(os.path.join(project_path, dir_name))
+        self.pool = None
+        # với pool tiến trình, cache kết quả nằm trong từng tiến trình con:
+        # {pid: thống kê} được cập nhật sau mỗi chunk mà tiến trình đó xử lý
+        self.worker_cache_stats = {} if workers > 1 and cache_size > 0 else None
+        if workers > 1:
+            self.pool = make_worker_pool(project_path, dir_name, workers, cache_size)
+        else:
+            if cache_size > 0:
+                enable_result_cache(self.add_dicts, cache_size)
+            if stage_stats:
+                enable_stage_stats(self.add_dicts)
+        self.mapper = AdminUnitIDMapper(admin_json) if admin_json and os.path.exists(admin_json) else None
+        self.metrics = ServerMetrics()
+        self.started = time.time()
+        self.batcher = MicroBatcher(self._parse_batch, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    def _parse_batch(self, addresses):
+        if self.pool is None:
+            return parse_addresses(addresses, self.add_dicts, as_frame=False)
+        chunk_size = max(1, math.ceil(len(addresses) / self.workers))
+        return parse_addresses_parallel(addresses, self.project_path, self.dir_name, chunk_size=chunk_size,
+                                        as_frame=False, pool=self.pool, cache_stats=self.worker_cache_stats)
+
+    def parse(self, address):
+        return self.batcher.submit(address).result()
+
+    def parse_batch(self, addresses):
+        results = [future.result() for future in self.batcher.submit_many(addresses)]
+        df = pd.DataFrame(results, columns=RESULT_COLUMNS + ['Error_Processing'])
+        # ID do Stage 2 trả về; mapper (nếu có) chỉ tra lại các dòng thiếu ID
+        stage3 = transform_extracted_frame(df, self.mapper)
+        stage3 = stage3.astype(object).where(stage3.notna(), None)
+        for result, address, row in zip(results, addresses, stage3[STAGE3_COLUMNS].to_dict(orient='records')):
+            for col in ('city_id', 'district_id', 'ward_id'):
+                if row[col] is not None:
+                    row[col] = int(row[col])
+            result.update(row)
+            result['address'] = address
+        return results
+
+    def health(self):
+        return {'status': 'ok', 'workers': self.workers, 'admin_mapper': self.mapper is not None,
+                'uptime_s': round(time.time() - self.started, 1)}
+
+    def cache_stats(self):
+        """
+        Thống kê cache kết quả {raw/normalized: {hits, misses, evictions, size}}, None nếu không bật cache.
+        Với workers > 1 là tổng của các tiến trình con, tính đến chunk gần nhất mỗi tiến trình xử lý.
+        """
+        if self.worker_cache_stats is None:
+            cache = getattr(self.add_dicts, 'result_cache', None)
+            return cache.stats() if cache is not None else None
+        total = {}
+        for stats in list(self.worker_cache_stats.values()):
+            for name, counters in stats.items():
+                summed = total.setdefault(name, {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0})
+                for key in summed:
+                    summed[key] += counters[key]
+        return total
+
+    def metrics_text(self, prefix='address_server'):
+        requests, seconds, addresses = self.metrics.snapshot()
+        lines = [f"# TYPE {prefix}_requests_total counter"]
+        for (endpoint, status), count in sorted(requests.items()):
+            lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append(f"# TYPE {prefix}_request_seconds_total counter")
+        for endpoint, total in sorted(seconds.items()):
+            lines.append(f'{prefix}_request_seconds_total{{endpoint="{endpoint}"}} {total}')
+        lines += [
+            f"# TYPE {prefix}_addresses_total counter",
+            f"{prefix}_addresses_total {addresses}",
+            f"# TYPE {prefix}_batches_total counter",
+            f"{prefix}_batches_total {self.batcher.batches}",
+            f"# TYPE {prefix}_batched_addresses_total counter",
+            f"{prefix}_batched_addresses_total {self.batcher.items}",
+            f"# TYPE {prefix}_queue_depth gauge",
+            f"{prefix}_queue_depth {self.batcher.queue_depth()}",
+        ]
+        cache_stats = self.cache_stats()
+        if cache_stats is not None:
+            for metric in ('hits', 'misses', 'evictions'):
+                lines.append(f"# TYPE {prefix}_cache_{metric}_total counter")
+                for name, stats in sorted(cache_stats.items()):
+                    lines.append(f'{prefix}_cache_{metric}_total{{cache="{name}"}} {stats[metric]}')
+            lines.append(f"# TYPE {prefix}_cache_size gauge")
+            for name, stats in sorted(cache_stats.items()):
+                lines.append(f'{prefix}_cache_size{{cache="{name}"}} {stats["size"]}')
+        text = '\n'.join(lines) + '\n'
+        stage_stats = getattr(self.add_dicts, 'stage_stats', None)
+        if stage_stats is not None:
+            text += stage_stats.to_prometheus()
+        return text
+
+    def close(self):
+        self.batcher.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def read_batch_body(body, content_type):
+    # NDJSON (mỗi dòng một chuỗi JSON hoặc {"address": ...}) hoặc một mảng JSON
+    text = body.decode('utf-8')
+    ndjson = 'ndjson' in content_type or 'jsonl' in content_type or not text.lstrip().startswith('[')
+    items = [json.loads(line) for line in text.splitlines() if line.strip()] if ndjson else json.loads(text)
+    addresses = [item.get('address') if isinstance(item, dict) else item for item in items]
+    return addresses, ndjson
+
+
+class AddressRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AddressServer/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body, ensure_ascii=False)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.server.max_body_bytes:
+            raise ValueError(f"Request quá lớn ({length} byte, tối đa {self.server.max_body_bytes})")
+        return self.rfile.read(length)
+
+    def _handle(self, endpoint, func):
+        service = self.server.service
+        start = time.perf_counter()
+        status, count = 500, 0
+        try:
+            status, body, content_type, count = func(service)
+        except (ValueError, KeyError, TypeError) as e:
+            status, body, content_type = 400, {'error': str(e)}, 'application/json; charset=utf-8'
+        except Exception as e:
+            body, content_type = {'error': str(e)}, 'application/json; charset=utf-8'
+        self._send(status, body, content_type)
+        service.metrics.record(endpoint, status, time.perf_counter() - start, count)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._handle('health', lambda service: (200, service.health(), 'application/json; charset=utf-8', 0))
+        elif url.path == '/metrics':
+            self._handle('metrics', lambda service: (200, service.metrics_text(),
+                                                     'text/plain; version=0.0.4; charset=utf-8', 0))
+        elif url.path == '/parse':
+            address = parse_qs(url.query).get('address', [None])[0]
+            self._handle('parse', lambda service: self._parse(service, address))
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/parse':
+            self._handle('parse', lambda service: self._parse(service, json.loads(self._read_body())['address']))
+        elif url.path == '/parse_batch':
+            self._handle('parse_batch', self._parse_batch)
+        else:
+            self._send(404, {'error': 'not found'})
+
+    @staticmethod
+    def _parse(service, address):
+        if address is None:
+            raise ValueError("Thiếu tham số 'address'")
+        result = service.parse(address)
+        result['address'] = address
+        return 200, result, 'application/json; charset=utf-8', 1
+
+    def _parse_batch(self, service):
+        addresses, ndjson = read_batch_body(self._read_body(), self.headers.get('Content-Type', ''))
+        results = service.parse_batch(addresses)
+        if ndjson:
+            body = ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+            return 200, body, 'application/x-ndjson; charset=utf-8', len(results)
+        return 200, results, 'application/json; charset=utf-8', len(results)
+
+
+def make_server(service, host='127.0.0.1', port=8080, max_body_bytes=64 * 1024 * 1024, verbose=False):
+    server = ThreadingHTTPServer((host, port), AddressRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.max_body_bytes = max_body_bytes
+    server.verbose = verbose
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP service phân tích địa chỉ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số tiến trình phân tích (mặc định 1: xử lý trong tiến trình server)")
+    parser.add_argument("--admin-json", default=JSON_ADMIN_FILE,
+                        help="File JSON dữ liệu hành chính để ánh xạ ID (Stage 3)")
+    parser.add_argument("--max-batch", type=int, default=256,
+                        help="Số địa chỉ tối đa mỗi lô gom từ các request")
+    parser.add_argument("--max-wait-ms", type=float, default=5,
+                        help="Thời gian chờ tối đa để gom lô (ms)")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Bật cache LRU kết quả (số phần tử, 0: tắt)")
+    parser.add_argument("--stage-stats", action="store_true",
+                        help="Xuất thống kê theo bước ở /metrics (chỉ khi --workers 1)")
+    parser.add_argument("--verbose", action="store_true", help="In log từng request")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("Đang tải các từ điển địa chỉ...")
+    service = AddressService(workers=args.workers, admin_json=args.admin_json, max_batch=args.max_batch,
+                             max_wait_ms=args.max_wait_ms, cache_size=args.cache_size, stage_stats=args.stage_stats)
+    if service.mapper is None:
+        print(f"Cảnh báo: không tìm thấy '{args.admin_json}', /parse_batch chỉ có ID hành chính do Stage 2 trả về.")
+    server = make_server(service, args.host, args.port, verbose=args.verbose)
+    print(f"Đang lắng nghe tại http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
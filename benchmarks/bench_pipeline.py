@@ -0,0 +1,248 @@
+"""
+Benchmark từng bước của pipeline trên địa chỉ giả lập (synthetic_addresses.py):
+add_norm, add_proc_1/3, update_entity_address, AdminUnitIDMapper và
+generate_tsv_column được đo riêng (địa chỉ/giây, độ trễ p50/p99, peak RSS),
+kết quả ghi ra file JSON để so sánh giữa các lần thay đổi.
+
+add_proc_2 không còn được đo: mọi tỉnh/thành được xử lý trong add_proc_1 trên cây
+hành chính. Hai phần của add_proc_1 được đo riêng để so sánh với các lần chạy cũ:
+'add_proc_1.resolve_city_district' (thay cho phần tỉnh/quận của add_proc_1 + add_proc_2)
+và 'add_proc_1.resolve_ward_street'.
+
+Bước so khớp không dấu / sai một ký tự (fuzzy_matcher) chỉ chạy khi so khớp chính xác
+thất bại nên được đo riêng trên địa chỉ sai chính tả (mọi phần đều có lỗi gõ): các stage
+'... (misspelled)'. Các chỉ mục fuzzy được dựng khi cần lần đầu (p99 của add_proc_1 ở
+trên bao gồm cả việc dựng này); trước các stage misspelled chúng được dựng trước một lần
+(stage 'fuzzy_matcher.build_indexes (once)') để đo độ trễ ổn định của việc tra cứu.
+
+Ví dụ:
+    python benchmarks/bench_pipeline.py -n 5000 --output bench_results.json \
+        --admin-json Stage_1/full_json_generated_data_vn_units.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_2"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_3"))
+
+from address_module import (load_address_dict, add_norm, add_proc_1, add_proc_3, parse_addresses,
+                            resolve_city_district, resolve_ward_street, fuzzy_city_district, fuzzy_ward_street,
+                            update_entity_address, prepare_address, ADD_NAME_DICT_KEYS)
+from tranform_module import (AdminUnitIDMapper, combine_address_columns, generate_tsv_column, generate_tsv_batch,
+                             seed_lexeme_table)
+from synthetic_addresses import SyntheticAddressGenerator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- CONFIGURATION ---
+PROJECT_PATH = ROOT_DIR
+GENERATED_JSON_DIR_NAME = "Stage_1/generated_json"
+JSON_ADMIN_FILE = os.path.join(ROOT_DIR, "Stage_1", "full_json_generated_data_vn_units.json")
+# --- END CONFIGURATION ---
+
+
+def peak_rss_mb():
+    # peak RSS của tiến trình (ru_maxrss: KB trên Linux, byte trên macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(sorted_values, q):
+    # nearest-rank percentile trên danh sách đã sắp xếp
+    if not sorted_values:
+        return None
+    k = max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def summarize(latencies, total_seconds, rss_before):
+    latencies = sorted(latencies)
+    rss_after = peak_rss_mb()
+    return {
+        'count': len(latencies),
+        'total_s': round(total_seconds, 4),
+        'addresses_per_sec': round(len(latencies) / total_seconds, 1) if total_seconds else None,
+        'p50_us': round(percentile(latencies, 50) * 1e6, 1) if latencies else None,
+        'p99_us': round(percentile(latencies, 99) * 1e6, 1) if latencies else None,
+        'peak_rss_mb': rss_after,
+        'peak_rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+    }
+
+
+def time_calls(func, inputs, prepare=None, warmup=0):
+    """
+    Gọi func(x) cho từng phần tử của inputs, đo độ trễ từng lần gọi.
+    prepare(x) (vd sao chép dict) chạy ngoài vùng đo; warmup lần gọi đầu không được tính.
+    Trả về (kết quả, thống kê).
+    """
+    for x in inputs[:warmup]:
+        func(prepare(x) if prepare else x)
+    rss_before = peak_rss_mb()
+    perf_counter = time.perf_counter
+    results, latencies = [], []
+    total = 0.0
+    for x in inputs:
+        arg = prepare(x) if prepare else x
+        start = perf_counter()
+        result = func(arg)
+        elapsed = perf_counter() - start
+        total += elapsed
+        latencies.append(elapsed)
+        results.append(result)
+    return results, summarize(latencies, total, rss_before)
+
+
+def time_batch(func, n):
+    # đo một lần gọi xử lý cả lô -> chỉ có thông lượng, không có độ trễ từng địa chỉ
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    result = func()
+    total = time.perf_counter() - start
+    stats = summarize([], total, rss_before)
+    stats['count'] = n
+    stats['addresses_per_sec'] = round(n / total, 1) if total else None
+    return result, stats
+
+
+def run_fuzzy_benchmarks(addresses, add_dicts, initial, warmup=0):
+    """
+    Đo bước không dấu / sai một ký tự trên địa chỉ sai chính tả: add_proc_1 đầy đủ và
+    riêng fuzzy_city_district, fuzzy_ward_street trên kết quả của phần so khớp chính xác.
+    """
+    stages = {}
+    fuzzy = add_dicts.fuzzy_matcher
+    _, stages['fuzzy_matcher.build_indexes (once)'] = time_batch(fuzzy.build_indexes, 1)
+    normalized = [add_norm(initial(address), add_dicts.normalizer) for address in addresses]
+    _, stages['add_proc_1 (misspelled)'] = time_calls(
+        lambda data: add_proc_1(data, add_dicts), normalized, prepare=dict, warmup=warmup)
+    exact = [resolve_city_district(dict(data), add_dicts, use_fuzzy=False) for data in normalized]
+    city_district, stages['fuzzy_city_district (misspelled)'] = time_calls(
+        lambda data: fuzzy_city_district(data, fuzzy), exact, prepare=dict, warmup=warmup)
+    exact = [resolve_ward_street(data, add_dicts, use_fuzzy=False) for data in city_district]
+    _, stages['fuzzy_ward_street (misspelled)'] = time_calls(
+        lambda data: fuzzy_ward_street(data, fuzzy), exact, prepare=dict, warmup=warmup)
+    return stages
+
+
+def run_benchmarks(addresses, add_dicts, admin_json=None, warmup=0, misspelled=None):
+    stages = {}
+
+    def initial(address):
+        data = dict.fromkeys(ADD_NAME_DICT_KEYS)
+        data['Address_ch'] = prepare_address(address)
+        return data
+
+    # Stage 2: từng bước, đầu vào của mỗi bước là đầu ra của bước trước
+    normalized, stages['add_norm'] = time_calls(
+        lambda data: add_norm(data, add_dicts.normalizer), addresses, prepare=initial, warmup=warmup)
+    proc_1, stages['add_proc_1'] = time_calls(
+        lambda data: add_proc_1(data, add_dicts), normalized, prepare=dict, warmup=warmup)
+    city_district, stages['add_proc_1.resolve_city_district'] = time_calls(
+        lambda data: resolve_city_district(data, add_dicts), normalized, prepare=dict, warmup=warmup)
+    _, stages['add_proc_1.resolve_ward_street'] = time_calls(
+        lambda data: resolve_ward_street(data, add_dicts), city_district, prepare=dict, warmup=warmup)
+    _, stages['add_proc_3'] = time_calls(add_proc_3, proc_1, prepare=dict, warmup=warmup)
+
+    _, stages['update_entity_address'] = time_calls(
+        lambda entity: update_entity_address(entity, add_dicts), addresses,
+        prepare=lambda address: {'address': [address]}, warmup=warmup)
+    extracted, stages['parse_addresses (batch)'] = time_batch(
+        lambda: parse_addresses(addresses, add_dicts), len(addresses))
+
+    # Stage 3: ánh xạ ID và sinh TSV trên kết quả Stage 2
+    if admin_json and os.path.exists(admin_json):
+        mapper = AdminUnitIDMapper(admin_json)
+        rows = list(zip(extracted['tinh'], extracted['qh'], extracted['px']))
+
+        def map_row(row):
+            city_id = mapper.get_city_id(row[0])
+            district_id = mapper.get_district_id(row[1], city_id)
+            return city_id, district_id, mapper.get_ward_id(row[2], district_id)
+
+        _, stages['AdminUnitIDMapper'] = time_calls(map_row, rows, warmup=warmup)
+        _, stages['AdminUnitIDMapper.map_ids (batch)'] = time_batch(
+            lambda: mapper.map_ids(extracted), len(extracted))
+    else:
+        print(f"Bỏ qua AdminUnitIDMapper: không tìm thấy file '{admin_json}' (dùng --admin-json).")
+
+    combined = combine_address_columns(extracted).str.lower().tolist()
+    _, stages['generate_tsv_column'] = time_calls(generate_tsv_column, combined, warmup=warmup)
+    _, stages['generate_tsv_batch (batch)'] = time_batch(lambda: generate_tsv_batch(combined), len(combined))
+
+    # chạy sau cùng: dựng trước các chỉ mục fuzzy làm thay đổi độ trễ của các stage phía trên
+    if misspelled and getattr(add_dicts, 'fuzzy_matcher', None) is not None:
+        stages.update(run_fuzzy_benchmarks(misspelled, add_dicts, initial, warmup))
+    return stages
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark các bước của pipeline trên địa chỉ giả lập")
+    parser.add_argument("-n", type=int, default=5000, help="Số địa chỉ giả lập")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--input", default=None,
+                        help="Dùng địa chỉ trong file CSV (cột 'Address') thay vì sinh ngẫu nhiên")
+    parser.add_argument("--admin-json", default=JSON_ADMIN_FILE,
+                        help="File JSON dữ liệu hành chính cho AdminUnitIDMapper")
+    parser.add_argument("--warmup", type=int, default=100, help="Số lần gọi khởi động (không tính)")
+    parser.add_argument("--misspelled", type=int, default=2000,
+                        help="Số địa chỉ sai chính tả cho các stage fuzzy (0 -> bỏ qua)")
+    parser.add_argument("--output", default="bench_results.json", help="File JSON kết quả")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    start = time.perf_counter()
+    add_dicts = load_address_dict(PROJECT_PATH, GENERATED_JSON_DIR_NAME)
+    seed_lexeme_table(os.path.join(PROJECT_PATH, GENERATED_JSON_DIR_NAME))
+    load_seconds = time.perf_counter() - start
+
+    if args.input:
+        import pandas as pd
+        addresses = pd.read_csv(args.input, encoding='utf-8')['Address'].astype(str).tolist()[:args.n]
+    else:
+        addresses = SyntheticAddressGenerator(add_dicts, seed=args.seed).generate(args.n)
+
+    misspelled = None
+    if args.misspelled and getattr(add_dicts, 'fuzzy_matcher', None) is not None:
+        # mọi phần của địa chỉ đều có lỗi gõ (xoá/đảo ký tự hoặc bỏ dấu)
+        misspelled = SyntheticAddressGenerator(add_dicts, seed=args.seed + 1, p_typo=1.0).generate(args.misspelled)
+    stages = run_benchmarks(addresses, add_dicts, args.admin_json, args.warmup, misspelled)
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'n': len(addresses),
+            'seed': args.seed,
+            'input': args.input,
+            'load_address_dict_s': round(load_seconds, 4),
+        },
+        'stages': stages,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"{'stage':<36}{'addr/s':>12}{'p50 (us)':>12}{'p99 (us)':>12}{'peak RSS (MB)':>15}")
+    for name, stats in stages.items():
+        print(f"{name:<36}{str(stats['addresses_per_sec']):>12}{str(stats['p50_us']):>12}"
+              f"{str(stats['p99_us']):>12}{str(stats['peak_rss_mb']):>15}")
+    print(f"Đã ghi kết quả ra file: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Sinh địa chỉ giả lập cho benchmark bằng cách lấy mẫu các tổ hợp tỉnh/thành -
+quận/huyện - phường/xã - đường có thật trong các từ điển Stage 1, sau đó thêm
+nhiễu: viết tắt (theo chuanhoa.csv), đảo thứ tự, thiếu cấp hành chính, lỗi gõ.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+
+from unidecode import unidecode
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_2"))
+
+from address_module import HCMHN_DICTS, TINH_DICTS, PX_DICTS, load_address_dict
+
+# tiền tố tên từ điển px -> loại quận/huyện
+PX_DISTRICT_CAT = {'huyen': 'huyện', 'quan': 'quận', 'tp': 'thành phố', 'tx': 'thị xã'}
+
+
+class SyntheticAddressGenerator(object):
+    """
+    Sinh địa chỉ ngẫu nhiên (có seed) từ các từ điển đã tải bằng load_address_dict.
+
+    Args:
+        add_dicts: kết quả của load_address_dict.
+        seed (int): seed cho bộ sinh số ngẫu nhiên.
+        p_abbrev, p_shuffle, p_missing, p_typo (float): xác suất áp dụng từng loại nhiễu.
+    """
+    def __init__(self, add_dicts, seed=0, p_abbrev=0.5, p_shuffle=0.1, p_missing=0.15, p_typo=0.05):
+        self.rng = random.Random(seed)
+        self.p_abbrev = p_abbrev
+        self.p_shuffle = p_shuffle
+        self.p_missing = p_missing
+        self.p_typo = p_typo
+
+        # (tỉnh, loại tỉnh, quận/huyện, loại quận/huyện)
+        self.districts = []
+        for attr, tinh_cat, qh_cat in HCMHN_DICTS + TINH_DICTS:
+            for tinh, qhs in getattr(add_dicts, attr).items():
+                self.districts.extend((tinh, tinh_cat, qh, qh_cat) for qh in qhs)
+
+        # (quận/huyện, loại) -> [(phường/xã, loại)]
+        self.wards = {}
+        for attr, px_cat in PX_DICTS:
+            qh_cat = PX_DISTRICT_CAT[attr.split('_')[0]]
+            for qh, pxs in getattr(add_dicts, attr).items():
+                self.wards.setdefault((qh, qh_cat), []).extend((px, px_cat) for px in pxs)
+        self.streets = add_dicts.qh_d
+
+        # dạng đầy đủ -> các dạng viết tắt (chuanhoa.csv: viết tắt, đầy đủ)
+        self.abbreviations = {}
+        for abbrev, full in add_dicts.chuanhoa[[0, 1]].itertuples(index=False):
+            if isinstance(abbrev, str) and isinstance(full, str) and abbrev.strip():
+                self.abbreviations.setdefault(full.strip(), []).append(abbrev.strip())
+
+    def _abbreviate(self, text):
+        if self.rng.random() >= self.p_abbrev:
+            return text
+        for full, abbrevs in self.abbreviations.items():
+            if text.startswith(full + ' ') or text == full:
+                abbrev = self.rng.choice(abbrevs)
+                sep = self.rng.choice(['.', '. ', ' '])
+                return abbrev + sep + text[len(full):].lstrip() if text != full else abbrev
+        return text
+
+    def _typo(self, text):
+        if len(text) < 4 or self.rng.random() >= self.p_typo:
+            return text
+        kind = self.rng.randrange(3)
+        i = self.rng.randrange(1, len(text) - 1)
+        if kind == 0:
+            # xoá một ký tự
+            return text[:i] + text[i + 1:]
+        if kind == 1:
+            # đảo hai ký tự liền nhau
+            return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+        # bỏ dấu tiếng Việt
+        return unidecode(text)
+
+    def generate_one(self):
+        rng = self.rng
+        tinh, tinh_cat, qh, qh_cat = rng.choice(self.districts)
+        parts = []
+
+        streets = self.streets.get(qh)
+        if streets and rng.random() < 0.7:
+            street = rng.choice(streets)
+            if rng.random() < 0.6:
+                street = "số %d %s" % (rng.randint(1, 300), street)
+            parts.append(street)
+        wards = self.wards.get((qh, qh_cat))
+        if wards:
+            px, px_cat = rng.choice(wards)
+            parts.append(self._abbreviate("%s %s" % (px_cat, px)))
+        parts.append(self._abbreviate("%s %s" % (qh_cat, qh)))
+        province = "%s %s" % (tinh_cat, tinh)
+        if tinh in ('hồ chí minh', 'hà nội') and rng.random() < self.p_abbrev:
+            province = rng.choice(['tp ', 'tp.', '']) + ('hcm' if tinh == 'hồ chí minh' else 'hn')
+        else:
+            province = self._abbreviate(province)
+        parts.append(province)
+
+        # thiếu cấp hành chính (giữ lại ít nhất một phần)
+        if len(parts) > 1 and rng.random() < self.p_missing:
+            del parts[rng.randrange(len(parts))]
+        # đảo thứ tự hai phần liền nhau
+        if len(parts) > 1 and rng.random() < self.p_shuffle:
+            i = rng.randrange(len(parts) - 1)
+            parts[i], parts[i + 1] = parts[i + 1], parts[i]
+
+        parts = [self._typo(part) for part in parts]
+        return rng.choice([', ', ' , ', ' - ', ' ']).join(parts)
+
+    def generate(self, n):
+        return [self.generate_one() for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh địa chỉ giả lập ra file CSV (cột 'Address')")
+    parser.add_argument("--project-path", default=".")
+    parser.add_argument("--dict-dir", default="Stage_1/generated_json")
+    parser.add_argument("-n", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="synthetic_addresses.csv")
+    args = parser.parse_args()
+
+    generator = SyntheticAddressGenerator(load_address_dict(args.project_path, args.dict_dir), seed=args.seed)
+    with open(args.output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Address'])
+        for address in generator.generate(args.n):
+            writer.writerow([address])
+    print(f"Đã sinh {args.n} địa chỉ vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import json
+from collections import namedtuple
+
+
+# một đơn vị hành chính của file JSON gốc (full_json_generated_data_vn_units.json);
+# level: 'province' / 'district' / 'ward', type: AdministrativeUnitShortName,
+# parent_code: mã đơn vị cha (None với tỉnh/thành)
+MasterRecord = namedtuple('MasterRecord', ['level', 'code', 'name', 'type', 'parent_code'])
+
+# (cấp, trường chứa danh sách con, trường mã cha của đơn vị con)
+_LEVELS = (('province', 'District', 'ProvinceCode'), ('district', 'Ward', 'DistrictCode'), ('ward', None, None))
+
+
+def iter_master_objects(filepath, buffer_size=1 << 20):
+    """
+    Đọc lần lượt từng phần tử (tỉnh/thành) của mảng JSON gốc mà không nạp cả file:
+    mỗi lần chỉ giải mã một tỉnh từ bộ đệm, bộ nhớ tỉ lệ với tỉnh lớn nhất.
+    """
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buf = f.read(buffer_size)
+        pos = _skip_space(buf, 0)
+        if pos >= len(buf) or buf[pos] != '[':
+            raise ValueError(f"File JSON gốc phải là một mảng: '{filepath}'")
+        pos += 1
+        eof = False
+        while True:
+            pos = _skip_space(buf, pos)
+            if pos < len(buf) and buf[pos] == ',':
+                pos = _skip_space(buf, pos + 1)
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            if pos < len(buf):
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield obj
+                    pos = end
+                    continue
+            elif eof:
+                raise ValueError(f"File JSON gốc bị cắt cụt: '{filepath}'")
+            # phần tử chưa nằm trọn trong bộ đệm: đọc thêm (ít nhất gấp đôi phần còn lại)
+            chunk = f.read(max(buffer_size, len(buf) - pos))
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+
+
+def _skip_space(buf, pos):
+    while pos < len(buf) and buf[pos] in ' \t\r\n':
+        pos += 1
+    return pos
+
+
+def flatten_unit(obj, level=0, parent_code=None):
+    """
+    Các MasterRecord của một đơn vị và mọi đơn vị con, theo thứ tự trong file
+    (tỉnh, rồi từng quận/huyện ngay sau đó là các phường/xã của nó).
+    Mã cha lấy từ trường ProvinceCode/DistrictCode của đơn vị con nếu có,
+    ngược lại là mã của đơn vị chứa nó.
+    """
+    name, children_field, parent_field = _LEVELS[level]
+    code = obj.get('Code')
+    yield MasterRecord(name, code, obj.get('Name'), obj.get('AdministrativeUnitShortName'), parent_code)
+    children = obj.get(children_field) if children_field else None
+    if isinstance(children, list):
+        for child in children:
+            if isinstance(child, dict):
+                yield from flatten_unit(child, level + 1, child.get(parent_field, code))
+
+
+def iter_master_records(filepath):
+    """
+    Đọc file JSON gốc thành dòng MasterRecord phẳng (level, code, name, type, parent_code),
+    dùng chung cho Stage 1 (sinh từ điển) và Stage 3 (bảng ID). Các phần tử cấp
+    ngoài cùng có Type khác 'province' bị bỏ qua.
+    """
+    for obj in iter_master_objects(filepath):
+        if isinstance(obj, dict) and obj.get('Type', 'province') == 'province':
+            yield from flatten_unit(obj)
@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+# Stage 2 và Stage 3 được import trực tiếp để chạy trong cùng một tiến trình
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_2"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "Stage_3"))
+
+from address_module import (load_address_dict, parse_addresses, parse_addresses_parallel, make_worker_pool,
+                            enable_result_cache, result_frame)
+from stream_io import detect_format, iter_input_chunks, ChunkWriter
+from tranform_module import AdminUnitIDMapper, transform_extracted_frame, seed_lexeme_table
+
+# --- CONFIGURATION ---
+INPUT_FILE = "address_full_0712.xlsx"
+OUTPUT_CSV_FILE = "converted_output.csv"
+ADDRESS_COLUMN_NAME = "Address"
+PROJECT_PATH = "."
+GENERATED_JSON_DIR_NAME = "Stage_1/generated_json"
+JSON_ADMIN_FILE = "Stage_1/full_json_generated_data_vn_units.json"
+# --- END CONFIGURATION ---
+
+STAGE2_COLUMNS = ['Address', 'tinh', 'tinh_cat', 'qh', 'qh_cat', 'px', 'px_cat', 'duong', 'Address_ch',
+                  'city_id', 'district_id', 'ward_id', 'Error_Processing']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Chạy Stage 2 (trích xuất) và Stage 3 (chuyển đổi) trong một lần duyệt, "
+                    "không cần file Excel trung gian")
+    parser.add_argument("--input", default=INPUT_FILE,
+                        help="File địa chỉ thô (.xlsx, .csv, .jsonl, .parquet)")
+    parser.add_argument("--output", default=OUTPUT_CSV_FILE,
+                        help="File output định dạng D_data_address (.csv, .jsonl, .parquet)")
+    parser.add_argument("--column", default=ADDRESS_COLUMN_NAME,
+                        help="Tên cột chứa địa chỉ đầy đủ")
+    parser.add_argument("--admin-json", default=JSON_ADMIN_FILE,
+                        help="File JSON chứa dữ liệu hành chính")
+    parser.add_argument("--intermediate", default=None,
+                        help="(Debug) ghi thêm kết quả Stage 2 ra file này")
+    parser.add_argument("--chunk-rows", type=int, default=50000,
+                        help="Số dòng xử lý mỗi lần")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số tiến trình trích xuất song song (mặc định 1)")
+    parser.add_argument("--chunk-size", type=int, default=2000,
+                        help="Số địa chỉ mỗi chunk gửi cho một tiến trình")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Bật cache LRU kết quả cho các địa chỉ lặp lại (số phần tử, 0: tắt)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Chỉ phân tích mỗi địa chỉ khác nhau một lần trong mỗi chunk")
+    return parser.parse_args()
+
+
+def extract_chunk(addresses, add_dicts, args, pool=None):
+    # Stage 2 cho một chunk -> DataFrame cùng cột với extracted_addresses_output
+    if pool is not None:
+        columns = parse_addresses_parallel(addresses, PROJECT_PATH, GENERATED_JSON_DIR_NAME,
+                                           chunk_size=args.chunk_size, as_frame=False, pool=pool,
+                                           dedupe=args.dedupe)
+    else:
+        columns = parse_addresses(addresses, add_dicts, as_frame=False, dedupe=args.dedupe)
+    df_result = result_frame(columns, index=addresses.index)
+    return pd.concat([addresses.rename('Address'), df_result], axis=1).reindex(columns=STAGE2_COLUMNS)
+
+
+def main():
+    args = parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Lỗi: File input '{args.input}' không tìm thấy tại '{os.path.abspath(args.input)}'.")
+        return 1
+    try:
+        for path in [args.input, args.output] + ([args.intermediate] if args.intermediate else []):
+            detect_format(path)
+    except ValueError as e:
+        print(f"Lỗi: {e}")
+        return 1
+
+    print("Đang tải các từ điển địa chỉ và dữ liệu hành chính...")
+    add_dicts = load_address_dict(PROJECT_PATH, GENERATED_JSON_DIR_NAME)
+    admin_mapper = AdminUnitIDMapper(args.admin_json)
+    seed_lexeme_table(os.path.join(PROJECT_PATH, GENERATED_JSON_DIR_NAME))
+
+    pool = None
+    if args.workers > 1:
+        pool = make_worker_pool(PROJECT_PATH, GENERATED_JSON_DIR_NAME, args.workers, args.cache_size)
+    elif args.cache_size > 0:
+        enable_result_cache(add_dicts, args.cache_size)
+    intermediate = ChunkWriter(args.intermediate) if args.intermediate else None
+    errors = 0
+    try:
+        with ChunkWriter(args.output) as writer:
+            for chunk in iter_input_chunks(args.input, chunk_rows=args.chunk_rows):
+                if args.column not in chunk.columns:
+                    print(f"Lỗi: Cột địa chỉ '{args.column}' không tìm thấy trong file input.")
+                    print(f"Các cột hiện có trong file: {chunk.columns.tolist()}")
+                    return 1
+                extracted = extract_chunk(chunk[args.column], add_dicts, args, pool)
+                errors += int(extracted['Error_Processing'].notna().sum())
+                if intermediate is not None:
+                    intermediate.write(extracted)
+                writer.write(transform_extracted_frame(extracted, admin_mapper, start_id=writer.rows + 1))
+                print(f"Đã xử lý {writer.rows} địa chỉ...")
+    finally:
+        if intermediate is not None:
+            intermediate.close()
+        if pool is not None:
+            pool.shutdown()
+
+    if errors:
+        print(f"Có {errors} địa chỉ bị lỗi khi trích xuất (xem cột Error_Processing với --intermediate).")
+    if getattr(add_dicts, 'result_cache', None) is not None:
+        print(f"Thống kê cache: {add_dicts.result_cache.stats()}")
+    print(f"Đã ghi {writer.rows} dòng ra file: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
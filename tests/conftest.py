@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# các stage là thư mục script (không phải package), import giống cách các script tự chạy
+for sub in ('Stage_2', 'Stage_3', 'Stage_1', 'benchmarks', ''):
+    path = os.path.join(ROOT, sub)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+GENERATED_JSON_DIR_NAME = os.path.join('Stage_1', 'generated_json')
+
+
+@pytest.fixture(scope='session')
+def add_dicts():
+    from address_module import load_address_dict
+    # nạp thẳng từ JSON để kết quả không phụ thuộc bundle có sẵn trên máy
+    return load_address_dict(ROOT, GENERATED_JSON_DIR_NAME, use_bundle=False)
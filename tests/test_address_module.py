@@ -0,0 +1,45 @@
+import json
+import os
+
+import pytest
+
+from address_module import add_proc_1, add_proc_2, parse_address, parse_addresses, ADD_NAME_DICT_KEYS
+
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), 'data', 'golden_addresses.json')
+with open(GOLDEN_FILE, 'r', encoding='utf-8') as f:
+    # mẫu cố định từ address_full_0712.xlsx; 'note' + 'legacy': thay đổi có chủ ý so với cách làm cũ
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize('case', GOLDEN, ids=[case['address'] for case in GOLDEN])
+def test_golden_parse_output(add_dicts, case):
+    record = parse_address(case['address'], add_dicts)
+    assert {key: getattr(record, key) for key in case['expected']} == case['expected']
+
+
+def test_batch_matches_single_parse(add_dicts):
+    addresses = [case['address'] for case in GOLDEN]
+    columns = parse_addresses(addresses, add_dicts, as_frame=False)
+    for i, address in enumerate(addresses):
+        record = parse_address(address, add_dicts)
+        assert all(columns[key][i] == getattr(record, key) for key in GOLDEN[i]['expected'])
+
+
+def test_neighbour_district_is_not_taken(add_dicts):
+    record = parse_address('hẻm 341 khuông việt , p . phú trung , q . tân phú , giáp quận 11', add_dicts)
+    assert (record.qh, record.px) == ('tân phú', 'phú trung')
+
+
+def test_ward_named_like_district_is_not_ambiguous(add_dicts):
+    # "hiệp bình chánh" là phường của thủ đức, không phải huyện bình chánh
+    record = parse_address('đường 48 , hiệp bình chánh , thủ đức', add_dicts)
+    assert (record.qh, record.px) == ('thủ đức', 'hiệp bình chánh')
+
+
+def test_add_proc_2_is_deprecated_noop(add_dicts):
+    data = dict.fromkeys(ADD_NAME_DICT_KEYS)
+    data['Address_ch'] = 'quận 1 hồ chí minh'
+    data = add_proc_1(data, add_dicts)
+    before = dict(data)
+    with pytest.warns(DeprecationWarning):
+        assert add_proc_2(data, add_dicts) == before
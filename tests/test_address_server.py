@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from address_server import AddressService, MicroBatcher, ROOT_DIR, GENERATED_JSON_DIR_NAME
+
+
+def _echo(addresses):
+    return {'Address_ch': list(addresses)}
+
+
+def test_batcher_returns_results_in_order():
+    batcher = MicroBatcher(_echo, max_batch=3, max_wait_ms=1)
+    try:
+        futures = batcher.submit_many(['a', 'b', 'c', 'd'])
+        assert [f.result(timeout=5)['Address_ch'] for f in futures] == ['a', 'b', 'c', 'd']
+    finally:
+        batcher.close()
+
+
+def test_close_does_not_block_on_full_queue():
+    gate = threading.Event()
+    started = threading.Event()
+
+    def slow(addresses):
+        started.set()
+        gate.wait(5)
+        return _echo(addresses)
+
+    batcher = MicroBatcher(slow, max_batch=1, max_wait_ms=0, max_queue=2)
+    running = batcher.submit('running')
+    assert started.wait(5)
+    # hàng đợi đầy trong khi thread xử lý đang bận
+    queued = batcher.submit_many(['q1', 'q2'])
+
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    time.sleep(0.05)
+    gate.set()
+    closer.join(5)
+    assert not closer.is_alive()
+    assert running.result(timeout=5)['Address_ch'] == 'running'
+    for future in queued:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        batcher.submit('late')
+
+
+def test_cache_metrics_are_collected_from_workers():
+    service = AddressService(ROOT_DIR, GENERATED_JSON_DIR_NAME, workers=2, admin_json=None, cache_size=100)
+    try:
+        addresses = ['quận 1 hồ chí minh', 'quận ba đình hà nội'] * 4
+        service.parse_batch(addresses)
+        service.parse_batch(addresses)
+        stats = service.cache_stats()
+        assert stats['raw']['hits'] > 0
+        assert stats['raw']['hits'] + stats['raw']['misses'] == 2 * len(addresses)
+        assert 'address_server_cache_hits_total{cache="raw"}' in service.metrics_text()
+    finally:
+        service.close()
@@ -0,0 +1,82 @@
+from address_module import HCMHN_DICTS, PX_DICTS, TINH_DICTS, AddObj
+from admin_tree import AdminTree
+
+
+DISTRICT_DICTS = HCMHN_DICTS + TINH_DICTS
+
+TREE_JSON = [
+    {'name': 'Bắc Ninh', 'type': 'Tỉnh', 'code': '27', 'districts': [
+        {'name': 'Bắc Ninh', 'type': 'Thành phố', 'code': '256', 'wards': [
+            {'name': 'Vũ Ninh', 'type': 'Phường', 'code': '09190'},
+        ]},
+        {'name': 'Yên Phong', 'type': 'Huyện', 'code': '258', 'wards': [
+            {'name': 'Dũng Liệt', 'type': 'Xã', 'code': '09202'},
+            {'name': 'Chờ', 'type': 'Thị trấn', 'code': '09193'},
+            {'name': 'Lạ', 'type': 'Đặc khu', 'code': '09999'},
+        ]},
+    ]},
+    {'name': 'Hồ Chí Minh', 'type': 'Thành phố', 'code': '79', 'districts': [
+        {'name': '1', 'type': 'Quận', 'code': '760', 'wards': [
+            {'name': 'Bến Nghé', 'type': 'Phường', 'code': '26734'},
+            {'name': '5', 'type': 'Phường'},
+        ]},
+        {'name': 'Củ Chi', 'type': 'Huyện', 'code': '783', 'wards': []},
+    ]},
+    {'name': 'Đà Nẵng', 'type': 'Thành phố', 'code': '48', 'districts': [
+        # không có từ điển thanhpho_tx: bị bỏ như ở các từ điển phẳng
+        {'name': 'Thị Xã Lạ', 'type': 'Thị xã', 'code': '999', 'wards': []},
+        {'name': 'Hải Châu', 'type': 'Quận', 'code': '492', 'wards': []},
+    ]},
+]
+
+
+def _tree():
+    return AdminTree.from_json(TREE_JSON, DISTRICT_DICTS, PX_DICTS, {'yên phong': ['đường lý thái tổ']})
+
+
+def test_from_json_orders_districts_like_the_dictionaries():
+    # hcm_hn_* trước, rồi thanhpho_quan, tinh_huyen, tinh_tp (theo HCMHN_DICTS + TINH_DICTS)
+    assert list(_tree().iter_districts()) == [
+        ('hồ chí minh', 'thành phố', 'củ chi', 'huyện'),
+        ('hồ chí minh', 'thành phố', '1', 'quận'),
+        ('đà nẵng', 'thành phố', 'hải châu', 'quận'),
+        ('bắc ninh', 'tỉnh', 'yên phong', 'huyện'),
+        ('bắc ninh', 'tỉnh', 'bắc ninh', 'thành phố'),
+    ]
+
+
+def test_from_json_wards_and_codes():
+    tree = _tree()
+    yen_phong = tree.district('bắc ninh', 'yên phong')
+    # thứ tự PX_DICTS (huyen_thitran trước huyen_xa), loại không có từ điển bị bỏ
+    assert [ward[:2] for ward in yen_phong.wards] == [('chờ', 'thị trấn'), ('dũng liệt', 'xã')]
+    assert yen_phong.streets == ['đường lý thái tổ']
+    quan_1 = tree.district('hồ chí minh', '1')
+    assert quan_1.search == 'quận 1'
+    assert [ward[2] for ward in quan_1.wards] == ['bến nghé', 'phường 5']
+    assert tree.unit_ids('bắc ninh', 'yên phong', 'chờ', 'thị trấn') == (27, 258, 9193)
+    assert tree.unit_ids('hồ chí minh', '1', '5', 'phường') == (79, 760, None)
+    assert tree.unit_ids('bắc ninh', 'không có', None, None) == (27, None, None)
+    assert tree.unit_ids('không có', None, None, None) == (None, None, None)
+
+
+def test_district_lookup_falls_back_to_same_name_elsewhere():
+    tree = _tree()
+    assert tree.district('hà nội', 'yên phong').province.name == 'bắc ninh'
+    assert tree.district('bắc ninh', 'bắc ninh').cat == 'thành phố'
+    assert tree.district('bắc ninh', 'không có') is None
+    assert [d.province.name for d in tree.districts_by_search['quận 1']] == ['hồ chí minh']
+
+
+def test_from_dicts_shares_children_of_same_named_districts():
+    add_dicts = AddObj()
+    for attr, _, _ in DISTRICT_DICTS:
+        setattr(add_dicts, attr, {})
+    add_dicts.tinh_huyen = {'bắc ninh': ['yên phong'], 'long an': ['tân bình']}
+    add_dicts.hcm_hn_quan = {'hồ chí minh': ['tân bình']}
+    ward_index = {'tân bình': [('1', 'phường', 'phường 1', 'quan_phuong')]}
+    tree = AdminTree.from_dicts(add_dicts, DISTRICT_DICTS, ward_index, {})
+    assert [d.province.name for d in tree.districts_by_search['tân bình']] == ['hồ chí minh', 'long an']
+    assert tree.district('long an', 'tân bình').wards is tree.district('hồ chí minh', 'tân bình').wards
+    assert tree.district('bắc ninh', 'yên phong').wards == []
+    assert tree.unit_ids('bắc ninh', 'yên phong', None, None) == (None, None, None)
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+import async_parser
+from async_parser import AsyncAddressParser
+
+ADDRESS = 'phường bến nghé quận 1 hồ chí minh'
+
+
+def test_parser_survives_several_event_loops(add_dicts):
+    parser = AsyncAddressParser(add_dicts=add_dicts)
+
+    async def parse():
+        return await asyncio.wait_for(parser.parse_async(ADDRESS), 5)
+
+    # mỗi asyncio.run là một event loop mới
+    first = asyncio.run(parse())
+    second = asyncio.run(parse())
+    assert first == second
+    assert first['qh'] == '1'
+
+    async def close():
+        await parser.close()
+    asyncio.run(close())
+
+
+def test_default_parser_reused_across_asyncio_run(add_dicts, monkeypatch):
+    monkeypatch.setattr(async_parser, '_default_parser', AsyncAddressParser(add_dicts=add_dicts))
+
+    async def parse():
+        return await asyncio.wait_for(async_parser.parse_async(ADDRESS), 5)
+
+    assert asyncio.run(parse())['px'] == asyncio.run(parse())['px']
+
+
+def test_close_cancels_queued_addresses(add_dicts):
+    async def run():
+        # max_wait dài: các địa chỉ còn nằm trong lô đang gom khi close() được gọi
+        parser = AsyncAddressParser(add_dicts=add_dicts, max_batch=1000, max_wait_ms=1000)
+        futures = [await parser.submit(ADDRESS) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        await parser.close()
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        with pytest.raises(RuntimeError):
+            await parser.submit(ADDRESS)
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+
+
+def test_parse_stream_keeps_input_order(add_dicts):
+    addresses = ['quận 1 hồ chí minh', 'quận ba đình hà nội', 'quận 3 hồ chí minh']
+
+    async def run():
+        async with AsyncAddressParser(add_dicts=add_dicts, max_batch=2) as parser:
+            return [r['qh'] async for r in parser.parse_stream(addresses)]
+
+    assert asyncio.run(run()) == ['1', 'ba đình', '3']
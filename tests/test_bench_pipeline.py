@@ -0,0 +1,20 @@
+import pytest
+
+from bench_pipeline import percentile
+
+
+@pytest.mark.parametrize('n', [1, 10, 99, 100, 101, 1000])
+def test_percentile_is_nearest_rank(n):
+    values = list(range(1, n + 1))
+    # nearest-rank: giá trị nhỏ nhất có ít nhất q% số phần tử <= nó
+    for q in (50, 90, 99, 100):
+        k = percentile(values, q)
+        assert sum(v <= k for v in values) >= q / 100.0 * n
+        assert sum(v < k for v in values) < q / 100.0 * n
+
+
+def test_percentile_examples():
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile(list(range(1, 1001)), 99) == 990
+    assert percentile(list(range(1, 101)), 50) == 50
+    assert percentile([], 50) is None
@@ -0,0 +1,86 @@
+import pytest
+
+from address_module import parse_address
+from fuzzy_matcher import DeletionIndex, fold_accents, within_one_edit
+
+
+def test_fold_accents_keeps_positions():
+    text = 'phường bến nghé, quận 1, đà nẵng'
+    folded = fold_accents(text)
+    assert folded == 'phuong ben nghe, quan 1, da nang'
+    assert len(folded) == len(text)
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    ('ben nghe', 'ben nghe', True),
+    ('ben nghe', 'ben nge', True),       # xoá
+    ('ben nghe', 'ben ngheh', True),     # thêm
+    ('ben nghe', 'ben nhge', True),      # hoán vị hai ký tự kề nhau
+    ('ben nghe', 'ban nghe', True),      # thay
+    ('ben nghe', 'ban nge', False),
+    ('ben nghe', 'ben', False),
+])
+def test_within_one_edit(a, b, expected):
+    assert within_one_edit(a, b) is expected
+    assert within_one_edit(b, a) is expected
+
+
+def test_deletion_index_rejects_ambiguous_and_short_names():
+    index = DeletionIndex()
+    index.add('tan phuoc', 'a')
+    index.add('an phuoc', 'b')
+    index.add('an phu', 'c')
+    index.add('ab', 'd')
+    assert index.lookup('tan phuoc') == 'a'
+    assert index.lookup('tan phuco') == 'a'
+    # "an phuo" cách "an phuoc" và "an phu" đều một phép sửa -> không chọn
+    assert index.lookup('an phuo') is None
+    # tên ngắn chỉ khớp chính xác
+    assert index.lookup('ac') is None
+    assert index.lookup('tan phuco', max_distance=0) is None
+
+
+@pytest.mark.parametrize('address, expected', [
+    # phường/xã sai một ký tự
+    ('phường bến ngé quận 1 hồ chí minh', ('1', 'bến nghé', 'phường')),
+    ('xã phước kiểnn huyện nhà bè hcm', ('nhà bè', 'phước kiển', 'xã')),
+    # không dấu
+    ('phuong ben nghe quan 1 ho chi minh', ('1', 'bến nghé', 'phường')),
+    ('quan cau giay ha noi', ('cầu giấy', None, None)),
+])
+def test_misspelled_units_resolve(add_dicts, address, expected):
+    record = parse_address(address, add_dicts)
+    assert (record.qh, record.px, record.px_cat) == expected
+
+
+def test_unaccented_street_resolves(add_dicts):
+    record = parse_address('số 5 duong nguyen hue, phường bến nghé, quận 1, hcm', add_dicts)
+    assert record.duong == 'nguyễn huệ'
+
+
+@pytest.mark.parametrize('address, expected', [
+    # khớp chính xác được giữ nguyên, bước fuzzy không đổi sang tên gần giống ("dịch vọng hậu")
+    ('phường dịch vọng quận cầu giấy hà nội', ('cầu giấy', 'dịch vọng', None)),
+    ('số 5 nguyễn huệ, phường bến nghé, quận 1, hcm', ('1', 'bến nghé', 'nguyễn huệ')),
+])
+def test_exact_matches_are_not_overridden(add_dicts, address, expected):
+    record = parse_address(address, add_dicts)
+    assert (record.qh, record.px, record.duong) == expected
+
+
+@pytest.mark.parametrize('address, expected', [
+    # không có tên tỉnh, tên quận/huyện không dấu không có tiền tố: "quan hoa" còn là phường của hà nội
+    ('so 5 ngo 3 quan hoa', (None, None)),
+    ('cau giay', (None, None)),
+    # có tiền tố loại, hoặc viết có dấu đúng tên -> suy ra tỉnh
+    ('so 5 ngo 3 huyen quan hoa', ('thanh hóa', 'quan hóa')),
+    ('so 5 h. quan hoa viet nam', ('thanh hóa', 'quan hóa')),
+    ('thôn 2 quan hóa', ('thanh hóa', 'quan hóa')),
+    # có dấu nhưng sai dấu
+    ('thôn 2 huyện quan hòa', (None, None)),
+    # có tên tỉnh đi kèm
+    ('xa phu nghiem quan hoa thanh hoa', ('thanh hóa', 'quan hóa')),
+])
+def test_province_from_district_needs_prefix_or_accents(add_dicts, address, expected):
+    record = parse_address(address, add_dicts)
+    assert (record.tinh, record.qh) == expected
@@ -0,0 +1,86 @@
+import pickle
+import random
+
+import pytest
+
+from gazetteer import AhoCorasick, Gazetteer
+
+
+ADDRESSES = [
+    'số 12 ngõ 34 đường nguyễn trãi, phường thượng đình, quận thanh xuân, hà nội',
+    'thôn 3, xã ea tu, thành phố buôn ma thuột, đắk lắk',
+    '45 lê lợi phường bến nghé quận 1 hồ chí minh',
+    'khu phố 2, thị trấn chờ, huyện yên phong, bắc ninh',
+    'tổ 5 phường 12 quận 10',
+    '',
+]
+
+
+def _brute_force(patterns, text):
+    return sorted((i, i + len(p), p) for p in set(patterns) for i in range(len(text)) if text.startswith(p, i))
+
+
+def test_aho_corasick_finds_overlapping_matches():
+    automaton = AhoCorasick()
+    for pattern in ('he', 'she', 'his', 'hers', 'h'):
+        automaton.add(pattern)
+    automaton.build()
+    text = 'ushers his'
+    assert sorted(automaton.iter_matches(text)) == _brute_force(('he', 'she', 'his', 'hers', 'h'), text)
+
+
+def test_aho_corasick_matches_brute_force_on_random_text():
+    rng = random.Random(0)
+    for _ in range(50):
+        patterns = [''.join(rng.choice('ab ') for _ in range(rng.randint(1, 4))) for _ in range(8)]
+        text = ''.join(rng.choice('ab ') for _ in range(40))
+        automaton = AhoCorasick()
+        for pattern in patterns:
+            automaton.add(pattern)
+        automaton.build()
+        assert sorted(automaton.iter_matches(text)) == _brute_force(patterns, text)
+
+
+def test_gazetteer_numbered_units_are_prefixed():
+    gazetteer = Gazetteer()
+    gazetteer.add_district_dict({'hồ chí minh': ['1', 'bình thạnh']}, 'quận')
+    gazetteer.add_ward_dict({'bình thạnh': ['12', 'tân định']}, 'phường')
+    gazetteer.build()
+    assert gazetteer.kinds['quận 1'] == ('qh',)
+    assert gazetteer.kinds['hồ chí minh'] == ('tinh',)
+    assert '1' not in gazetteer.kinds and '12' not in gazetteer.kinds
+    assert gazetteer.present('số 1 đường 12 phường 12 quận 1') == {'quận 1', 'phường 12'}
+
+
+@pytest.mark.parametrize('address', ADDRESSES)
+def test_present_matches_substring_condition(add_dicts, address):
+    # đúng điều kiện (tên + ' ') in (địa chỉ + ' ') của các bước duyệt cây
+    gazetteer = add_dicts.gazetteer
+    expected = {name for name in gazetteer.kinds if name + ' ' in address + ' '}
+    assert gazetteer.present(address) == expected
+
+
+@pytest.mark.parametrize('address', [a for a in ADDRESSES if ', ' in a])
+def test_truncate_equals_rescan(add_dicts, address):
+    gazetteer = add_dicts.gazetteer
+    # cut luôn là đầu một từ (vị trí bắt đầu phần hành chính ở cuối)
+    cut = address.rfind(', ') + 2
+    gazetteer.present(address)
+    gazetteer.truncate(address, cut)
+    truncated = gazetteer.present(address[:cut])
+    assert truncated == {name for name in gazetteer.kinds if name + ' ' in address[:cut] + ' '}
+
+
+def test_truncate_ignores_other_text(add_dicts):
+    gazetteer = add_dicts.gazetteer
+    gazetteer.present(ADDRESSES[0])
+    gazetteer.truncate(ADDRESSES[1], 5)
+    assert gazetteer.present(ADDRESSES[0]) == {name for name in gazetteer.kinds if name + ' ' in ADDRESSES[0] + ' '}
+
+
+def test_pickle_drops_last_scan(add_dicts):
+    gazetteer = add_dicts.gazetteer
+    gazetteer.present(ADDRESSES[0])
+    restored = pickle.loads(pickle.dumps(gazetteer))
+    assert restored._last[0] is None
+    assert restored.present(ADDRESSES[0]) == gazetteer.present(ADDRESSES[0])
@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+
+
+MASTER = [
+    {
+        'Type': 'province', 'Code': '01', 'Name': 'Hà Nội', 'AdministrativeUnitShortName': 'Thành phố',
+        'District': [
+            {
+                'Code': '001', 'Name': 'Ba Đình', 'AdministrativeUnitShortName': 'Quận', 'ProvinceCode': '01',
+                'Ward': [{'Code': '00001', 'Name': 'Phúc Xá', 'AdministrativeUnitShortName': 'Phường'}],
+            },
+        ],
+    },
+    {
+        'Type': 'province', 'Code': '27', 'Name': 'Bắc Ninh', 'AdministrativeUnitShortName': 'Tỉnh',
+        'District': [
+            {
+                'Code': '256', 'Name': 'Bắc Ninh', 'AdministrativeUnitShortName': 'Thành phố', 'ProvinceCode': '27',
+                'Ward': [{'Code': '09190', 'Name': 'Vũ Ninh', 'AdministrativeUnitShortName': 'Phường'}],
+            },
+            {
+                'Code': '258', 'Name': 'Yên Phong', 'AdministrativeUnitShortName': 'Huyện', 'ProvinceCode': '27',
+                'Ward': [{'Code': '09193', 'Name': 'Chờ', 'AdministrativeUnitShortName': 'Thị trấn'}],
+            },
+        ],
+    },
+]
+
+
+@pytest.fixture(scope='module')
+def gen(tmp_path_factory):
+    # module tự ghi json_generation.log vào thư mục hiện tại khi import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('log'))
+    try:
+        import generate_json_files
+    finally:
+        os.chdir(cwd)
+    return generate_json_files
+
+
+def _write_master(path, master):
+    path.write_text(json.dumps(master, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def _run(gen, tmp_path, master, *extra):
+    input_file = _write_master(tmp_path / 'master.json', master)
+    output_dir = str(tmp_path / 'out')
+    assert gen.main(['--input', input_file, '--output-dir', output_dir] + list(extra)) == 0
+    with open(os.path.join(output_dir, gen.MANIFEST_FILE), encoding='utf-8') as f:
+        return output_dir, json.load(f)
+
+
+def test_write_file_atomic_replaces_and_hashes(gen, tmp_path):
+    path = str(tmp_path / 'a.json')
+    gen.write_json_atomic(path, {'x': 1})
+    digest = gen.write_json_atomic(path, {'x': 'hà nội'})
+    with open(path, 'rb') as f:
+        content = f.read()
+    assert json.loads(content) == {'x': 'hà nội'}
+    assert digest == gen.hashlib.sha256(content).hexdigest()
+    assert os.listdir(tmp_path) == ['a.json']
+
+
+def test_write_file_atomic_keeps_old_file_on_failure(gen, tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.json')
+    gen.write_json_atomic(path, {'x': 1})
+
+    def fail(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(gen.os, 'replace', fail)
+    with pytest.raises(OSError):
+        gen.write_json_atomic(path, {'x': 2})
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'x': 1}
+    assert os.listdir(tmp_path) == ['a.json']
+
+
+def test_full_run_writes_manifest(gen, tmp_path):
+    output_dir, manifest = _run(gen, tmp_path, MASTER)
+    assert manifest['version'] == gen.MANIFEST_VERSION
+    assert manifest['province_order'] == [p['key'] for p in gen.extract_master(
+        gen.load_master_records(str(tmp_path / 'master.json')))[2]]
+    assert manifest['input_hash'] == gen.file_sha256(str(tmp_path / 'master.json'))
+    assert sorted(manifest['changed_provinces']) == sorted(manifest['provinces'])
+    for rel_path, digest in manifest['files'].items():
+        assert gen.file_sha256(os.path.join(output_dir, rel_path)) == digest
+    assert gen.bundle_is_current(output_dir)
+
+
+def test_incremental_unchanged_input_skips_extraction(gen, tmp_path, monkeypatch):
+    output_dir, _ = _run(gen, tmp_path, MASTER)
+
+    def fail(records):
+        raise AssertionError('extract_master should not run')
+    monkeypatch.setattr(gen, 'extract_master', fail)
+    _, manifest = _run(gen, tmp_path, MASTER, '--incremental')
+    assert manifest['changed_files'] == [] and manifest['changed_provinces'] == []
+    assert gen.bundle_is_current(output_dir)
+
+    # thiếu một file đầu ra: phải chạy lại phần trích xuất
+    os.remove(os.path.join(output_dir, 'qh', 'tinh_huyen.json'))
+    assert not gen.outputs_up_to_date(gen.load_manifest(output_dir),
+                                      gen.file_sha256(str(tmp_path / 'master.json')), output_dir)
+
+
+def test_incremental_rewrites_only_changed_province(gen, tmp_path):
+    output_dir, full = _run(gen, tmp_path, MASTER)
+    master = json.loads(json.dumps(MASTER))
+    master[1]['District'][1]['Ward'][0]['Name'] = 'Chờ Mới'
+    _, manifest = _run(gen, tmp_path, master, '--incremental')
+    changed = [key for key in full['provinces'] if full['provinces'][key]['hash'] != manifest['provinces'][key]['hash']]
+    assert manifest['changed_provinces'] == changed and len(changed) == 1
+    assert set(manifest['changed_files']) <= {'admin_tree.json', 'px/huyen_thitran.json'}
+    assert 'px/huyen_thitran.json' in manifest['changed_files']
+
+    # kết quả giống hệt một lần chạy đầy đủ trên cùng dữ liệu
+    os.makedirs(tmp_path / 'full')
+    _, again = _run(gen, tmp_path / 'full', master)
+    assert again['files'] == manifest['files']
+
+
+def test_plan_incremental_falls_back_to_full_run_on_reorder(gen):
+    provinces = [{'key': 'a', 'hash': '1', 'files': ['tinh_huyen']}, {'key': 'b', 'hash': '2', 'files': []}]
+    manifest = {'province_order': ['b', 'a'], 'provinces': {'a': {'hash': '1'}, 'b': {'hash': '2'}}}
+    assert gen.plan_incremental(provinces, manifest, '.') == (None, [])
+    assert gen.plan_incremental(provinces, None, '.') == (None, ['a', 'b'])
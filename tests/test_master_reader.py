@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from master_reader import MasterRecord, flatten_unit, iter_master_objects, iter_master_records
+
+
+MASTER = [
+    {
+        'Type': 'province', 'Code': '01', 'Name': 'Hà Nội', 'AdministrativeUnitShortName': 'Thành phố',
+        'District': [
+            {
+                'Code': '001', 'Name': 'Ba Đình', 'AdministrativeUnitShortName': 'Quận', 'ProvinceCode': '01',
+                'Ward': [
+                    {'Code': '00001', 'Name': 'Phúc Xá', 'AdministrativeUnitShortName': 'Phường', 'DistrictCode': '001'},
+                    {'Code': '00004', 'Name': 'Trúc Bạch', 'AdministrativeUnitShortName': 'Phường'},
+                ],
+            },
+        ],
+    },
+    {'Type': 'note', 'Code': 'x', 'Name': 'không phải tỉnh'},
+    {
+        'Type': 'province', 'Code': '79', 'Name': 'Hồ Chí Minh', 'AdministrativeUnitShortName': 'Thành phố',
+        'District': [
+            {'Code': '760', 'Name': 'Quận 1', 'AdministrativeUnitShortName': 'Quận', 'ProvinceCode': '79', 'Ward': []},
+        ],
+    },
+]
+
+
+def _write(tmp_path, text):
+    path = tmp_path / 'master.json'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('buffer_size', [1, 7, 64, 1 << 20])
+def test_streaming_matches_json_load(tmp_path, buffer_size):
+    # bộ đệm nhỏ hơn một phần tử buộc phải đọc thêm giữa chừng raw_decode
+    path = _write(tmp_path, json.dumps(MASTER, ensure_ascii=False, indent=2))
+    assert list(iter_master_objects(path, buffer_size=buffer_size)) == MASTER
+
+
+def test_streaming_compact_and_empty(tmp_path):
+    path = _write(tmp_path, json.dumps(MASTER, ensure_ascii=False, separators=(',', ':')))
+    assert list(iter_master_objects(path, buffer_size=3)) == MASTER
+    assert list(iter_master_objects(_write(tmp_path, ' \n[ ]\n'))) == []
+
+
+def test_non_array_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_master_objects(_write(tmp_path, '{"Code": "01"}')))
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    text = json.dumps(MASTER, ensure_ascii=False)
+    for cut in (len(text) - 1, len(text) // 2):
+        with pytest.raises(ValueError):
+            list(iter_master_objects(_write(tmp_path, text[:cut]), buffer_size=16))
+
+
+def test_records_skip_non_province_and_keep_file_order(tmp_path):
+    path = _write(tmp_path, json.dumps(MASTER, ensure_ascii=False))
+    assert list(iter_master_records(path)) == [
+        MasterRecord('province', '01', 'Hà Nội', 'Thành phố', None),
+        MasterRecord('district', '001', 'Ba Đình', 'Quận', '01'),
+        MasterRecord('ward', '00001', 'Phúc Xá', 'Phường', '001'),
+        # thiếu DistrictCode: lấy mã của quận chứa nó
+        MasterRecord('ward', '00004', 'Trúc Bạch', 'Phường', '001'),
+        MasterRecord('province', '79', 'Hồ Chí Minh', 'Thành phố', None),
+        MasterRecord('district', '760', 'Quận 1', 'Quận', '79'),
+    ]
+
+
+def test_flatten_unit_prefers_explicit_parent_code():
+    province = {'Code': '01', 'Name': 'A', 'District': [{'Code': '002', 'Name': 'B', 'ProvinceCode': '99'}]}
+    assert [r.parent_code for r in flatten_unit(province)] == [None, '99']
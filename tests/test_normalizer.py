@@ -0,0 +1,111 @@
+import os
+import random
+import re
+import unicodedata
+
+import pandas as pd
+import pytest
+
+from address_module import add_norm, parse_address
+from normalizer import VIETNAMESE_LETTERS_ONLY, Normalizer, nfc_json, to_nfc
+
+
+CHUANHOA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'Stage_1', 'generated_json', 'chuanhoa.csv')
+
+
+def _legacy_normalize(address, chuanhoa):
+    # cách làm cũ của add_norm: một re.sub cho từng dòng của chuanhoa.csv
+    for i in range(len(chuanhoa)):
+        abbrev = str(chuanhoa.iloc[i, 0]).strip()
+        full = str(chuanhoa.iloc[i, 1]).strip()
+        if not abbrev:
+            continue
+        pattern_abbrev = r'\b' + re.escape(abbrev) + r'\.?(?![%s])' % VIETNAMESE_LETTERS_ONLY
+        address = re.sub(pattern_abbrev, full, address, flags=re.IGNORECASE)
+    address = re.sub(r'([%s]+)(\d+)' % VIETNAMESE_LETTERS_ONLY, r'\1 \2', address)
+    address = re.sub(r'(\d+)([%s]+)' % VIETNAMESE_LETTERS_ONLY, r'\1 \2', address)
+    address = address.replace(',', '')
+    address = address.replace('.', ' ')
+    return re.sub(r'\s\s+', ' ', address).strip()
+
+
+@pytest.fixture(scope='module')
+def chuanhoa():
+    return pd.read_csv(CHUANHOA_PATH, header=None, encoding='utf-8')
+
+
+CASES = [
+    'p12 q.3 tp.hcm',
+    'P.Bến Nghé, Q1, TP HCM',
+    '12a đ. lê lợi, tt. chờ, h.yên phong',
+    'x. ea tu tp. buôn ma thuột',
+    'số 5 ngõ 3 phố huế hn',
+    'tx.sơn tây , hà nội',
+    'tphcm hcmc pq ph. hq',
+    '  nhiều   khoảng  trắng  ',
+    '',
+]
+
+
+@pytest.mark.parametrize('address', CASES)
+def test_matches_legacy_add_norm(chuanhoa, address):
+    assert Normalizer.from_table(chuanhoa).normalize(address) == _legacy_normalize(address, chuanhoa)
+
+
+def test_matches_legacy_on_random_abbreviation_heavy_text(chuanhoa):
+    normalizer = Normalizer.from_table(chuanhoa)
+    abbrevs = [str(a) for a in chuanhoa.iloc[:, 0]]
+    tokens = abbrevs + [a.upper() for a in abbrevs] + [a + '.' for a in abbrevs] + [
+        'phường', 'quận', 'hà', 'nội', 'ấp', 'đà', 'tân', '12', '3b', ',', '.', '-', '/', 'a', 'ph', 'hcmc']
+    rng = random.Random(0)
+    for _ in range(2000):
+        address = ''.join(rng.choice(tokens) + rng.choice(['', ' ', ' ', ', ']) for _ in range(rng.randint(1, 8)))
+        assert normalizer.normalize(address) == _legacy_normalize(address, chuanhoa), address
+
+
+def test_first_row_wins_for_duplicate_abbreviations():
+    normalizer = Normalizer([('q', 'quận'), ('Q', 'quê'), ('', 'rỗng')])
+    assert normalizer.normalize('Q 1') == 'quận 1'
+
+
+def test_add_norm_accepts_table_or_normalizer(chuanhoa):
+    address = 'p.12, q.3, tp.hcm'
+    expected = _legacy_normalize(address, chuanhoa)
+    assert add_norm({'Address_ch': address}, chuanhoa)['Address_ch'] == expected
+    assert add_norm({'Address_ch': address}, Normalizer.from_table(chuanhoa))['Address_ch'] == expected
+    assert Normalizer.from_table(chuanhoa).normalize_many([address, 'h.x']) == [expected, 'huyện xã']
+
+
+def _nfd(text):
+    return unicodedata.normalize('NFD', text)
+
+
+def test_to_nfc_composes_and_keeps_nfc_strings():
+    text = 'phường bến nghé, quận 1'
+    assert to_nfc(text) is text
+    assert to_nfc(_nfd(text)) == text
+    assert _nfd(text) != text
+
+
+def test_nfc_json_normalizes_keys_and_nested_values():
+    value = {_nfd('hà nội'): [_nfd('ba đình'), {_nfd('phúc xá'): 1}], 'n': None, 'x': 1.5}
+    assert nfc_json(value) == {'hà nội': ['ba đình', {'phúc xá': 1}], 'n': None, 'x': 1.5}
+
+
+def test_normalizer_table_in_nfd_matches_nfc_input():
+    normalizer = Normalizer([(_nfd('đ'), _nfd('đường')), ('p', _nfd('phường'))])
+    assert normalizer.normalize('đ. lê lợi p.bến nghé') == 'đường lê lợi phường bến nghé'
+
+
+def test_dictionaries_are_nfc(add_dicts):
+    assert all(unicodedata.is_normalized('NFC', name) for name in add_dicts.gazetteer.kinds)
+
+
+@pytest.mark.parametrize('address', [
+    '45 lê lợi, p.bến nghé, q.1, tp.hồ chí minh',
+    'thôn 3, xã ea tu, thành phố buôn ma thuột, đắk lắk',
+    'khu phố 2, thị trấn chờ, huyện yên phong, bắc ninh',
+])
+def test_nfd_address_parses_like_nfc(add_dicts, address):
+    assert parse_address(_nfd(address), add_dicts) == parse_address(address, add_dicts)
@@ -0,0 +1,15 @@
+from address_module import disable_stage_stats, enable_stage_stats, get_stage_stats, parse_address
+
+
+def test_add_proc_1_steps_are_recorded(add_dicts):
+    enable_stage_stats(add_dicts)
+    try:
+        expected = parse_address('phường bến nghé quận 1 hồ chí minh', add_dicts)
+        stats = get_stage_stats(add_dicts)
+    finally:
+        disable_stage_stats(add_dicts)
+    for stage in ('add_norm', 'add_proc_1', 'resolve_city_district', 'resolve_ward_street', 'add_proc_3'):
+        assert stats[stage]['calls'] == 1
+    assert stats['resolve_city_district']['matches'] == 1
+    # đo đạc không làm thay đổi kết quả
+    assert parse_address('phường bến nghé quận 1 hồ chí minh', add_dicts) == expected
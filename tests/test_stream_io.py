@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+
+from address_module import result_frame
+from stream_io import ChunkWriter, detect_format, iter_input_chunks
+
+
+DF = pd.DataFrame({
+    'STT': list(range(1, 8)),
+    'Address': ['phường bến nghé, quận 1', 'xã ea tu', 'thị trấn chờ', 'hà nội', 'đà nẵng', '', 'tổ 5'],
+})
+
+
+def _write_chunks(path, df, size):
+    with ChunkWriter(str(path)) as writer:
+        for start in range(0, len(df), size):
+            writer.write(df.iloc[start:start + size])
+    return writer
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.jsonl', '.parquet', '.xlsx'])
+def test_round_trip_in_chunks(tmp_path, ext):
+    if ext == '.parquet':
+        pytest.importorskip('pyarrow')
+    if ext == '.xlsx':
+        pytest.importorskip('openpyxl')
+    path = tmp_path / ('out' + ext)
+    writer = _write_chunks(path, DF, 3)
+    assert writer.rows == len(DF)
+
+    chunks = list(iter_input_chunks(str(path), chunk_rows=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 1]
+    df = pd.concat(chunks)
+    # index liên tục trên toàn file
+    assert list(df.index) == list(range(len(DF)))
+    assert df['STT'].tolist() == DF['STT'].tolist()
+    assert df['Address'].fillna('').tolist() == DF['Address'].tolist()
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.jsonl', '.parquet'])
+def test_column_selection(tmp_path, ext):
+    if ext == '.parquet':
+        pytest.importorskip('pyarrow')
+    path = tmp_path / ('out' + ext)
+    _write_chunks(path, DF, 4)
+    df = pd.concat(iter_input_chunks(str(path), chunk_rows=5, columns=['Address']))
+    assert list(df.columns) == ['Address']
+
+
+def test_parquet_keeps_string_columns_that_start_empty(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'out.parquet'
+    with ChunkWriter(str(path)) as writer:
+        # chunk đầu toàn None: cột vẫn phải là string để ghi được các chunk sau
+        writer.write(pd.DataFrame({'ID': [1, 2], 'tinh': [None, None]}))
+        writer.write(pd.DataFrame({'ID': [3], 'tinh': ['hà nội']}))
+    df = pd.concat(iter_input_chunks(str(path)))
+    assert df['tinh'].isna().tolist() == [True, True, False]
+    assert df['tinh'].iloc[2] == 'hà nội'
+
+
+def test_jsonl_keeps_unicode(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    _write_chunks(path, DF, 10)
+    assert 'bến nghé' in path.read_text(encoding='utf-8')
+
+
+def test_detect_format():
+    assert detect_format('a.NDJSON') == 'jsonl'
+    assert detect_format('a.xls') == 'excel'
+    with pytest.raises(ValueError):
+        detect_format('a.txt')
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.jsonl', '.parquet'])
+def test_id_columns_keep_their_type_after_an_all_missing_chunk(tmp_path, ext):
+    if ext == '.parquet':
+        pytest.importorskip('pyarrow')
+    path = tmp_path / ('out' + ext)
+    with ChunkWriter(str(path)) as writer:
+        # chunk đầu không bắt được đơn vị nào, chunk sau có mã
+        writer.write(result_frame({'tinh': [None], 'city_id': [None], 'district_id': [None], 'ward_id': [None]}))
+        writer.write(result_frame({'tinh': ['hồ chí minh'], 'city_id': [79], 'district_id': [760],
+                                   'ward_id': [26734]}))
+    df = pd.concat(iter_input_chunks(str(path)))
+    assert df['city_id'].isna().tolist() == [True, False]
+    assert df[['city_id', 'district_id', 'ward_id']].iloc[1].tolist() == [79, 760, 26734]
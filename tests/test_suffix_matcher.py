@@ -0,0 +1,76 @@
+import pytest
+
+from fuzzy_matcher import fold_accents
+from suffix_matcher import ReverseTokenTrie, SuffixMatcher, canonical_tone
+
+
+DISTRICTS = [
+    ('hồ chí minh', 'thành phố', '1', 'quận'),
+    ('hồ chí minh', 'thành phố', 'tân bình', 'quận'),
+    ('hà nội', 'thành phố', 'ba đình', 'quận'),
+    ('bắc ninh', 'tỉnh', 'bắc ninh', 'thành phố'),
+    ('bắc ninh', 'tỉnh', 'yên phong', 'huyện'),
+    ('thanh hóa', 'tỉnh', 'thọ xuân', 'huyện'),
+    ('long an', 'tỉnh', 'tân bình', 'huyện'),
+]
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return SuffixMatcher(DISTRICTS)
+
+
+@pytest.mark.parametrize('text, expected, admin', [
+    ('45 lê lợi quận 1 hồ chí minh', ('hồ chí minh', 'thành phố', '1', 'quận'), 'quận 1 hồ chí minh'),
+    ('số 3 quận tân bình thành phố hồ chí minh', ('hồ chí minh', 'thành phố', 'tân bình', 'quận'),
+     'quận tân bình thành phố hồ chí minh'),
+    ('ấp 2 tân bình long an', ('long an', 'tỉnh', 'tân bình', 'huyện'), 'tân bình long an'),
+    ('quận 1 hồ chí minh việt nam', ('hồ chí minh', 'thành phố', '1', 'quận'), 'quận 1 hồ chí minh việt nam'),
+    # chỉ có quận/huyện ở cuối, tên thuộc duy nhất một tỉnh
+    ('thôn 3 yên phong', ('bắc ninh', 'tỉnh', 'yên phong', 'huyện'), 'yên phong'),
+    # dấu thanh kiểu cũ "hoá"
+    ('huyện thọ xuân thanh hoá', ('thanh hóa', 'tỉnh', 'thọ xuân', 'huyện'), 'huyện thọ xuân thanh hoá'),
+    ('thành phố bắc ninh bắc ninh', ('bắc ninh', 'tỉnh', 'bắc ninh', 'thành phố'), 'thành phố bắc ninh bắc ninh'),
+])
+def test_match(matcher, text, expected, admin):
+    found = matcher.match(text)
+    assert found[:4] == expected
+    assert text[found[4]:] == admin
+
+
+@pytest.mark.parametrize('text', [
+    'số 5 ngõ 3',
+    # "1" không có tiền tố 'quận' không được nhận là quận
+    'phường 1 hồ chí minh',
+    # tên phía sau 'phường' là phường, không phải quận
+    'phường tân bình hồ chí minh',
+    # đơn vị lân cận
+    'giáp quận 1 hồ chí minh',
+    # tên quận/huyện thuộc nhiều tỉnh, không có tỉnh đi kèm
+    'ấp 2 tân bình',
+    # loại tỉnh không khớp
+    'quận ba đình tỉnh hà nội',
+    '',
+])
+def test_no_certain_match(matcher, text):
+    assert matcher.match(text) is None
+
+
+def test_fold_keeps_original_names():
+    matcher = SuffixMatcher(DISTRICTS, fold=fold_accents)
+    text = fold_accents('45 lê lợi quận 1 hồ chí minh')
+    assert matcher.match(text) == ('hồ chí minh', 'thành phố', '1', 'quận', text.index('quan 1'))
+
+
+def test_reverse_token_trie_matches_shortest_first():
+    trie = ReverseTokenTrie()
+    trie.add(['hồ', 'chí', 'minh'], 'a')
+    trie.add(['minh'], 'b')
+    words = 'quận 1 hồ chí minh'.split()
+    assert trie.matches(words, len(words)) == [(4, ('b',)), (2, ('a',))]
+    assert trie.matches(words, 3) == []
+
+
+@pytest.mark.parametrize('word, expected', [('hoá', 'hóa'), ('thuý', 'thúy'), ('hóa', 'hóa'), ('hoà', 'hòa'), ('an', 'an')])
+def test_canonical_tone(word, expected):
+    assert canonical_tone(word) == expected
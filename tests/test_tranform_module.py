@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from master_reader import MasterRecord
+from tranform_module import AdminUnitIDMapper, map_frame_to_output_format, map_row_to_output_format
+
+
+RECORDS = [
+    MasterRecord('province', '01', 'Hà Nội', 'Thành phố', None),
+    MasterRecord('district', '001', 'Ba Đình', 'Quận', '01'),
+    MasterRecord('ward', '00001', 'Phúc Xá', 'Phường', '001'),
+    MasterRecord('ward', '00004', 'Trúc Bạch', 'Phường', '001'),
+    # tên trùng sau khi chuẩn hoá trong cùng quận: giữ dòng đầu
+    MasterRecord('ward', '00005', 'Trúc-Bạch', 'Phường', '001'),
+    MasterRecord('district', '002', 'Hoàn Kiếm', 'Quận', '01'),
+    MasterRecord('ward', '00037', 'Phúc Tân', 'Phường', '002'),
+    MasterRecord('province', '79', 'Hồ Chí Minh', 'Thành phố', None),
+    MasterRecord('district', '760', 'Quận 1', 'Quận', '79'),
+    MasterRecord('ward', '26734', 'Bến Nghé', 'Phường', '760'),
+    # cùng tên quận ở tỉnh khác
+    MasterRecord('province', '27', 'Bắc Ninh', 'Tỉnh', None),
+    MasterRecord('district', '256', 'Ba Đình', 'Thành phố', '27'),
+    MasterRecord('ward', '09190', 'Phúc Xá', 'Phường', '256'),
+    # mã trùng: bị bỏ; mã không phải số: không có id
+    MasterRecord('ward', '09190', 'Trùng Mã', 'Phường', '256'),
+    MasterRecord('ward', 'x1', 'Không Mã', 'Xã', '256'),
+]
+
+ROWS = pd.DataFrame({
+    'tinh': ['hà nội', 'Hà Nội', 'bắc ninh', 'hồ chí minh', 'hồ chí minh', 'hà nội', None, '', 'đà nẵng', 'hà nội',
+             'bắc ninh', 'hà nội'],
+    'qh': ['ba đình', 'ba đình', 'ba đình', '1', 'quận 1', 'hoàn kiếm', 'ba đình', 'ba đình', 'hải châu', None,
+           'ba đình', 'hoàn kiếm'],
+    'px': ['trúc bạch', 'phúc xá', 'phúc xá', 'bến nghé', 'bến nghé', 'phúc xá', 'phúc xá', None, 'x', 'phúc xá',
+           'trùng mã', 'phúc tân'],
+    'Address': ['a'] * 12,
+}, index=range(100, 112))
+
+
+@pytest.fixture(scope='module')
+def mapper():
+    return AdminUnitIDMapper('unused.json', records=RECORDS)
+
+
+def _per_row(mapper, df):
+    # cách cũ: gọi get_city_id / get_district_id / get_ward_id cho từng dòng
+    rows = [map_row_to_output_format(row, mapper, i) for i, (_, row) in enumerate(df.iterrows())]
+    return pd.DataFrame(rows)[['city_id', 'district_id', 'ward_id']].astype('float64')
+
+
+def test_map_ids_matches_per_row_lookups(mapper):
+    ids = mapper.map_ids(ROWS)
+    assert list(ids.index) == list(ROWS.index)
+    expected = _per_row(mapper, ROWS)
+    np.testing.assert_array_equal(ids.astype('float64').to_numpy(), expected.to_numpy())
+
+
+def test_map_ids_resolves_by_parent(mapper):
+    ids = mapper.map_ids(ROWS).astype('float64')
+    assert ids.loc[100].tolist() == [1, 1, 4]
+    # Ba Đình / Phúc Xá của Bắc Ninh, không phải của Hà Nội
+    assert ids.loc[102].tolist() == [27, 256, 9190]
+    assert ids.loc[103].tolist() == [79, 760, 26734]
+    assert np.isnan(ids.loc[109, 'district_id']) and np.isnan(ids.loc[109, 'ward_id'])
+    # trùng mã: chỉ giữ đơn vị đầu tiên
+    assert np.isnan(ids.loc[110, 'ward_id'])
+
+
+def test_frame_output_matches_per_row_output(mapper):
+    frame = map_frame_to_output_format(ROWS, mapper, start_id=7)
+    assert frame['id'].tolist() == list(range(7, 7 + len(ROWS)))
+    expected = _per_row(mapper, ROWS)
+    np.testing.assert_array_equal(frame[['city_id', 'district_id', 'ward_id']].to_numpy(dtype='float64'),
+                                  expected.to_numpy())
+
+
+def test_stage2_ids_are_kept_and_only_missing_rows_are_mapped(mapper):
+    df = ROWS.iloc[:3].copy()
+    df['city_id'] = [1.0, np.nan, 1.0]
+    df['district_id'] = [1.0, np.nan, 2.0]
+    df['ward_id'] = [4.0, np.nan, np.nan]
+    frame = map_frame_to_output_format(df, mapper)
+    assert frame[['city_id', 'district_id', 'ward_id']].to_numpy().tolist() == [
+        [1, 1, 4],       # đủ mã từ Stage 2
+        [1, 1, 1],       # thiếu mã: tra lại bằng tên
+        [27, 256, 9190],  # thiếu mã phường: tra lại cả dòng
+    ]